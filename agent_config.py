@@ -1,16 +1,13 @@
 import os
 import yaml
 import functools
-from typing import Dict, Any
-from smolagents import CodeAgent
-from tools.youtube_transcriber import YouTubeTranscriberTool
-from tools.web_search import WebSearchTool
-from tools.rag_query import RAGQueryTool
-from tools.journalistic_highlight import JournalisticHighlightTool
-from tools.summarization import SummarizationTool
-from tools.index_transcript import IndexTranscriptTool
+import threading
+from typing import TYPE_CHECKING, Dict, Any
 from groq_model import GroqModel
 
+if TYPE_CHECKING:
+    from smolagents import CodeAgent
+
 AGENT_DESCRIPTION = (
     "Agente de IA para auxiliar jornalistas a analisar vídeos do YouTube em Português do Brasil."
 )
@@ -47,9 +44,27 @@ def create_final_answer_tool():
 
     return FinalAnswerTool()
 
-def create_agent(groq_api_key: str, huggingface_api_token: str, max_steps: int = 1) -> CodeAgent:
+def create_model(groq_api_key: str) -> GroqModel:
+    """Modelo do agente, também usado sozinho para os resumos."""
+    return GroqModel(
+        api_key=groq_api_key,
+        model="deepseek-r1-distill-llama-70b",
+        temperature=0.5,
+        max_tokens=4096
+    )
+
+def create_agent(groq_api_key: str, huggingface_api_token: str, max_steps: int = 1) -> "CodeAgent":
     os.environ["HUGGINGFACEHUB_API_TOKEN"] = huggingface_api_token
 
+    # smolagents e as ferramentas só são importados quando um agente é criado
+    from smolagents import CodeAgent
+    from tools.youtube_transcriber import YouTubeTranscriberTool
+    from tools.web_search import WebSearchTool
+    from tools.rag_query import RAGQueryTool
+    from tools.journalistic_highlight import JournalisticHighlightTool
+    from tools.summarization import SummarizationTool
+    from tools.index_transcript import IndexTranscriptTool
+
     tools = [
         YouTubeTranscriberTool(),
         WebSearchTool(),
@@ -62,12 +77,7 @@ def create_agent(groq_api_key: str, huggingface_api_token: str, max_steps: int =
 
     prompt_templates = load_prompt_templates()
 
-    model = GroqModel(
-        api_key=groq_api_key,
-        model="deepseek-r1-distill-llama-70b",
-        temperature=0.5,
-        max_tokens=4096
-    )
+    model = create_model(groq_api_key)
 
     agent = CodeAgent(
         model=model,
@@ -82,3 +92,14 @@ def create_agent(groq_api_key: str, huggingface_api_token: str, max_steps: int =
     )
 
     return agent
+
+_agent_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=8)
+def _cached_agent(groq_api_key: str, huggingface_api_token: str, max_steps: int) -> "CodeAgent":
+    return create_agent(groq_api_key, huggingface_api_token, max_steps=max_steps)
+
+def get_agent(groq_api_key: str, huggingface_api_token: str, max_steps: int = 1) -> "CodeAgent":
+    """Agente reaproveitado entre execuções do script do Streamlit (um por chave e max_steps)."""
+    with _agent_lock:
+        return _cached_agent(groq_api_key, huggingface_api_token, max_steps)
@@ -0,0 +1,118 @@
+"""
+Registro de clientes de API reutilizados entre chamadas e ferramentas.
+
+Criar um ``groq.Client``, um ``ChatGroq`` ou fazer um ``requests.post`` solto
+a cada chamada paga um novo handshake TLS e abre uma nova conexão. Aqui cada
+provedor/chave de API recebe um cliente de vida longa com um pool de conexões
+keep-alive, compartilhado por todas as sessões do processo.
+
+Tamanho do pool: API_POOL_SIZE (padrão 16). Timeout: API_TIMEOUT (segundos).
+Os clientes são fechados ao sair do processo (ou com ``close_all``).
+"""
+
+import atexit
+import hashlib
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "16"))
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "120"))
+API_CONNECT_TIMEOUT = 10.0
+
+_clients: Dict[Tuple[str, ...], Any] = {}
+# Reentrante: a fábrica de um cliente pode pedir outro (ex.: o pool HTTP)
+_lock = threading.RLock()
+
+def _key_id(api_key: str) -> str:
+    # Só o hash da chave fica no registro
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+def _get_or_create(key: Tuple[str, ...], factory: Any) -> Any:
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = factory()
+            _clients[key] = client
+        return client
+
+def get_http_client(provider: str, api_key: str, pool_size: Optional[int] = None) -> Any:
+    """``httpx.Client`` com pool keep-alive, um por provedor e chave."""
+    import httpx
+
+    size = pool_size or API_POOL_SIZE
+    return _get_or_create(
+        ("httpx", provider, _key_id(api_key)),
+        lambda: httpx.Client(
+            limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+            timeout=httpx.Timeout(API_TIMEOUT, connect=API_CONNECT_TIMEOUT)
+        )
+    )
+
+def get_groq_client(api_key: str, base_url: Optional[str] = None) -> Any:
+    """``groq.Client`` reutilizável; as novas tentativas ficam com o rate_limiter."""
+    import groq
+
+    return _get_or_create(
+        ("groq", _key_id(api_key), base_url or ""),
+        lambda: groq.Client(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            http_client=get_http_client("groq", api_key)
+        )
+    )
+
+def get_chat_groq(api_key: str, model_name: str, temperature: float, base_url: Optional[str] = None) -> Any:
+    """``ChatGroq`` do langchain reutilizável, sobre o mesmo pool HTTP do cliente Groq."""
+    from langchain_groq import ChatGroq
+
+    return _get_or_create(
+        ("chat_groq", _key_id(api_key), model_name, str(temperature), base_url or ""),
+        lambda: ChatGroq(
+            groq_api_key=api_key,
+            model_name=model_name,
+            temperature=temperature,
+            base_url=base_url,
+            max_retries=0,
+            http_client=get_http_client("groq", api_key)
+        )
+    )
+
+def get_http_session(provider: str, api_key: str, pool_size: Optional[int] = None) -> Any:
+    """``requests.Session`` com pool keep-alive e o cabeçalho de autorização do provedor.
+
+    A sessão não tem timeout padrão: cada chamada deve passar ``timeout=(API_CONNECT_TIMEOUT, API_TIMEOUT)``.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    def create() -> Any:
+        size = pool_size or API_POOL_SIZE
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["Authorization"] = f"Bearer {api_key}"
+        return session
+
+    return _get_or_create(("session", provider, _key_id(api_key)), create)
+
+def client_count() -> int:
+    with _lock:
+        return len(_clients)
+
+def close_all() -> None:
+    """Fecha todos os clientes e conexões abertas."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+atexit.register(close_all)
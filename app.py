@@ -1,10 +1,14 @@
 import streamlit as st
 from process_video import process_video
 from rag_question_tab import render_rag_tab
+from tracing import start_metrics_server
 import os
 
 os.environ["WATCHDOG_USE_POLLING"] = "true"
 
+# Endpoint /metrics no formato Prometheus, se METRICS_PORT estiver definido
+start_metrics_server()
+
 # Aba de configurações no sidebar
 with st.sidebar:
     st.header("🔑 Configurações")
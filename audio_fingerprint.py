@@ -0,0 +1,437 @@
+"""
+Impressão digital de áudio para reconhecer reenvios, cortes e espelhos de vídeos já processados.
+
+O áudio (8 kHz, mono) vira um espectrograma; os picos locais mais fortes
+formam uma "constelação", e cada par (pico âncora, pico próximo) vira um hash
+de 23 bits: frequência do âncora, diferença de frequência e distância no
+tempo. Pares de picos sobrevivem bem a recodificação, mudança de volume e de
+taxa de bits, e o hash não depende de onde o vídeo começa.
+
+O índice (SQLite) guarda só os hashes "marcados" — um em cada
+``SAMPLING``, escolhidos pelo próprio valor, então são os mesmos nas duas
+cópias — com o vídeo e o instante. A busca consulta cada hash pela chave
+primária (B-tree: o custo cresce com o logaritmo do arquivo e com os
+acertos, não com o número de vídeos); os acertos votam em (vídeo,
+deslocamento), e os acertos no deslocamento vencedor, agrupados no tempo,
+dão os trechos do vídeo novo que já existem em outro.
+"""
+
+import functools
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from storage import cache_dir
+
+SAMPLE_RATE = 8000
+FFT_SIZE = 1024
+HOP = 256
+# Bandas de 125 Hz a 3,1 kHz (a faixa da fala)
+MIN_BIN, MAX_BIN = 16, 400
+PEAK_NEIGHBORHOOD = (9, 31)  # quadros x bandas
+PEAKS_PER_SECOND = 8
+FANOUT = 3
+LOOKAHEAD = 8
+MAX_DT = 63
+MAX_DF = 127
+SAMPLING = int(os.getenv("FINGERPRINT_SAMPLING", "4"))
+# Quadros por bloco do espectrograma (memória limitada para vídeos longos)
+BLOCK_FRAMES = 4096
+
+FRAME_SECONDS = HOP / SAMPLE_RATE
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL UNIQUE,
+    duration REAL NOT NULL,
+    hashes INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    hash INTEGER NOT NULL,
+    video INTEGER NOT NULL,
+    t INTEGER NOT NULL,
+    PRIMARY KEY (hash, video, t)
+) WITHOUT ROWID;
+"""
+
+@dataclass
+class Fingerprint:
+    """Hashes marcados de um áudio e o quadro (``FRAME_SECONDS``) de cada um."""
+
+    hashes: np.ndarray
+    times: np.ndarray
+    duration: float
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+@dataclass
+class Match:
+    """Trechos do vídeo novo (em segundos) que também estão em ``video_id``, deslocados de ``offset``.
+
+    O instante ``t`` do vídeo novo corresponde a ``t + offset`` no vídeo indexado.
+    """
+
+    video_id: str
+    offset: float
+    votes: int
+    intervals: List[Tuple[float, float]] = field(default_factory=list)
+
+    @property
+    def covered_seconds(self) -> float:
+        return sum(end - start for start, end in self.intervals)
+
+def _sliding_max(values: np.ndarray, width: int, axis: int) -> np.ndarray:
+    """Máximo em janelas de ``width`` ao longo de ``axis`` (saída menor em ``width - 1``), por dobras sucessivas."""
+    values = np.moveaxis(values, axis, 0)
+    reach = 1
+    while reach * 2 <= width:
+        values = np.maximum(values[:-reach], values[reach:])
+        reach *= 2
+    if reach < width:
+        values = np.maximum(values[:-(width - reach)], values[width - reach:])
+    return np.moveaxis(values, 0, axis)
+
+def _max_filter(values: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """Máximo numa janela retangular centrada, eixo por eixo (separável)."""
+    out = values
+    for axis, width in enumerate(size):
+        half = width // 2
+        pad = [(half, half) if a == axis else (0, 0) for a in range(values.ndim)]
+        out = _sliding_max(np.pad(out, pad, constant_values=-np.inf), width, axis)
+    return out
+
+def _block_peaks(samples: np.ndarray, first_frame: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Picos (quadro, banda) de um bloco de amostras, com quadros absolutos."""
+    n = 1 + (len(samples) - FFT_SIZE) // HOP
+    if n <= 0:
+        return np.zeros(0, np.int32), np.zeros(0, np.int32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FFT_SIZE)[::HOP][:n]
+    window = np.hanning(FFT_SIZE).astype(np.float32)
+    spectrum = np.log(np.abs(np.fft.rfft(frames * window, axis=1))[:, MIN_BIN:MAX_BIN] + 1e-6).astype(np.float32)
+    local = (spectrum == _max_filter(spectrum, PEAK_NEIGHBORHOOD)) & (spectrum > np.median(spectrum))
+    t, f = np.nonzero(local)
+    keep = max(1, int(PEAKS_PER_SECOND * n * FRAME_SECONDS))
+    if len(t) > keep:
+        strongest = np.argpartition(-spectrum[t, f], keep)[:keep]
+        t, f = t[strongest], f[strongest]
+    return (t + first_frame).astype(np.int32), f.astype(np.int32)
+
+def _peaks(blocks: Iterable[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Picos de todo o áudio, processado em blocos que se sobrepõem na vizinhança dos picos."""
+    margin = PEAK_NEIGHBORHOOD[0] // 2
+    block_samples = (BLOCK_FRAMES - 1) * HOP + FFT_SIZE
+    carry = np.zeros(0, np.float32)
+    first_frame = 0
+    total = 0
+    times, freqs = [], []
+    for block in blocks:
+        total += len(block)
+        carry = np.concatenate([carry, block])
+        while len(carry) >= block_samples:
+            t, f = _block_peaks(carry[:block_samples], first_frame)
+            # Só o miolo do bloco: as bordas são decididas pelo bloco vizinho
+            lo = first_frame + (margin if first_frame else 0)
+            hi = first_frame + BLOCK_FRAMES - margin
+            keep = (t >= lo) & (t < hi)
+            times.append(t[keep])
+            freqs.append(f[keep])
+            step = BLOCK_FRAMES - 2 * margin
+            carry = carry[step * HOP:]
+            first_frame += step
+    t, f = _block_peaks(carry, first_frame)
+    keep = t >= first_frame + (margin if first_frame else 0)
+    times.append(t[keep])
+    freqs.append(f[keep])
+    t, f = np.concatenate(times), np.concatenate(freqs)
+    order = np.lexsort((f, t))
+    return t[order], f[order], total
+
+def fingerprint_samples(blocks: Iterable[np.ndarray]) -> Fingerprint:
+    """Impressão digital de amostras float32 a 8 kHz (um array ou blocos em sequência)."""
+    if isinstance(blocks, np.ndarray):
+        blocks = [blocks]
+    t, f, total = _peaks(np.asarray(block, dtype=np.float32) for block in blocks)
+    hashes, anchors = [], []
+    paired = np.zeros(len(t), dtype=np.int32)
+    for k in range(1, LOOKAHEAD + 1):
+        a = np.arange(len(t) - k)
+        b = a + k
+        dt = t[b] - t[a]
+        df = f[b] - f[a]
+        ok = (dt > 0) & (dt <= MAX_DT) & (np.abs(df) <= MAX_DF) & (paired[a] < FANOUT)
+        a = a[ok]
+        paired[a] += 1
+        hashes.append(
+            (f[a].astype(np.uint32) << 14) | ((df[ok] + 128).astype(np.uint32) << 6) | dt[ok].astype(np.uint32)
+        )
+        anchors.append(t[a])
+    hashes_all = np.concatenate(hashes) if hashes else np.zeros(0, np.uint32)
+    times_all = np.concatenate(anchors) if anchors else np.zeros(0, np.int32)
+    # Marcação pelo próprio valor (mistura multiplicativa): as duas cópias marcam os mesmos pares
+    keep = ((hashes_all * np.uint32(2654435761)) >> np.uint32(28)) % SAMPLING == 0
+    return Fingerprint(hashes_all[keep], times_all[keep].astype(np.int32), total / SAMPLE_RATE)
+
+def _decode(
+    path: str,
+    start: float = 0.0,
+    duration: Optional[float] = None,
+    block_seconds: float = 60.0
+) -> Iterator[np.ndarray]:
+    """Áudio decodificado pelo ffmpeg (8 kHz, mono), em blocos, sem carregar tudo na memória."""
+    seek = ["-ss", f"{start:.3f}"] if start else []
+    limit = ["-t", f"{duration:.3f}"] if duration is not None else []
+    process = subprocess.Popen(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", *seek,
+            "-i", path, *limit, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    block_bytes = 2 * int(block_seconds * SAMPLE_RATE)
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) - len(data) % 2], dtype="<i2").astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read().decode("utf-8", errors="replace")
+        process.stderr.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg falhou ao decodificar {path}: {stderr[-2000:]}")
+
+def fingerprint_file(path: str, start: float = 0.0, duration: Optional[float] = None) -> Fingerprint:
+    """Impressão digital do arquivo (ou do trecho a partir de ``start``), com os tempos no arquivo."""
+    fingerprint = fingerprint_samples(_decode(path, start, duration))
+    fingerprint.times += int(round(start / FRAME_SECONDS))
+    return fingerprint
+
+def probe_fingerprint(
+    path: str,
+    duration: float,
+    every: float = 300.0,
+    length: float = 20.0,
+    max_probes: int = 12
+) -> Fingerprint:
+    """Impressão digital de amostras de ``length`` segundos a cada ``every`` (no máximo ``max_probes``).
+
+    Serve para uma busca rápida antes da impressão completa: um trecho em
+    comum mais longo que o espaçamento entre as amostras sempre contém uma.
+    """
+    if duration <= 2 * length:
+        return fingerprint_file(path)
+    every = max(every, duration / max_probes)
+    probes = [fingerprint_file(path, start, length) for start in np.arange(0.0, duration - length, every)]
+    return Fingerprint(
+        np.concatenate([probe.hashes for probe in probes]),
+        np.concatenate([probe.times for probe in probes]),
+        duration
+    )
+
+def _group(times: np.ndarray, max_gap: int, min_hits: int) -> List[Tuple[int, int]]:
+    """Agrupa quadros ordenados em intervalos (primeiro, último) separados por mais de ``max_gap``."""
+    if len(times) == 0:
+        return []
+    breaks = np.nonzero(np.diff(times) > max_gap)[0]
+    starts = np.concatenate([[0], breaks + 1])
+    ends = np.concatenate([breaks, [len(times) - 1]])
+    return [(int(times[s]), int(times[e])) for s, e in zip(starts, ends) if e - s + 1 >= min_hits]
+
+def _subtract(interval: Tuple[float, float], covered: Sequence[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    pieces = [interval]
+    for c_start, c_end in covered:
+        next_pieces = []
+        for start, end in pieces:
+            if c_end <= start or c_start >= end:
+                next_pieces.append((start, end))
+                continue
+            if c_start > start:
+                next_pieces.append((start, c_start))
+            if c_end < end:
+                next_pieces.append((c_end, end))
+        pieces = next_pieces
+    return pieces
+
+class FingerprintIndex:
+    """Hashes marcados de todos os vídeos processados, em SQLite, para busca de duplicatas."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        min_votes: int = 12,
+        max_gap_seconds: float = 15.0,
+        min_hits: int = 6,
+        min_interval_seconds: float = 5.0,
+        max_postings_per_hash: int = 500
+    ):
+        self.directory = directory or cache_dir("fingerprints")
+        os.makedirs(self.directory, exist_ok=True)
+        self.min_votes = min_votes
+        self.max_gap = int(max_gap_seconds / FRAME_SECONDS)
+        self.min_hits = min_hits
+        self.min_interval_seconds = min_interval_seconds
+        self.max_postings_per_hash = max_postings_per_hash
+        self.path = os.path.join(self.directory, "fingerprints.sqlite3")
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Uma conexão por thread; o SQLite cuida da concorrência entre processos
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            # As inclusões caem em pontos espalhados da B-tree: cache maior que o padrão (2 MB)
+            db.execute("PRAGMA cache_size=-65536")
+            self._local.db = db
+        return db
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    def has_video(self, video_id: str) -> bool:
+        return self._connection().execute("SELECT 1 FROM videos WHERE video_id = ?", (video_id,)).fetchone() is not None
+
+    def add(self, video_id: str, fingerprint: Fingerprint) -> None:
+        """Indexa (ou substitui) a impressão digital do vídeo."""
+        db = self._connection()
+        with db:
+            self._remove(db, video_id)
+            cursor = db.execute(
+                "INSERT INTO videos (video_id, duration, hashes, created_at) VALUES (?, ?, ?, ?)",
+                (video_id, fingerprint.duration, len(fingerprint), time.time())
+            )
+            video = cursor.lastrowid
+            # Em ordem de hash, as inclusões percorrem a B-tree em sequência
+            order = np.argsort(fingerprint.hashes, kind="stable")
+            db.executemany(
+                "INSERT OR IGNORE INTO postings (hash, video, t) VALUES (?, ?, ?)",
+                zip(fingerprint.hashes[order].tolist(), [video] * len(fingerprint), fingerprint.times[order].tolist())
+            )
+
+    def remove(self, video_id: str) -> None:
+        db = self._connection()
+        with db:
+            self._remove(db, video_id)
+
+    @staticmethod
+    def _remove(db: sqlite3.Connection, video_id: str) -> None:
+        row = db.execute("SELECT id FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+        if row is None:
+            return
+        # A tabela só tem índice por hash: a remoção percorre tudo, mas só acontece ao reprocessar
+        db.execute("DELETE FROM postings WHERE video = ?", (row[0],))
+        db.execute("DELETE FROM videos WHERE id = ?", (row[0],))
+
+    def _postings(self, hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        unique = np.unique(hashes).tolist()
+        rows: List[Tuple[int, int, int]] = []
+        db = self._connection()
+        for i in range(0, len(unique), 500):
+            batch = unique[i:i + 500]
+            rows.extend(db.execute(
+                f"SELECT hash, video, t FROM postings WHERE hash IN ({','.join('?' * len(batch))})", batch
+            ).fetchall())
+        if not rows:
+            empty = np.zeros(0, np.int64)
+            return empty, empty, empty
+        data = np.asarray(rows, dtype=np.int64)
+        # Hashes comuns demais (silêncio, vinhetas) não distinguem vídeos
+        values, counts = np.unique(data[:, 0], return_counts=True)
+        common = values[counts > self.max_postings_per_hash]
+        if len(common):
+            data = data[~np.isin(data[:, 0], common)]
+        return data[:, 0], data[:, 1], data[:, 2]
+
+    def match(self, fingerprint: Fingerprint, exclude: Optional[str] = None, max_sources: int = 5) -> List[Match]:
+        """Vídeos indexados que contêm trechos do áudio, com os intervalos cobertos (sem sobreposição)."""
+        if len(fingerprint) == 0:
+            return []
+        hashes, videos, source_times = self._postings(fingerprint.hashes)
+        if len(hashes) == 0:
+            return []
+
+        # Cada posting vota em (vídeo, deslocamento) com cada ocorrência do hash no áudio consultado
+        order = np.argsort(fingerprint.hashes, kind="stable")
+        query_hashes = fingerprint.hashes[order].astype(np.int64)
+        query_times = fingerprint.times[order].astype(np.int64)
+        lo = np.searchsorted(query_hashes, hashes, side="left")
+        hi = np.searchsorted(query_hashes, hashes, side="right")
+        counts = hi - lo
+        positions = np.repeat(lo - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts) + np.arange(counts.sum())
+        hit_videos = np.repeat(videos, counts)
+        hit_times = query_times[positions]
+        hit_offsets = np.repeat(source_times, counts) - hit_times
+
+        keys = (hit_videos << 32) | (hit_offsets + (1 << 31))
+        unique_keys, votes = np.unique(keys, return_counts=True)
+        # Meio quadro de diferença entre as cópias divide os votos entre deslocamentos vizinhos
+        neighbors = votes.copy()
+        for delta in (-1, 1):
+            index = np.searchsorted(unique_keys, unique_keys + delta)
+            index = np.minimum(index, len(unique_keys) - 1)
+            neighbors += np.where(unique_keys[index] == unique_keys + delta, votes[index], 0)
+
+        candidates = []
+        for i in np.argsort(-neighbors):
+            if neighbors[i] < self.min_votes or len(candidates) >= max_sources * 3:
+                break
+            video, offset = int(unique_keys[i] >> 32), int((unique_keys[i] & 0xFFFFFFFF) - (1 << 31))
+            if any(v == video and abs(o - offset) <= 2 for v, o, _ in candidates):
+                continue
+            candidates.append((video, offset, int(neighbors[i])))
+
+        names = dict(self._connection().execute(
+            f"SELECT id, video_id FROM videos WHERE id IN ({','.join('?' * len(candidates))})",
+            [video for video, _, _ in candidates]
+        ).fetchall()) if candidates else {}
+
+        matches: List[Match] = []
+        covered: List[Tuple[float, float]] = []
+        for video, offset, vote_count in candidates:
+            name = names.get(video)
+            if name is None or name == exclude:
+                continue
+            aligned = np.sort(hit_times[(hit_videos == video) & (np.abs(hit_offsets - offset) <= 1)])
+            intervals = []
+            for first, last in _group(aligned, self.max_gap, self.min_hits):
+                interval = (first * FRAME_SECONDS, min(fingerprint.duration, (last * HOP + FFT_SIZE) / SAMPLE_RATE))
+                intervals.extend(
+                    piece for piece in _subtract(interval, covered)
+                    if piece[1] - piece[0] >= self.min_interval_seconds
+                )
+            if not intervals:
+                continue
+            covered.extend(intervals)
+            matches.append(Match(name, offset * FRAME_SECONDS, vote_count, sorted(intervals)))
+            if len(matches) >= max_sources:
+                break
+        return matches
+
+    def stats(self) -> dict:
+        db = self._connection()
+        videos, seconds = db.execute("SELECT COUNT(*), COALESCE(SUM(duration), 0) FROM videos").fetchone()
+        postings = db.execute("SELECT COALESCE(SUM(hashes), 0) FROM videos").fetchone()[0]
+        return {"videos": videos, "hours": seconds / 3600, "postings": postings}
+
+_instance_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def _create_fingerprint_index() -> FingerprintIndex:
+    return FingerprintIndex()
+
+def get_fingerprint_index() -> FingerprintIndex:
+    """Índice de impressões digitais único por processo."""
+    with _instance_lock:
+        return _create_fingerprint_index()
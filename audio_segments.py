@@ -0,0 +1,145 @@
+"""
+Divisão de áudio em janelas sobrepostas (cortando preferencialmente em silêncios)
+e junção das transcrições resultantes sem repetir o trecho sobreposto.
+
+Usa os binários ffmpeg/ffprobe já exigidos pelo yt-dlp (ver packages.txt).
+"""
+
+import difflib
+import os
+import re
+import subprocess
+import unicodedata
+from typing import List, Optional, Tuple
+
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[\d.]+)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[\d.]+)")
+
+def probe_duration(path: str) -> float:
+    """Duração do arquivo de áudio em segundos (via ffprobe)."""
+    result = subprocess.run(
+        [
+            "ffprobe", "-v", "error",
+            "-show_entries", "format=duration",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            path
+        ],
+        check=True, capture_output=True, text=True
+    )
+    return float(result.stdout.strip())
+
+def detect_silences(path: str, noise_db: int = -30, min_silence: float = 0.4) -> List[Tuple[float, float]]:
+    """Lista de intervalos (início, fim) de silêncio detectados pelo filtro silencedetect."""
+    result = subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-nostats", "-i", path,
+            "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}",
+            "-f", "null", "-"
+        ],
+        capture_output=True, text=True
+    )
+    silences = []
+    start = None
+    for line in result.stderr.splitlines():
+        match = _SILENCE_START_RE.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END_RE.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return silences
+
+def plan_segments(
+    duration: float,
+    window_seconds: float = 600.0,
+    overlap_seconds: float = 5.0,
+    silences: Optional[List[Tuple[float, float]]] = None,
+    snap_seconds: float = 30.0
+) -> List[Tuple[float, float]]:
+    """Planeja janelas (início, fim) cobrindo todo o áudio.
+
+    O fim de cada janela é deslocado para o meio do silêncio mais próximo
+    (até ``snap_seconds`` antes do alvo), e a janela seguinte começa
+    ``overlap_seconds`` antes desse ponto.
+    """
+    if duration <= window_seconds:
+        return [(0.0, duration)]
+
+    midpoints = sorted((s + e) / 2 for s, e in (silences or []))
+    segments = []
+    start = 0.0
+    while start < duration:
+        target = start + window_seconds
+        if target >= duration:
+            segments.append((start, duration))
+            break
+        candidates = [m for m in midpoints if target - snap_seconds <= m <= target]
+        end = candidates[-1] if candidates else target
+        segments.append((start, end))
+        start = max(end - overlap_seconds, start + overlap_seconds)
+    return segments
+
+def cut_segment(path: str, start: float, end: float, out_path: str) -> str:
+    """Extrai [start, end) de ``path`` para ``out_path`` sem recodificar."""
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-ss", f"{start:.3f}", "-i", path,
+            "-t", f"{end - start:.3f}",
+            "-c", "copy", out_path
+        ],
+        check=True
+    )
+    return out_path
+
+def plan_audio(path: str, window_seconds: float = 600.0, overlap_seconds: float = 5.0) -> List[Tuple[float, float]]:
+    """Janelas sobrepostas (início, fim) do arquivo, sem recortá-lo."""
+    duration = probe_duration(path)
+    silences = detect_silences(path) if duration > window_seconds else []
+    return plan_segments(duration, window_seconds, overlap_seconds, silences)
+
+def split_audio(
+    path: str,
+    out_dir: str,
+    window_seconds: float = 600.0,
+    overlap_seconds: float = 5.0
+) -> List[Tuple[str, float, float]]:
+    """Divide o áudio em janelas sobrepostas; retorna (caminho, início, fim) na ordem."""
+    _, ext = os.path.splitext(path)
+    windows = []
+    for i, (start, end) in enumerate(plan_audio(path, window_seconds, overlap_seconds)):
+        windows.append((cut_segment(path, start, end, os.path.join(out_dir, f"segment_{i:04d}{ext}")), start, end))
+    return windows
+
+def _normalize_word(word: str) -> str:
+    word = unicodedata.normalize("NFKD", word.lower())
+    return "".join(c for c in word if c.isalnum())
+
+def merge_transcripts(texts: List[str], max_overlap_words: int = 60, min_match_words: int = 3) -> str:
+    """Junta transcrições consecutivas removendo o texto duplicado na sobreposição.
+
+    Procura a maior sequência de palavras em comum entre o final de um trecho
+    e o início do seguinte; o texto anterior é mantido até o início dessa
+    sequência e o seguinte continua a partir dela.
+    """
+    merged: List[str] = []
+    for text in texts:
+        words = text.split()
+        if not merged or not words:
+            merged.extend(words)
+            continue
+
+        tail_start = max(0, len(merged) - max_overlap_words)
+        tail = [_normalize_word(w) for w in merged[tail_start:]]
+        head = [_normalize_word(w) for w in words[:max_overlap_words]]
+        match = difflib.SequenceMatcher(None, tail, head, autojunk=False).find_longest_match(
+            0, len(tail), 0, len(head)
+        )
+        if match.size >= min_match_words:
+            del merged[tail_start + match.a:]
+            merged.extend(words[match.b:])
+        else:
+            merged.extend(words)
+    return " ".join(merged)
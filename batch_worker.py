@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+"""
+Worker em lote: processa uma fila de vídeos sem a interface do Streamlit.
+
+Lê um arquivo JSONL com um vídeo por linha ({"url": ..., "search_query": ...})
+e roda transcrição → resumo / indexação / destaques em vários processos. A
+concorrência de cada API externa (Whisper, Groq, busca na web) é limitada no
+conjunto dos processos; o índice de corpus é compartilhado por todos eles
+(e pelo app) sob a trava de arquivo do corpus_index. O resultado de cada etapa é salvo assim que termina,
+de modo que, se o worker cair, a próxima execução retoma de onde parou.
+
+Saída em <output>/<video_id>/: transcript.txt, summary.md, search_results.md,
+highlights.md, state.json (situação de cada etapa) e stages/ (checkpoints).
+Cada job concluído também é registrado em <output>/results.jsonl, com os
+totais de tokens do trace; os spans vão para o JSONL de traces (TRACE_FILE).
+
+Uso: python batch_worker.py fila.jsonl --output saida --workers 2
+Chaves: GROQ_API_KEY e OPENAI_API_KEY (ou --groq-api-key/--openai-api-key).
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from pipeline import DONE, FAILED, RUNNING, Stage, StageResult, run_stages
+from rate_limiter import rate_limiter_stats
+from segment_store import Transcript
+from storage import atomic_write_bytes
+from tracing import start_trace
+
+# Etapas cujo resultado é salvo; "model" e "index" são refeitos a partir dos caches
+CHECKPOINTED_STAGES = ("transcript", "summary", "corpus", "search", "highlights")
+OUTPUT_FILES = {
+    "transcript": "transcript.txt",
+    "summary": "summary.md",
+    "search": "search_results.md",
+    "highlights": "highlights.md",
+}
+
+class JobCheckpoint:
+    """Estado e resultados de um job, salvos etapa por etapa no diretório de saída."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "stages"), exist_ok=True)
+        self.state = self._read_json(os.path.join(directory, "state.json")) or {"stages": {}}
+
+    @staticmethod
+    def _read_json(path: str) -> Optional[Any]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_json(self, path: str, data: Any) -> None:
+        atomic_write_bytes(path, json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    def _stage_path(self, name: str) -> str:
+        return os.path.join(self.directory, "stages", f"{name}.json")
+
+    def done(self, name: str) -> bool:
+        return self.state["stages"].get(name, {}).get("status") == DONE and os.path.exists(self._stage_path(name))
+
+    def load(self, name: str) -> Any:
+        # Transcrição com timestamps: o .seg guarda texto e segmentos (o JSON só o texto)
+        segments_path = os.path.join(self.directory, "stages", f"{name}.seg")
+        if os.path.exists(segments_path):
+            return Transcript.load(segments_path)
+        return self._read_json(self._stage_path(name))
+
+    def save(self, name: str, value: Any) -> None:
+        if isinstance(value, Transcript) and value.has_timestamps:
+            value.save(os.path.join(self.directory, "stages", f"{name}.seg"))
+        self._write_json(self._stage_path(name), value)
+        output = OUTPUT_FILES.get(name)
+        if output:
+            text = value["summary"] if isinstance(value, dict) else str(value)
+            atomic_write_bytes(os.path.join(self.directory, output), text.encode("utf-8"))
+
+    def record(self, name: str, result: StageResult) -> None:
+        self.state["stages"][name] = {
+            "status": result.status,
+            "duration": result.duration,
+            "error": str(result.error) if result.error else None,
+        }
+        self.state["updated_at"] = time.time()
+        self._write_json(os.path.join(self.directory, "state.json"), self.state)
+
+def job_name(url: str) -> str:
+    from transcript_cache import extract_video_id
+    return extract_video_id(url) or hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+
+def resume_stages(stages: List[Stage], checkpoint: JobCheckpoint) -> List[Stage]:
+    """Troca etapas já concluídas pelo resultado salvo e remove as que só serviam a elas."""
+    restored = {stage.name for stage in stages if stage.name in CHECKPOINTED_STAGES and checkpoint.done(stage.name)}
+    needed = set()
+    for stage in stages:
+        if stage.name not in restored:
+            needed.update(stage.deps)
+
+    resumed = []
+    for stage in stages:
+        if stage.name in restored:
+            resumed.append(Stage(stage.name, lambda _, name=stage.name: checkpoint.load(name), label=stage.label))
+        elif stage.name in CHECKPOINTED_STAGES or stage.name in needed:
+            resumed.append(stage)
+    return resumed
+
+_limits: Dict[str, Any] = {}
+
+def _init_worker(limits: Dict[str, Any]) -> None:
+    # Semáforos compartilhados entre os processos, um por API externa
+    _limits.update(limits)
+
+def process_job(job: Dict[str, Any], output_root: str, keys: Dict[str, str], stage_threads: int) -> Dict[str, Any]:
+    """Roda (ou retoma) um vídeo da fila; executado num processo do pool."""
+    with start_trace("batch_job", url=job["url"]) as trace:
+        result = _run_job(job, output_root, keys, stage_threads)
+    return {**result, "trace_id": trace.trace_id, "trace": trace.totals()}
+
+def _run_job(job: Dict[str, Any], output_root: str, keys: Dict[str, str], stage_threads: int) -> Dict[str, Any]:
+    from video_pipeline import DEFAULT_SEARCH_QUERY, VideoJob, build_stages, transcribe
+
+    url = job["url"]
+    checkpoint = JobCheckpoint(os.path.join(output_root, job.get("id") or job_name(url)))
+    checkpoint.state["url"] = url
+    started = time.perf_counter()
+
+    if checkpoint.done("transcript"):
+        transcript = checkpoint.load("transcript")
+    else:
+        result = StageResult(started_at=time.perf_counter())
+        try:
+            transcript = transcribe(url, keys["openai"], limits=_limits)
+            result.status = DONE
+            checkpoint.save("transcript", transcript)
+        except Exception as e:
+            result.status, result.error = FAILED, e
+        result.finished_at = time.perf_counter()
+        checkpoint.record("transcript", result)
+        if result.status != DONE:
+            return {"url": url, "directory": checkpoint.directory, "ok": False, "error": str(result.error)}
+
+    video_job = VideoJob(
+        url=url,
+        groq_api_key=keys["groq"],
+        openai_api_key=keys["openai"],
+        search_query=job.get("search_query") or DEFAULT_SEARCH_QUERY
+    )
+    stages = resume_stages(build_stages(video_job, transcript, limits=_limits), checkpoint)
+
+    def on_status(name: str, result: StageResult) -> None:
+        if result.status == DONE and name in CHECKPOINTED_STAGES and not checkpoint.done(name):
+            checkpoint.save(name, result.value)
+        if result.status != RUNNING:
+            checkpoint.record(name, result)
+
+    run = run_stages(stages, max_workers=stage_threads, on_status=on_status)
+    errors = {name: str(r.error) for name, r in run.results.items() if r.error}
+    return {
+        "url": url,
+        "directory": checkpoint.directory,
+        "ok": run.ok,
+        "errors": errors,
+        "seconds": time.perf_counter() - started,
+        "rate_limits": rate_limiter_stats(),
+    }
+
+def read_queue(path: str) -> List[Dict[str, Any]]:
+    jobs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError:
+                # Também aceita uma URL por linha
+                job = {"url": line}
+            if not job.get("url"):
+                raise ValueError(f"Linha {line_number} da fila sem 'url'.")
+            jobs.append(job)
+    return jobs
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queue", help="Arquivo JSONL com um vídeo por linha")
+    parser.add_argument("--output", default="batch_output")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BATCH_WORKERS", "2")), help="Processos em paralelo")
+    parser.add_argument("--stage-threads", type=int, default=4, help="Etapas em paralelo dentro de cada vídeo")
+    parser.add_argument("--whisper-concurrency", type=int, default=2)
+    parser.add_argument("--groq-concurrency", type=int, default=4)
+    parser.add_argument("--web-concurrency", type=int, default=2)
+    parser.add_argument("--groq-api-key", default=os.getenv("GROQ_API_KEY"))
+    parser.add_argument("--openai-api-key", default=os.getenv("OPENAI_API_KEY"))
+    args = parser.parse_args(argv)
+
+    if not args.groq_api_key or not args.openai_api_key:
+        parser.error("Defina GROQ_API_KEY e OPENAI_API_KEY (ou use --groq-api-key/--openai-api-key).")
+
+    jobs = read_queue(args.queue)
+    os.makedirs(args.output, exist_ok=True)
+    keys = {"groq": args.groq_api_key, "openai": args.openai_api_key}
+
+    # "spawn": processos limpos, sem herdar threads do FAISS/torch do processo pai
+    context = multiprocessing.get_context("spawn")
+    limits = {
+        "whisper": context.BoundedSemaphore(args.whisper_concurrency),
+        "groq": context.BoundedSemaphore(args.groq_concurrency),
+        "web": context.BoundedSemaphore(args.web_concurrency),
+    }
+
+    failures = 0
+    results_path = os.path.join(args.output, "results.jsonl")
+    with ProcessPoolExecutor(
+        max_workers=max(1, args.workers),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(limits,)
+    ) as executor:
+        futures = {
+            executor.submit(process_job, job, args.output, keys, args.stage_threads): job
+            for job in jobs
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"url": job["url"], "ok": False, "error": str(e)}
+            failures += not result["ok"]
+            with open(results_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({**result, "finished_at": time.time()}, ensure_ascii=False) + "\n")
+            print(f"[{done}/{len(jobs)}] {'ok' if result['ok'] else 'FALHOU'} {job['url']}", flush=True)
+
+    print(f"Concluído: {len(jobs) - failures} ok, {failures} com falha. Resultados em {args.output}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
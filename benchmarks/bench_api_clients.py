@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Benchmark dos clientes de API: cliente novo a cada chamada vs. cliente do registro.
+
+Sobe um servidor local que imita a Groq (/openai/v1/chat/completions) e o
+Whisper (/v1/audio/transcriptions). Cada nova conexão paga um atraso fixo
+(--handshake-ms), simulando o handshake TCP+TLS de uma API remota; com
+keep-alive, só a primeira conexão paga esse custo.
+
+Uso: python benchmarks/bench_api_clients.py --calls 50 --handshake-ms 40
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api_clients import close_all, get_groq_client, get_http_session  # noqa: E402
+
+COMPLETION = {
+    "id": "bench", "object": "chat.completion", "created": 0, "model": "bench",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+}
+
+def make_handler(handshake_seconds: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Sem Nagle: cabeçalho e corpo em escritas separadas não esperam o ACK atrasado
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            # Chamado uma vez por conexão
+            time.sleep(handshake_seconds)
+            super().setup()
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            payload = COMPLETION if "chat/completions" in self.path else {"text": "ok"}
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def measure(fn, calls):
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95))}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--handshake-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    import groq
+    import requests
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.handshake_ms / 1000.0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    whisper_url = f"{base_url}/v1/audio/transcriptions"
+    messages = [{"role": "user", "content": "olá"}]
+
+    with tempfile.NamedTemporaryFile(suffix=".mp3") as audio:
+        audio.write(b"\0" * 4096)
+        audio.flush()
+
+        def groq_new_client():
+            client = groq.Client(api_key="bench", base_url=base_url, max_retries=0)
+            client.chat.completions.create(model="bench", messages=messages)
+            client.close()
+
+        def groq_pooled():
+            get_groq_client("bench", base_url=base_url).chat.completions.create(model="bench", messages=messages)
+
+        def whisper_bare_post():
+            with open(audio.name, "rb") as f:
+                requests.post(whisper_url, headers={"Authorization": "Bearer bench"}, files={"file": f}, data={"model": "whisper-1"}, timeout=30)
+
+        def whisper_session():
+            with open(audio.name, "rb") as f:
+                get_http_session("whisper", "bench").post(whisper_url, files={"file": f}, data={"model": "whisper-1"}, timeout=30)
+
+        results = {
+            "groq": {"antes": measure(groq_new_client, args.calls), "depois": measure(groq_pooled, args.calls)},
+            "whisper": {"antes": measure(whisper_bare_post, args.calls), "depois": measure(whisper_session, args.calls)},
+        }
+
+    close_all()
+    server.shutdown()
+    for name, row in results.items():
+        print(
+            f"{name:>8} | antes p50={row['antes']['p50_ms']:.1f}ms p95={row['antes']['p95_ms']:.1f}ms "
+            f"| depois p50={row['depois']['p50_ms']:.1f}ms p95={row['depois']['p95_ms']:.1f}ms"
+        )
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Benchmark do índice de corpus: latência de consulta conforme o corpus cresce.
+
+Usa vetores sintéticos (sem carregar o modelo de embeddings) e mede p50/p95
+da busca sem filtro, filtrada por vídeo e filtrada por canal.
+
+Uso: python benchmarks/bench_corpus_index.py --sizes 10000 50000 100000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from corpus_index import CorpusIndex  # noqa: E402
+
+def percentile(values, q):
+    return float(np.percentile(np.array(values) * 1000, q))
+
+def measure(fn, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        latencies.append(time.perf_counter() - start)
+    return {"p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--chunks-per-video", type=int, default=200)
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, args.dim)).astype("float32")
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = CorpusIndex(directory=directory)
+        video = 0
+        for size in sorted(args.sizes):
+            start = time.perf_counter()
+            while len(index) < size:
+                vectors = rng.standard_normal((args.chunks_per_video, args.dim)).astype("float32")
+                index.add_chunks(
+                    f"video{video:07d}",
+                    [f"trecho {i}" for i in range(args.chunks_per_video)],
+                    vectors,
+                    channel=f"canal{video % args.channels}",
+                    published_at=f"2024-{1 + video % 12:02d}-01",
+                    save=False
+                )
+                video += 1
+            ingest_seconds = time.perf_counter() - start
+
+            row = {
+                "chunks": len(index),
+                "videos": video,
+                "ingest_seconds": ingest_seconds,
+                "unfiltered": measure(lambda q: index.search(q, k=5), queries),
+                "by_video": measure(lambda q: index.search(q, k=5, video_id="video0000000"), queries),
+                "by_channel": measure(lambda q: index.search(q, k=5, channel="canal1"), queries)
+            }
+            results.append(row)
+            print(
+                f"{row['chunks']:>9} trechos | sem filtro p50={row['unfiltered']['p50_ms']:.2f}ms "
+                f"| vídeo p50={row['by_video']['p50_ms']:.2f}ms "
+                f"| canal p50={row['by_channel']['p50_ms']:.2f}ms"
+            )
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
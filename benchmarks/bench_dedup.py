@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+"""
+Benchmark da detecção de duplicatas (audio_fingerprint): robustez, escala e economia.
+
+Três partes:
+
+- robustez: áudio sintético parecido com fala (sílabas com harmônicos e
+  formantes) é indexado e consultado com cortes deslocados, recodificados em
+  Opus a 24 kbps (se o PyAV estiver instalado), com ganho e ruído; mede a
+  fração de cortes reconhecidos (com o deslocamento certo) e os falsos
+  positivos contra áudio não relacionado;
+- escala: latência da busca com o índice crescendo até milhares de vídeos
+  (impressões de 10 min com os campos dos hashes sorteados das distribuições
+  medidas em áudio sintético);
+- economia: com os mesmos substitutos locais do bench_e2e (Whisper, yt-dlp e
+  ffmpeg falsos), transcreve um vídeo, um corte dele, um espelho e um vídeo
+  sem relação, com e sem a detecção; mede os segundos de áudio enviados ao
+  Whisper, as chamadas, o tempo e se a transcrição montada bate com a
+  transcrição completa.
+
+Uso:
+  python benchmarks/bench_dedup.py --archive-sizes 100 1000 10000 --output dedup.json
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fakes import FakeAPIServer, HashEncoder, clip_url, video_url  # noqa: E402
+
+RATE = 8000
+
+def speech_like(seconds: float, seed: int) -> np.ndarray:
+    """Sílabas de 80–300 ms com harmônicos de uma fundamental e três formantes, e pausas."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * RATE)
+    out = np.zeros(n, np.float32)
+    position = 0
+    while position < n:
+        length = int(rng.uniform(0.08, 0.3) * RATE)
+        f0 = rng.uniform(90, 220)
+        formants = rng.uniform([300, 900, 2200], [900, 2200, 3200])
+        t = np.arange(length) / RATE
+        syllable = np.zeros(length)
+        for harmonic in range(1, int(RATE / 2 / f0)):
+            f = f0 * harmonic
+            amplitude = sum(np.exp(-((f - formant) / 120) ** 2) for formant in formants) + 0.02
+            syllable += amplitude * np.sin(2 * np.pi * f * t + rng.uniform(0, 2 * np.pi))
+        if rng.random() < 0.15:
+            syllable = rng.normal(0, 0.3, length)
+        out[position:position + length] += (syllable * np.hanning(length) * rng.uniform(0.2, 1))[:n - position]
+        position += length + int(rng.uniform(0, 0.15) * RATE) * (rng.random() < 0.3)
+    return out / np.abs(out).max() * 0.7
+
+def reencode(samples: np.ndarray, bitrate: int = 24000) -> np.ndarray:
+    """Ida e volta por Opus (o formato do download); sem PyAV, devolve o áudio intacto."""
+    try:
+        import av
+    except ImportError:
+        return samples
+    buffer = io.BytesIO()
+    container = av.open(buffer, "w", format="ogg")
+    stream = container.add_stream("libopus", rate=48000)
+    stream.bit_rate = bitrate
+    stream.layout = "mono"
+    frame = av.AudioFrame.from_ndarray((np.clip(samples, -1, 1) * 32767).astype(np.int16)[None, :], format="s16", layout="mono")
+    frame.sample_rate = RATE
+    for resampled in av.AudioResampler(format="s16", layout="mono", rate=48000).resample(frame):
+        for packet in stream.encode(resampled):
+            container.mux(packet)
+    for packet in stream.encode(None):
+        container.mux(packet)
+    container.close()
+    buffer.seek(0)
+    decoded = []
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=RATE)
+    for frame in av.open(buffer).decode(audio=0):
+        decoded.extend(g.to_ndarray().ravel() for g in resampler.resample(frame))
+    decoded.extend(g.to_ndarray().ravel() for g in resampler.resample(None))
+    return np.concatenate(decoded).astype(np.float32) / 32768
+
+def run_robustness(videos: int, minutes: float, clips: int) -> dict:
+    from audio_fingerprint import FingerprintIndex, fingerprint_samples
+
+    rng = np.random.default_rng(0)
+    sources = [speech_like(60 * minutes, seed) for seed in range(videos)]
+    with tempfile.TemporaryDirectory() as directory:
+        index = FingerprintIndex(directory)
+        start = time.perf_counter()
+        for i, samples in enumerate(sources):
+            index.add(f"video{i:02d}", fingerprint_samples(samples))
+        fingerprint_seconds = (time.perf_counter() - start) / (videos * minutes)
+
+        found, right_offset, coverage = 0, 0, []
+        for _ in range(clips):
+            i = int(rng.integers(videos))
+            length = float(rng.uniform(30, 120))
+            # Início fora da grade de quadros, com ganho e ruído
+            start_s = float(rng.uniform(0, 60 * minutes - length))
+            piece = sources[i][int(start_s * RATE):int((start_s + length) * RATE)]
+            piece = reencode(piece * rng.uniform(0.3, 1.5) + rng.normal(0, 0.01, len(piece)))
+            matches = index.match(fingerprint_samples(piece))
+            if matches and matches[0].video_id == f"video{i:02d}":
+                found += 1
+                right_offset += abs(matches[0].offset - start_s) < 0.1
+                coverage.append(matches[0].covered_seconds / length)
+
+        false_positives = 0
+        for seed in range(clips):
+            unrelated = reencode(speech_like(60, 1000 + seed))
+            false_positives += bool(index.match(fingerprint_samples(unrelated)))
+
+    return {
+        "videos": videos,
+        "clips": clips,
+        "recall": found / clips,
+        "offset_accuracy": right_offset / max(1, found),
+        "coverage_p50": statistics.median(coverage) if coverage else 0.0,
+        "false_positive_rate": false_positives / clips,
+        "fingerprint_s_per_audio_minute": fingerprint_seconds,
+    }
+
+def run_scale(sizes, queries: int) -> list:
+    from audio_fingerprint import Fingerprint, FingerprintIndex, fingerprint_samples
+
+    # Campos dos hashes (banda, diferença de banda, distância) sorteados das distribuições de áudios reais
+    from audio_fingerprint import SAMPLING
+
+    pool = np.concatenate([fingerprint_samples(speech_like(300, 500 + s)).hashes for s in range(4)])
+    fields = [pool >> 14, (pool >> 6) & 0xFF, pool & 0x3F]
+    rng = np.random.default_rng(1)
+    per_video = int(len(pool) / 20 * 10)  # ~10 min de áudio por vídeo
+
+    def random_fingerprint() -> Fingerprint:
+        hashes = np.zeros(0, np.uint32)
+        while len(hashes) < per_video:
+            candidates = (rng.choice(fields[0], per_video * SAMPLING) << 14) | (
+                rng.choice(fields[1], per_video * SAMPLING) << 6) | rng.choice(fields[2], per_video * SAMPLING)
+            # Só os que a marcação guardaria
+            keep = ((candidates * np.uint32(2654435761)) >> np.uint32(28)) % SAMPLING == 0
+            hashes = np.concatenate([hashes, candidates[keep]])
+        return Fingerprint(
+            hashes[:per_video],
+            np.sort(rng.integers(0, int(600 / 0.032), per_video)).astype(np.int32),
+            600.0
+        )
+
+    query_audio = [fingerprint_samples(speech_like(120, 900 + q)) for q in range(queries)]
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        index = FingerprintIndex(directory)
+        for size in sorted(sizes):
+            start = time.perf_counter()
+            for i in range(len(index), size):
+                index.add(f"random{i:06d}", random_fingerprint())
+            insert_seconds = time.perf_counter() - start
+            latencies = []
+            for fingerprint in query_audio:
+                t = time.perf_counter()
+                index.match(fingerprint)
+                latencies.append(time.perf_counter() - t)
+            db_bytes = os.path.getsize(os.path.join(directory, "fingerprints.sqlite3"))
+            rows.append({
+                "videos": size,
+                "postings": index.stats()["postings"],
+                "db_mb": db_bytes / 2 ** 20,
+                "insert_s": insert_seconds,
+                "lookup_p50_ms": 1000 * statistics.median(latencies),
+                "lookup_max_ms": 1000 * max(latencies),
+            })
+    return rows
+
+def run_savings(server: FakeAPIServer, minutes: int) -> list:
+    from embedding_service import get_embedding_service
+    from tools.youtube_transcriber import YouTubeTranscriberTool
+    from video_pipeline import index_transcript
+
+    get_embedding_service()._model = HashEncoder()
+    full = YouTubeTranscriberTool(use_cache=False)
+    dedup = YouTubeTranscriberTool()
+
+    source = video_url(minutes, seed=7)
+    dedup.transcribe(source, "fake-openai-key")
+    index_transcript(dedup.cache.get(source), source[-11:])
+
+    rows = []
+    copies = {
+        "corte": clip_url(minutes, 7, minutes // 3, minutes // 3),
+        "espelho": clip_url(minutes, 7, 0, minutes),
+        # Nada em comum: o custo da impressão digital sem economia
+        "sem relação": video_url(minutes, seed=8),
+    }
+    for name, url in copies.items():
+        row = {"copy": name}
+        for mode, tool in (("sem detecção", full), ("com detecção", dedup)):
+            before = dict(server.counts)
+            start = time.perf_counter()
+            text = tool.transcribe(url, "fake-openai-key")
+            row[mode] = {
+                "seconds": time.perf_counter() - start,
+                "whisper_calls": server.counts["whisper"] - before["whisper"],
+                "whisper_audio_s": server.counts["whisper_seconds"] - before["whisper_seconds"],
+            }
+            row.setdefault("texts", []).append(text)
+        reference, composed = row.pop("texts")
+        reference_words, composed_words = str(reference).split(), str(composed).split()
+        row["identical_text"] = reference_words == composed_words
+        row["word_diff"] = abs(len(reference_words) - len(composed_words))
+        entry = dedup.cache.get_entry(url) or {}
+        row["reused_from"] = entry.get("reused_from")
+        start = time.perf_counter()
+        index_transcript(composed, url[-11:])
+        row["index_s"] = time.perf_counter() - start
+        rows.append(row)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=8, help="Vídeos sintéticos da parte de robustez")
+    parser.add_argument("--video-minutes", type=float, default=5.0)
+    parser.add_argument("--clips", type=int, default=20)
+    parser.add_argument("--archive-sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--minutes", type=int, default=30, help="Duração do vídeo original na parte de economia")
+    # Whisper falso perto da velocidade da API (~1 s por minuto de áudio por chamada)
+    parser.add_argument("--whisper-latency-ms", type=float, default=500.0)
+    parser.add_argument("--whisper-ms-per-minute", type=float, default=1000.0)
+    parser.add_argument("--output", help="Arquivo JSON de resultados")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        from bench_e2e import configure_environment
+
+        server = FakeAPIServer(
+            whisper_latency_ms=args.whisper_latency_ms,
+            whisper_ms_per_minute=args.whisper_ms_per_minute
+        ).start()
+        args.real_ffmpeg = False
+        args.respect_rate_limits = False
+        args.no_llm_cache = False
+        args.search_latency_ms = 0.0
+        args.search_error_rate = 0.0
+        configure_environment(server, workdir, args)
+
+        robustness = run_robustness(args.videos, args.video_minutes, args.clips)
+        results["robustness"] = robustness
+        print(
+            f"robustez | {robustness['videos']} vídeos, {robustness['clips']} cortes recodificados: "
+            f"reconhecidos {100 * robustness['recall']:.0f}% (deslocamento certo em "
+            f"{100 * robustness['offset_accuracy']:.0f}%), cobertura p50 {100 * robustness['coverage_p50']:.0f}%, "
+            f"falsos positivos {100 * robustness['false_positive_rate']:.0f}% | "
+            f"impressão: {1000 * robustness['fingerprint_s_per_audio_minute']:.0f}ms por minuto de áudio"
+        )
+
+        results["scale"] = run_scale(args.archive_sizes, args.queries)
+        for row in results["scale"]:
+            print(
+                f"escala | {row['videos']:>6} vídeos, {row['postings']:>9} hashes ({row['db_mb']:.0f} MB): "
+                f"busca p50 {row['lookup_p50_ms']:.1f}ms, máx {row['lookup_max_ms']:.1f}ms"
+            )
+
+        results["savings"] = run_savings(server, args.minutes)
+        for row in results["savings"]:
+            before, after = row["sem detecção"], row["com detecção"]
+            print(
+                f"economia | {row['copy']:<20}: Whisper {before['whisper_audio_s'] / 60:.1f} → "
+                f"{after['whisper_audio_s'] / 60:.1f} min de áudio, {before['whisper_calls']} → {after['whisper_calls']} "
+                f"chamadas, {before['seconds']:.1f}s → {after['seconds']:.1f}s | texto idêntico: {row['identical_text']} "
+                f"({row['word_diff']} palavras de diferença) | "
+                f"índice em {row['index_s']:.2f}s"
+            )
+        server.stop()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), **results}, f, indent=2, ensure_ascii=False, default=str)
+        print(f"Resultados gravados em {args.output}")
+
+if __name__ == "__main__":
+    main()
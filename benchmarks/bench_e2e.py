@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+"""
+Benchmark de ponta a ponta, offline, do processamento de vídeos.
+
+Sobe substitutos locais do Whisper e da Groq (benchmarks/fakes.py), troca o
+DuckDuckGo, o yt-dlp e o ffmpeg por versões falsas e roda o mesmo pipeline do
+process_video (video_pipeline: transcrição → resumo / índice / corpus / busca
+/ destaques) para transcrições sintéticas de várias durações. Mede a latência
+de cada etapa e do total, a vazão da indexação e a latência das perguntas RAG.
+
+Os resultados vão para um JSON (--output) que pode ser comparado com o de
+outro commit (--compare).
+
+Uso:
+  python benchmarks/bench_e2e.py --minutes 10 60 180 --output bench.json
+  python benchmarks/bench_e2e.py --llm-error-rate 0.1 --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fakes import FakeAPIServer, FakeDDGS, HashEncoder, install_fake_ffmpeg, install_fake_ytdlp, video_url  # noqa: E402
+
+QUESTIONS = [
+    "O que foi dito sobre o orçamento da saúde?",
+    "Quem criticou a reforma tributária?",
+    "Qual o impacto estimado do projeto de lei?",
+    "Houve pedido de vista na sessão?",
+    "O que o relator propôs?",
+]
+
+def percentiles(values):
+    values = sorted(values)
+    return {
+        "p50_ms": 1000 * statistics.median(values),
+        "p95_ms": 1000 * values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))],
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def configure_environment(server: FakeAPIServer, workdir: str, args) -> None:
+    """Aponta o projeto para os substitutos locais; precisa rodar antes de importar os módulos."""
+    bin_dir = os.path.join(workdir, "bin")
+    os.makedirs(bin_dir)
+    install_fake_ytdlp(bin_dir)
+    if not args.real_ffmpeg:
+        install_fake_ffmpeg(bin_dir)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+    os.environ["AGENT_YT_CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ["WHISPER_API_URL"] = server.base_url + "/v1/audio/transcriptions"
+    os.environ["GROQ_BASE_URL"] = server.base_url
+    if not args.respect_rate_limits:
+        os.environ["GROQ_RPM"] = "0"
+        os.environ["WHISPER_RPM"] = "0"
+    if args.no_llm_cache:
+        os.environ["LLM_CACHE"] = "0"
+
+    import duckduckgo_search
+    FakeDDGS.latency = args.search_latency_ms / 1000.0
+    FakeDDGS.error_rate = args.search_error_rate
+    duckduckgo_search.DDGS = FakeDDGS
+
+def run_video(url: str, questions, stage_threads: int) -> dict:
+    from pipeline import run_stages
+    from tools.rag_query import RAGQueryTool
+    from tracing import start_trace
+    from video_pipeline import VideoJob, build_stages, transcribe
+
+    with start_trace("bench_e2e", url=url) as trace:
+        start = time.perf_counter()
+        transcript = transcribe(url, "fake-openai-key")
+        transcription_seconds = time.perf_counter() - start
+
+        job = VideoJob(url=url, groq_api_key="fake-groq-key", openai_api_key="fake-openai-key")
+        run = run_stages(build_stages(job, transcript), max_workers=stage_threads)
+        total_seconds = time.perf_counter() - start
+
+    stages = {"transcription": {"status": "done", "ms": 1000 * transcription_seconds}}
+    for name, result in run.results.items():
+        stages[name] = {
+            "status": result.status,
+            "ms": 1000 * result.duration if result.duration is not None else None,
+            "error": str(result.error) if result.error else None,
+        }
+
+    row = {
+        "url": url,
+        "transcript_words": len(transcript.split()),
+        "end_to_end_ms": 1000 * total_seconds,
+        "stages": stages,
+        "ok": run.ok,
+        "trace": trace.totals(),
+    }
+
+    vectorstore = run.value("index")
+    if vectorstore is not None:
+        chunks = vectorstore.index.ntotal
+        index_seconds = run.results["index"].duration or 0.0
+        row["indexing"] = {"chunks": chunks, "chunks_per_sec": chunks / index_seconds if index_seconds else None}
+
+        tool = RAGQueryTool(use_cache=False)
+        for scope in ("video", "corpus"):
+            latencies = []
+            for question in questions:
+                t = time.perf_counter()
+                tool.forward(question=question, vectorstore=vectorstore, llm_api_key="fake-groq-key", scope=scope)
+                latencies.append(time.perf_counter() - t)
+            row[f"rag_{scope}"] = percentiles(latencies)
+    return row
+
+def compare(current: dict, baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {row["url"]: row for row in baseline.get("runs", [])}
+    print(f"\nComparação com {baseline_path} (commit {baseline.get('commit') or '?'}):")
+    for row in current["runs"]:
+        old = previous.get(row["url"])
+        if not old:
+            continue
+        for label, new_ms, old_ms in [
+            ("total", row["end_to_end_ms"], old["end_to_end_ms"]),
+            *[(name, stage["ms"], old["stages"].get(name, {}).get("ms")) for name, stage in row["stages"].items()],
+            ("rag_video p50", row.get("rag_video", {}).get("p50_ms"), old.get("rag_video", {}).get("p50_ms")),
+        ]:
+            if new_ms is None or not old_ms:
+                continue
+            print(f"  {row['url'][-11:]} {label:>14}: {old_ms:9.0f}ms → {new_ms:9.0f}ms ({100 * (new_ms / old_ms - 1):+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=int, nargs="+", default=[10, 60])
+    parser.add_argument("--questions", type=int, default=len(QUESTIONS))
+    parser.add_argument("--stage-threads", type=int, default=4)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--whisper-latency-ms", type=float, default=500.0)
+    parser.add_argument("--whisper-ms-per-minute", type=float, default=20.0)
+    parser.add_argument("--whisper-error-rate", type=float, default=0.0)
+    parser.add_argument("--search-latency-ms", type=float, default=400.0)
+    parser.add_argument("--search-error-rate", type=float, default=0.0)
+    parser.add_argument("--respect-rate-limits", action="store_true", help="Mantém GROQ_RPM/WHISPER_RPM (por padrão desativados)")
+    parser.add_argument("--no-llm-cache", action="store_true")
+    parser.add_argument("--real-ffmpeg", action="store_true", help="Usa o ffmpeg instalado em vez do falso")
+    parser.add_argument("--real-embeddings", action="store_true", help="Usa o sentence-transformers em vez do HashEncoder")
+    parser.add_argument("--output", help="Arquivo JSON de resultados")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    server = FakeAPIServer(
+        llm_latency_ms=args.llm_latency_ms,
+        llm_error_rate=args.llm_error_rate,
+        whisper_latency_ms=args.whisper_latency_ms,
+        whisper_ms_per_minute=args.whisper_ms_per_minute,
+        whisper_error_rate=args.whisper_error_rate
+    ).start()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(server, workdir, args)
+        if not args.real_embeddings:
+            from embedding_service import get_embedding_service
+            get_embedding_service()._model = HashEncoder()
+
+        runs = []
+        for minutes in args.minutes:
+            row = run_video(video_url(minutes), QUESTIONS[:args.questions], args.stage_threads)
+            row["minutes"] = minutes
+            runs.append(row)
+            stage_line = " ".join(
+                f"{name}={stage['ms']:.0f}ms" for name, stage in row["stages"].items() if stage["ms"] is not None
+            )
+            print(f"{minutes:>4} min | total {row['end_to_end_ms']:.0f}ms | {stage_line}")
+            if "rag_video" in row:
+                print(
+                    f"         | índice {row['indexing']['chunks']} trechos "
+                    f"({row['indexing']['chunks_per_sec'] or 0:.0f}/s) | RAG vídeo p50={row['rag_video']['p50_ms']:.0f}ms "
+                    f"| RAG corpus p50={row['rag_corpus']['p50_ms']:.0f}ms"
+                )
+
+        from api_clients import close_all
+        from rate_limiter import rate_limiter_stats
+        close_all()
+
+    server.stop()
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "server_requests": server.counts,
+        "rate_limits": rate_limiter_stats(),
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Resultados gravados em {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""
+Benchmark da pré-seleção de trechos do JournalisticHighlightTool.
+
+Monta transcrições sintéticas com marcações [m:ss]: fala corrida pouco
+verificável ("conversa") com afirmações checáveis plantadas em pontos
+aleatórios do vídeo — números, datas, nomes e citações. Parte delas trata dos
+assuntos dos resultados de busca (plantadas "do noticiário").
+
+Para cada duração compara o prompt montado pela ferramenta com a pré-seleção
+(highlight_candidates) e sem ela (transcrição inteira, cortada pelo
+fit_prompt no limite do modelo):
+
+- tokens do prompt, que dominam o tempo e o custo da chamada;
+- tempo local da pré-seleção;
+- fração das afirmações plantadas que chegam ao prompt (no total e só as do
+  noticiário).
+
+Uso:
+  python benchmarks/bench_highlight_candidates.py --minutes 10 60 180 --output highlights.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from segment_store import Transcript  # noqa: E402
+from token_budget import count_tokens  # noqa: E402
+from tools.journalistic_highlight import JournalisticHighlightTool  # noqa: E402
+
+WORDS_PER_MINUTE = 150
+SEARCH_RESULTS = (
+    "Título: Governo anuncia novo corte no orçamento da educação\n"
+    "Resumo: O Ministério da Educação perde verba das universidades federais após bloqueio.\n\n"
+    "Título: Desmatamento na Amazônia volta a crescer segundo o Inpe\n"
+    "Resumo: Alertas de desmatamento na Amazônia sobem no semestre, aponta o Inpe."
+)
+
+_CHATTER = [
+    "Então, pessoal, é isso que a gente queria conversar hoje com vocês",
+    "Eu acho que vale a pena pensar um pouco mais sobre esse assunto com calma",
+    "Não sei se vocês concordam, mas pra mim faz bastante sentido",
+    "Bom, voltando ao que a gente estava falando antes do intervalo",
+    "Deixa eu só completar o raciocínio aqui rapidinho",
+    "É uma discussão longa e cada um tem a sua opinião sobre isso",
+    "Olha, eu vejo isso de um jeito um pouco diferente, sabe",
+    "Vamos ver o que o pessoal está comentando aqui no chat",
+    "Isso é uma coisa que a gente sempre comenta no programa",
+    "Pois é, e aí fica aquela dúvida no ar pra quem está assistindo",
+]
+_NEWS_CLAIMS = [
+    "O ministro Camilo Santana afirmou que o orçamento das universidades federais caiu {n}% desde {y}",
+    "Segundo o Inpe, o desmatamento na Amazônia aumentou {n}% em {m} de {y}",
+    "A reitora Joana Prado disse que o corte de R$ {n} milhões na educação vai fechar laboratórios",
+    "Dados do Inpe mostram {n} mil quilômetros quadrados de floresta derrubados na Amazônia em {y}",
+]
+_OTHER_CLAIMS = [
+    "O deputado Paulo Mendes declarou que a obra custou R$ {n} milhões e nunca foi entregue",
+    "De acordo com o IBGE, a renda média subiu {n}% em {m} de {y}, o maior aumento da série",
+    "A prefeita Carla Nunes afirmou que a cidade teve {n} mortes no trânsito em {y}, um recorde",
+    "Segundo o TCU, {n} contratos da Secretaria de Obras foram assinados sem licitação em {y}",
+]
+_MONTHS = ["janeiro", "março", "maio", "agosto", "outubro", "dezembro"]
+
+def planted_transcript(minutes: float, claims_per_hour: int, seed: int = 0):
+    """Transcrição com marcações e as afirmações plantadas (texto e se são do noticiário)."""
+    rng = random.Random(seed)
+    sentences = []
+    words = 0
+    while words < minutes * WORDS_PER_MINUTE:
+        sentence = rng.choice(_CHATTER) + rng.choice([".", ".", "?"])
+        sentences.append(sentence)
+        words += len(sentence.split())
+
+    planted = []
+    count = max(4, round(claims_per_hour * minutes / 60))
+    for position in sorted(rng.sample(range(len(sentences)), count)):
+        news = len(planted) % 2 == 0
+        template = rng.choice(_NEWS_CLAIMS if news else _OTHER_CLAIMS)
+        claim = template.format(n=rng.randint(11, 999), y=rng.randint(2015, 2024), m=rng.choice(_MONTHS)) + "."
+        sentences[position] = claim
+        planted.append((claim, news))
+
+    segments, clock = [], 0.0
+    for sentence in sentences:
+        duration = 60.0 * len(sentence.split()) / WORDS_PER_MINUTE
+        segments.append((clock, clock + duration, sentence))
+        clock += duration
+    return Transcript.from_segments(segments).timestamped_text(), planted
+
+def recall(prompt: str, planted, news_only: bool = False) -> float:
+    claims = [claim for claim, news in planted if news or not news_only]
+    return sum(claim in prompt for claim in claims) / len(claims)
+
+def run(minutes: float, claims_per_hour: int, budget: int, repeat: int) -> dict:
+    text, planted = planted_transcript(minutes, claims_per_hour, seed=int(minutes))
+    full = JournalisticHighlightTool(use_cache=False, max_context_tokens=None)
+    selective = JournalisticHighlightTool(use_cache=False, max_context_tokens=budget)
+
+    baseline_prompt = full._build_prompt(text, SEARCH_RESULTS)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        prompt = selective._build_prompt(text, SEARCH_RESULTS)
+    build_ms = 1000 * (time.perf_counter() - start) / repeat
+
+    return {
+        "minutes": minutes,
+        "transcript_tokens": count_tokens(text),
+        "planted_claims": len(planted),
+        "full": {
+            "prompt_tokens": count_tokens(baseline_prompt),
+            "recall": recall(baseline_prompt, planted),
+            "news_recall": recall(baseline_prompt, planted, news_only=True),
+        },
+        "preselected": {
+            "prompt_tokens": count_tokens(prompt),
+            "build_ms": build_ms,
+            "recall": recall(prompt, planted),
+            "news_recall": recall(prompt, planted, news_only=True),
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10.0, 60.0, 180.0])
+    parser.add_argument("--claims-per-hour", type=int, default=12)
+    parser.add_argument("--budget", type=int, default=6000, help="Orçamento de tokens da pré-seleção")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Arquivo JSON de resultados")
+    args = parser.parse_args()
+
+    results = []
+    for minutes in args.minutes:
+        row = run(minutes, args.claims_per_hour, args.budget, args.repeat)
+        results.append(row)
+        full, selected = row["full"], row["preselected"]
+        print(
+            f"{minutes:>5.0f} min | {row['transcript_tokens']} tokens, {row['planted_claims']} afirmações | "
+            f"inteira: prompt {full['prompt_tokens']} tokens, recall {full['recall']:.0%} "
+            f"(noticiário {full['news_recall']:.0%}) | pré-seleção: prompt {selected['prompt_tokens']} tokens "
+            f"em {selected['build_ms']:.0f}ms, recall {selected['recall']:.0%} "
+            f"(noticiário {selected['news_recall']:.0%})"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"budget": args.budget, "runs": results}, f, indent=2)
+        print(f"Resultados gravados em {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Benchmark do tempo de importação do app (cold start do Streamlit).
+
+Mede, em processos Python novos, quanto leva para importar os módulos que o
+app.py carrega antes de desenhar a primeira tela, e confere que dependências
+pesadas (smolagents, langchain, FAISS, torch...) continuam sendo importadas
+só sob demanda. Termina com código 1 se a mediana passar do orçamento ou se
+algum módulo pesado aparecer — serve como teste de regressão.
+
+Uso: python benchmarks/bench_import_time.py --runs 5 --budget-ms 1000
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_MODULES = ("process_video", "rag_question_tab")
+# Só devem ser importados quando uma ferramenta é usada
+HEAVY_MODULES = (
+    "smolagents", "langchain_community", "langchain_groq", "langchain_text_splitters",
+    "faiss", "torch", "transformers", "sentence_transformers", "groq", "duckduckgo_search"
+)
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import streamlit
+streamlit_seconds = time.perf_counter() - start
+for name in {modules!r}:
+    __import__(name)
+total = time.perf_counter() - start
+print(json.dumps({{
+    "total_ms": total * 1000,
+    "streamlit_ms": streamlit_seconds * 1000,
+    "heavy_loaded": [m for m in {heavy!r} if m in sys.modules]
+}}))
+"""
+
+def probe() -> dict:
+    code = _PROBE.format(modules=APP_MODULES, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def slowest_imports(limit: int) -> list:
+    code = "import streamlit\n" + "\n".join(f"import {m}" for m in APP_MODULES)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)", line)
+        # Só módulos de primeiro nível fora da stdlib, com o tempo acumulado (inclui dependências)
+        if match and len(match.group(3)) == 1 and match.group(4).split(".")[0] not in sys.stdlib_module_names:
+            rows.append((int(match.group(2)) / 1000, match.group(4)))
+    return sorted(rows, reverse=True)[:limit]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "1000")))
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(args.runs)]
+    total = statistics.median(r["total_ms"] for r in runs)
+    streamlit_ms = statistics.median(r["streamlit_ms"] for r in runs)
+    heavy = sorted({m for r in runs for m in r["heavy_loaded"]})
+
+    print(f"Importação do app: mediana {total:.0f}ms (streamlit {streamlit_ms:.0f}ms) | orçamento {args.budget_ms:.0f}ms")
+    for ms, name in slowest_imports(8):
+        print(f"  {ms:8.1f}ms  {name}")
+    if heavy:
+        print(f"Módulos pesados importados cedo demais: {', '.join(heavy)}")
+
+    ok = total <= args.budget_ms and not heavy
+    print(json.dumps({
+        "median_ms": total, "streamlit_ms": streamlit_ms, "budget_ms": args.budget_ms,
+        "heavy_loaded": heavy, "ok": ok
+    }, indent=2))
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
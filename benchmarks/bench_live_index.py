@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+Benchmark da indexação ao vivo: quanto tempo até o vídeo poder ser consultado.
+
+Compara, com os mesmos substitutos locais do bench_e2e (Whisper, yt-dlp e
+ffmpeg falsos), dois modos para cada duração de vídeo:
+
+- lote: transcreve tudo e só então indexa (o fluxo do IndexTranscriptTool);
+- ao vivo: live_index.start_live_indexing, com as janelas da transcrição
+  indexadas em micro-lotes à medida que chegam.
+
+Mede o tempo até o primeiro trecho consultável, até o índice completo e, no
+modo ao vivo, a latência das buscas feitas durante as inclusões. Cada busca
+confere que o número de trechos visíveis nunca diminui e que todo documento
+devolvido tem o texto e o intervalo de tempo coerentes com a transcrição.
+
+Uso:
+  python benchmarks/bench_live_index.py --minutes 30 120 --whisper-ms-per-minute 300
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_e2e import configure_environment  # noqa: E402
+from fakes import FakeAPIServer, HashEncoder, video_url  # noqa: E402
+
+QUESTION = "O que foi dito sobre o orçamento da saúde?"
+
+def run_batch(url: str) -> dict:
+    from video_pipeline import index_transcript, transcribe
+    from transcript_cache import extract_video_id
+
+    start = time.perf_counter()
+    transcript = transcribe(url, "fake-openai-key")
+    transcribed = time.perf_counter() - start
+    vectorstore = index_transcript(transcript, extract_video_id(url))
+    elapsed = time.perf_counter() - start
+    return {
+        "transcribed_s": transcribed,
+        "first_queryable_s": elapsed,
+        "complete_s": elapsed,
+        "chunks": vectorstore.index.ntotal,
+    }
+
+def run_live(url: str, poll_seconds: float) -> dict:
+    from embedding_service import get_embedding_service
+    from live_index import start_live_indexing
+
+    query_vector = get_embedding_service().embed_query(QUESTION)
+    start = time.perf_counter()
+    live = start_live_indexing(url, "fake-openai-key")
+
+    first_queryable = None
+    latencies, visible, errors = [], [], []
+    while not live.done.is_set():
+        t = time.perf_counter()
+        docs = live.search(QUESTION, query_vector, k=3)
+        latencies.append(time.perf_counter() - t)
+        chunks = live.chunks
+        if visible and chunks < visible[-1]:
+            errors.append(f"trechos visíveis diminuíram: {visible[-1]} → {chunks}")
+        visible.append(chunks)
+        for doc in docs:
+            offset = doc.metadata["start_index"]
+            if str.__getitem__(live.transcript, slice(offset, offset + len(doc.page_content))) != doc.page_content:
+                errors.append(f"trecho fora da transcrição no offset {offset}")
+        if docs and first_queryable is None:
+            first_queryable = time.perf_counter() - start
+        live.done.wait(poll_seconds)
+    complete = time.perf_counter() - start
+
+    if live.error is not None:
+        raise live.error
+    return {
+        "first_queryable_s": first_queryable if first_queryable is not None else complete,
+        "complete_s": complete,
+        "chunks": live.chunks,
+        "searches_during_appends": len(latencies),
+        "search_p50_ms": 1000 * statistics.median(latencies) if latencies else None,
+        "consistency_errors": errors[:10],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=int, nargs="+", default=[30, 120])
+    parser.add_argument("--whisper-latency-ms", type=float, default=500.0)
+    parser.add_argument("--whisper-ms-per-minute", type=float, default=300.0)
+    parser.add_argument("--poll-ms", type=float, default=50.0)
+    parser.add_argument("--real-embeddings", action="store_true", help="Usa o sentence-transformers em vez do HashEncoder")
+    parser.add_argument("--output", help="Arquivo JSON de resultados")
+    args = parser.parse_args()
+    # Mesmas opções de ambiente do bench_e2e
+    args.real_ffmpeg = False
+    args.respect_rate_limits = False
+    args.no_llm_cache = False
+    args.search_latency_ms = 0.0
+    args.search_error_rate = 0.0
+
+    server = FakeAPIServer(
+        whisper_latency_ms=args.whisper_latency_ms,
+        whisper_ms_per_minute=args.whisper_ms_per_minute
+    ).start()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(server, workdir, args)
+        if not args.real_embeddings:
+            from embedding_service import get_embedding_service
+            get_embedding_service()._model = HashEncoder()
+
+        for minutes in args.minutes:
+            # Sementes diferentes: o modo ao vivo não pode achar a transcrição no cache
+            batch = run_batch(video_url(minutes, seed=0))
+            live = run_live(video_url(minutes, seed=1), args.poll_ms / 1000.0)
+            runs.append({"minutes": minutes, "batch": batch, "live": live})
+            print(
+                f"{minutes:>4} min | lote: consultável em {batch['first_queryable_s']:.1f}s ({batch['chunks']} trechos) | "
+                f"ao vivo: primeiro trecho em {live['first_queryable_s']:.1f}s, completo em {live['complete_s']:.1f}s "
+                f"({live['chunks']} trechos) | {live['searches_during_appends']} buscas durante as inclusões, "
+                f"p50 {live['search_p50_ms'] or 0:.1f}ms | inconsistências: {len(live['consistency_errors'])}"
+            )
+
+    server.stop()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "runs": runs}, f, indent=2, ensure_ascii=False)
+        print(f"Resultados gravados em {args.output}")
+
+if __name__ == "__main__":
+    main()
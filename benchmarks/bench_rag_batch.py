@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+Benchmark das perguntas em lote do RAG: RAGQueryTool.answer_batch contra N chamadas a forward.
+
+Com os substitutos locais do bench_e2e (chat completions da Groq falso, com
+latência fixa, e o HashEncoder no lugar do sentence-transformers), indexa uma
+transcrição sintética e responde à mesma lista de perguntas de duas formas:
+
+- sequencial: uma chamada a RAGQueryTool.forward por pergunta (embedding,
+  busca e completion bloqueante, uma de cada vez);
+- lote: answer_batch — um lote de embeddings, uma busca no FAISS para todas
+  as perguntas e as completions em paralelo, até ``--concurrency`` por vez.
+
+Mede o tempo total, o tempo até a primeira resposta, o tempo de recuperação
+(embeddings + busca) e quantos caracteres de contexto a fusão dos trechos
+sobrepostos deixou de enviar. O cache de respostas fica desligado.
+
+Uso:
+  python benchmarks/bench_rag_batch.py --questions 10 --llm-latency-ms 800 --concurrency 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_e2e import configure_environment  # noqa: E402
+from fakes import FakeAPIServer, HashEncoder, synthetic_transcript  # noqa: E402
+
+QUESTIONS = [
+    "O que foi dito sobre o orçamento da saúde?",
+    "Quem criticou a reforma tributária?",
+    "Qual o impacto estimado do projeto de lei?",
+    "O que a deputada Ana Souza defendeu?",
+    "Quais emendas foram apresentadas ao novo ensino médio?",
+    "O que o ministro da Fazenda disse sobre a Petrobras?",
+    "Houve pedido de vista sobre o marco temporal?",
+    "Quais dados do IBGE foram citados?",
+    "O que a senadora Marta Lima questionou?",
+    "Quando está prevista a votação da CPI das apostas?",
+    "Quantos parlamentares apoiaram o programa Minha Casa Minha Vida?",
+    "O que o relator propôs alterar?",
+]
+
+def run_sequential(tool, questions, vectorstore) -> dict:
+    start = time.perf_counter()
+    first = None
+    for question in questions:
+        tool.forward(question, vectorstore, "fake-groq-key")
+        if first is None:
+            first = time.perf_counter() - start
+    return {"total_s": time.perf_counter() - start, "first_answer_s": first}
+
+def run_batch(tool, questions, vectorstore, concurrency: int) -> dict:
+    start = time.perf_counter()
+    first = None
+    answers = 0
+    for _, answer in tool.answer_batch(questions, vectorstore, "fake-groq-key", max_concurrency=concurrency):
+        if answer.startswith("Erro"):
+            raise RuntimeError(answer)
+        answers += 1
+        if first is None:
+            first = time.perf_counter() - start
+    return {"total_s": time.perf_counter() - start, "first_answer_s": first, "answers": answers}
+
+def retrieval_cost(tool, questions, vectorstore) -> dict:
+    """Tempo de recuperação por pergunta contra em lote, e os caracteres de contexto antes e depois da fusão."""
+    from embedding_service import get_embedding_service
+    from hybrid_retrieval import hybrid_search, hybrid_search_batch
+
+    service = get_embedding_service()
+    start = time.perf_counter()
+    for question in questions:
+        hybrid_search(vectorstore, question, service.embed_query(question), k=tool.top_k, candidates=tool.candidates)
+    sequential_ms = 1000 * (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    results = hybrid_search_batch(
+        vectorstore, questions, service.embed_queries(questions), k=tool.top_k, candidates=tool.candidates
+    )
+    batch_ms = 1000 * (time.perf_counter() - start)
+
+    raw_chars = sum(len(doc.page_content) for docs in results for doc in docs)
+    merged_chars = sum(len(context) for context in tool._retrieve_contexts(questions, vectorstore, "video", None))
+    return {
+        "sequential_ms": sequential_ms,
+        "batch_ms": batch_ms,
+        "context_chars_raw": raw_chars,
+        "context_chars_merged": merged_chars,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--minutes", type=int, default=60, help="Duração da transcrição sintética")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--output", help="Arquivo JSON de resultados")
+    args = parser.parse_args()
+    # Mesmas opções de ambiente do bench_e2e
+    args.real_ffmpeg = False
+    args.respect_rate_limits = False
+    args.no_llm_cache = True
+    args.search_latency_ms = 0.0
+    args.search_error_rate = 0.0
+
+    questions = (QUESTIONS * (args.questions // len(QUESTIONS) + 1))[:args.questions]
+    server = FakeAPIServer(llm_latency_ms=args.llm_latency_ms).start()
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(server, workdir, args)
+        from embedding_service import get_embedding_service
+        get_embedding_service()._model = HashEncoder()
+        from tools.rag_query import RAGQueryTool
+        from video_pipeline import index_transcript
+
+        vectorstore = index_transcript(synthetic_transcript(args.minutes), None)
+        tool = RAGQueryTool(top_k=args.top_k, use_cache=False)
+        # Aquece o cliente HTTP e o modelo antes de medir
+        tool.forward(questions[0], vectorstore, "fake-groq-key")
+
+        retrieval = retrieval_cost(tool, questions, vectorstore)
+        sequential = run_sequential(tool, questions, vectorstore)
+        batch = run_batch(tool, questions, vectorstore, args.concurrency)
+
+    server.stop()
+    print(
+        f"{args.questions} perguntas | sequencial: {sequential['total_s']:.2f}s "
+        f"(primeira em {sequential['first_answer_s']:.2f}s) | lote (concorrência {args.concurrency}): "
+        f"{batch['total_s']:.2f}s (primeira em {batch['first_answer_s']:.2f}s) | speedup "
+        f"{sequential['total_s'] / batch['total_s']:.1f}x"
+    )
+    print(
+        f"recuperação: {retrieval['sequential_ms']:.1f}ms por pergunta somadas, {retrieval['batch_ms']:.1f}ms em lote | "
+        f"contexto: {retrieval['context_chars_raw']} → {retrieval['context_chars_merged']} caracteres "
+        f"com a fusão dos trechos sobrepostos"
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"config": vars(args), "sequential": sequential, "batch": batch, "retrieval": retrieval},
+                f, indent=2, ensure_ascii=False
+            )
+        print(f"Resultados gravados em {args.output}")
+
+if __name__ == "__main__":
+    main()
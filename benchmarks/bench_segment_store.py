@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Benchmark do armazenamento de segmentos: memória e serialização por hora de transcrição.
+
+Compara três representações da mesma transcrição sintética com os segmentos
+do Whisper (uma frase por segmento, ~150 palavras por minuto):
+
+- texto: só a string, sem timestamps (o formato anterior);
+- dicts: a lista de dicionários do verbose_json ({"start", "end", "text"});
+- Transcript: texto num buffer + arrays numpy de offsets e tempos (segment_store).
+
+Mede a memória alocada (tracemalloc), o tamanho em disco, o tempo de gravar e
+ler (JSON contra o formato binário) e o tempo de recortar um minuto por tempo.
+
+Uso:
+  python benchmarks/bench_segment_store.py --hours 1 3 --output segstore.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fakes import synthetic_segments, synthetic_transcript  # noqa: E402
+from segment_store import Transcript  # noqa: E402
+
+def measure(build):
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+def timed(fn, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, 1000 * (time.perf_counter() - start) / repeat
+
+def run(hours: float, repeat: int) -> dict:
+    text = synthetic_transcript(60 * hours)
+    raw = json.dumps({"text": text, "segments": synthetic_segments(text)})
+
+    plain, plain_bytes = measure(lambda: json.loads(raw)["text"])
+    dicts, dicts_bytes = measure(lambda: json.loads(raw)["segments"])
+    transcript, transcript_bytes = measure(
+        lambda: Transcript.from_segments((s["start"], s["end"], s["text"]) for s in json.loads(raw)["segments"])
+    )
+
+    dicts_json, dicts_dump_ms = timed(lambda: json.dumps(dicts), repeat)
+    _, dicts_load_ms = timed(lambda: json.loads(dicts_json), repeat)
+    binary, binary_dump_ms = timed(transcript.to_bytes, repeat)
+    _, binary_load_ms = timed(lambda: Transcript.from_bytes(binary), repeat)
+
+    middle = transcript.duration / 2
+    _, dicts_slice_ms = timed(
+        lambda: " ".join(s["text"] for s in dicts if s["end"] > middle and s["start"] < middle + 60), repeat
+    )
+    _, transcript_slice_ms = timed(lambda: transcript.slice_time(middle, middle + 60).text, repeat)
+
+    per_hour = 1.0 / hours
+    return {
+        "hours": hours,
+        "segments": len(dicts),
+        "memory_mb_per_hour": {
+            "text": plain_bytes * per_hour / 2 ** 20,
+            "dicts": dicts_bytes * per_hour / 2 ** 20,
+            "transcript": transcript_bytes * per_hour / 2 ** 20,
+        },
+        "disk_mb_per_hour": {
+            "dicts_json": len(dicts_json.encode("utf-8")) * per_hour / 2 ** 20,
+            "transcript_binary": len(binary) * per_hour / 2 ** 20,
+        },
+        "serialize_ms": {"dicts_json": dicts_dump_ms, "transcript_binary": binary_dump_ms},
+        "deserialize_ms": {"dicts_json": dicts_load_ms, "transcript_binary": binary_load_ms},
+        "slice_minute_ms": {"dicts": dicts_slice_ms, "transcript": transcript_slice_ms},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, nargs="+", default=[1.0, 3.0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="Arquivo JSON de resultados")
+    args = parser.parse_args()
+
+    results = []
+    for hours in args.hours:
+        row = run(hours, args.repeat)
+        results.append(row)
+        memory, disk = row["memory_mb_per_hour"], row["disk_mb_per_hour"]
+        print(
+            f"{hours:>4.1f} h | {row['segments']} segmentos | memória/h: texto {memory['text']:.2f} MB, "
+            f"dicts {memory['dicts']:.2f} MB, Transcript {memory['transcript']:.2f} MB"
+        )
+        print(
+            f"       | disco/h: JSON {disk['dicts_json']:.2f} MB, binário {disk['transcript_binary']:.2f} MB | "
+            f"leitura: JSON {row['deserialize_ms']['dicts_json']:.1f}ms, binário "
+            f"{row['deserialize_ms']['transcript_binary']:.2f}ms | recorte de 1 min: dicts "
+            f"{row['slice_minute_ms']['dicts']:.2f}ms, Transcript {row['slice_minute_ms']['transcript']:.3f}ms"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"runs": results}, f, indent=2)
+        print(f"Resultados gravados em {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Benchmark da contagem de tokens e da divisão por orçamento de tokens.
+
+Gera transcrições sintéticas em português com várias horas de fala (~150
+palavras por minuto) e mede a vazão de count_tokens e chunk_by_tokens, além
+do número de trechos comparado ao antigo corte de 3000 caracteres.
+
+Uso: python benchmarks/bench_tokenizer.py --hours 1 3 6 --chunk-tokens 6000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from token_budget import _encoding, chunk_by_tokens, count_tokens  # noqa: E402
+
+WORDS_PER_MINUTE = 150
+_VOCABULARY = (
+    "o projeto de lei prevê recursos para a saúde pública e educação básica nos municípios "
+    "senhor presidente a comissão aprovou o relatório com emendas do deputado federal "
+    "orçamento de 2024 destina 1.250 milhões ao programa nacional de habitação "
+    "a votação foi adiada por falta de quórum na sessão extraordinária do plenário"
+).split()
+
+def synthetic_transcript(hours: float, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    remaining = int(hours * 60 * WORDS_PER_MINUTE)
+    sentences = []
+    while remaining > 0:
+        length = min(remaining, rng.randint(8, 30))
+        words = [rng.choice(_VOCABULARY) for _ in range(length)]
+        sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+        remaining -= length
+    return " ".join(sentences)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, nargs="+", default=[1, 3, 6])
+    parser.add_argument("--chunk-tokens", type=int, default=6000)
+    args = parser.parse_args()
+
+    print(f"Tokenizador: {'tiktoken' if _encoding() is not None else 'estimativa por caracteres'}")
+    results = []
+    for hours in args.hours:
+        text = synthetic_transcript(hours)
+
+        start = time.perf_counter()
+        tokens = count_tokens(text)
+        count_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        chunks = chunk_by_tokens(text, args.chunk_tokens)
+        chunk_seconds = time.perf_counter() - start
+
+        row = {
+            "hours": hours,
+            "chars": len(text),
+            "tokens": tokens,
+            "count_seconds": count_seconds,
+            "count_tokens_per_sec": tokens / count_seconds if count_seconds else 0.0,
+            "chunk_seconds": chunk_seconds,
+            "chunks": len(chunks),
+            "char_chunks_3000": -(-len(text) // 3000),
+            "max_chunk_tokens": max(count_tokens(c) for c in chunks)
+        }
+        results.append(row)
+        print(
+            f"{hours:>4}h | {tokens:>9} tokens | contagem {row['count_tokens_per_sec'] / 1e6:.2f}M tok/s "
+            f"| divisão {chunk_seconds:.2f}s | {row['chunks']} trechos (antes {row['char_chunks_3000']})"
+        )
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
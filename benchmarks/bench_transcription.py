@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Benchmark da transcrição local (faster-whisper na CPU): fator de tempo real por número de núcleos.
+
+Transcreve o mesmo áudio com o LocalWhisperBackend variando quantos trechos
+(detectados pelo VAD) rodam em paralelo, um por núcleo. O fator de tempo real
+(RTF) é o tempo de processamento dividido pela duração do áudio: 0,1 significa
+uma hora de áudio transcrita em seis minutos. O carregamento do modelo é
+medido à parte.
+
+Requer faster-whisper e um modelo em formato CTranslate2 num diretório local.
+
+Uso:
+  python benchmarks/bench_transcription.py --audio sessao.ogg --model-path modelos/whisper-small-ct2
+  python benchmarks/bench_transcription.py --audio sessao.ogg --cores 1 2 4 8 --threads-per-worker 1
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from transcription_backends import SAMPLE_RATE, LocalWhisperBackend  # noqa: E402
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    default_cores = sorted({c for c in (1, 2, 4, 8, cpu_count) if c <= cpu_count})
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", required=True, help="Arquivo de áudio com fala (de preferência alguns minutos)")
+    parser.add_argument("--model-path", default=os.getenv("WHISPER_MODEL_PATH"))
+    parser.add_argument("--cores", type=int, nargs="+", default=default_cores)
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--chunk-seconds", type=float, default=60.0)
+    parser.add_argument("--language", default="pt")
+    args = parser.parse_args()
+
+    if not args.model_path:
+        parser.error("Informe --model-path ou defina WHISPER_MODEL_PATH.")
+
+    from faster_whisper import decode_audio
+
+    audio_seconds = len(decode_audio(args.audio, sampling_rate=SAMPLE_RATE)) / SAMPLE_RATE
+    print(f"Áudio: {audio_seconds / 60:.1f} min | modelo {args.model_path} ({args.compute_type})")
+
+    results = []
+    for cores in args.cores:
+        backend = LocalWhisperBackend(
+            model_path=args.model_path,
+            compute_type=args.compute_type,
+            workers=cores,
+            threads_per_worker=args.threads_per_worker,
+            chunk_seconds=args.chunk_seconds
+        )
+        backend.model  # carga medida à parte
+        start = time.perf_counter()
+        text = backend.transcribe(args.audio, language=args.language)
+        elapsed = time.perf_counter() - start
+        row = {
+            "cores": cores,
+            "threads": cores * args.threads_per_worker,
+            "load_seconds": backend.load_seconds,
+            "seconds": elapsed,
+            "rtf": elapsed / audio_seconds,
+            "words": len(text.split()),
+        }
+        row["speedup"] = results[0]["seconds"] / elapsed if results else 1.0
+        results.append(row)
+        print(
+            f"{cores:>3} núcleo(s) | RTF {row['rtf']:.3f} | {elapsed:.1f}s | "
+            f"aceleração {row['speedup']:.2f}x | carga do modelo {row['load_seconds']:.1f}s"
+        )
+
+    print(json.dumps({"audio_seconds": audio_seconds, "runs": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
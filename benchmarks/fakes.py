@@ -0,0 +1,351 @@
+"""
+Substitutos locais das APIs externas para os benchmarks offline.
+
+- FakeAPIServer: servidor HTTP que imita o endpoint de transcrição do Whisper
+  (/v1/audio/transcriptions, com segmentos em verbose_json) e o chat completions da Groq
+  (/openai/v1/chat/completions, com e sem streaming), com latência e taxa de
+  erros configuráveis.
+- FakeDDGS: substituto do cliente do DuckDuckGo usado pelo WebSearchTool.
+- HashEncoder: "modelo" de embeddings determinístico, para medir o pipeline
+  sem baixar o sentence-transformers.
+- install_fake_ytdlp / install_fake_ffmpeg: executáveis falsos; o yt-dlp
+  escreve um áudio sintético no stdout e o ffmpeg o copia para a saída (e
+  recorta janelas com -ss/-t; o ffprobe falso informa a duração), para que o
+  Whisper falso transcreva só o trecho da janela. Decodificado para PCM
+  (-f s16le), o áudio sintético vira tons que dependem só do vídeo e do
+  instante: cortes (clip_url) e espelhos têm o mesmo som do original.
+- synthetic_transcript: transcrições sintéticas em português de vários tamanhos.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import stat
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+WORDS_PER_MINUTE = 150
+
+_SPEAKERS = ["o senhor presidente", "a deputada Ana Souza", "o relator", "o ministro da Fazenda", "a senadora Marta Lima"]
+_SUBJECTS = [
+    "o projeto de lei {n}/2024", "o orçamento da saúde", "a reforma tributária", "o programa Minha Casa Minha Vida",
+    "a CPI das apostas", "o marco temporal", "a política de preços da Petrobras", "o novo ensino médio"
+]
+_VERBS = ["defendeu", "criticou", "propôs alterar", "pediu vista sobre", "apresentou emendas ao", "questionou"]
+_DETAILS = [
+    "com impacto estimado de R$ {n} milhões", "em votação prevista para {d} de março",
+    "segundo dados do IBGE de {y}", "com apoio de {n} parlamentares", "após parecer do TCU"
+]
+
+def synthetic_transcript(minutes: float, seed: int = 0) -> str:
+    """Transcrição sintética em português com ~150 palavras por minuto de fala."""
+    rng = random.Random(seed)
+    target = int(minutes * WORDS_PER_MINUTE)
+    sentences, words = [], 0
+    while words < target:
+        sentence = (
+            f"{rng.choice(_SPEAKERS).capitalize()} {rng.choice(_VERBS)} "
+            f"{rng.choice(_SUBJECTS)} {rng.choice(_DETAILS)}"
+        ).format(n=rng.randint(10, 9999), d=rng.randint(1, 28), y=rng.randint(2015, 2024))
+        sentence += rng.choice([".", ".", ".", "?", "!"])
+        sentences.append(sentence)
+        words += len(sentence.split())
+    return " ".join(sentences)
+
+def synthetic_segments(text: str) -> List[Dict[str, Any]]:
+    """Segmentos no formato verbose_json do Whisper: uma frase por segmento, a 150 palavras por minuto."""
+    segments, clock = [], 0.0
+    for sentence in re.findall(r"[^.?!]+[.?!]", text):
+        duration = 60.0 * len(sentence.split()) / WORDS_PER_MINUTE
+        segments.append({"id": len(segments), "start": round(clock, 2), "end": round(clock + duration, 2), "text": sentence})
+        clock += duration
+    return segments
+
+def video_url(minutes: int, seed: int = 0) -> str:
+    """URL de vídeo cujo ID (11 caracteres) codifica a duração e a semente."""
+    return f"https://youtu.be/bench{minutes:03d}m{seed:02d}"
+
+def clip_url(minutes: int, seed: int, start_minute: int, length_minutes: int) -> str:
+    """URL de outro vídeo com o trecho [start_minute, start_minute + length_minutes) do vídeo ``video_url(minutes, seed)``.
+
+    Com o trecho inteiro, é um espelho (mesmo áudio, outro ID).
+    """
+    return f"https://youtu.be/c{minutes:03d}{seed:1d}{start_minute:03d}{length_minutes:03d}"
+
+_AUDIO_RE = re.compile(rb"FAKEAUDIO:(\d+):(\d+)(?::([\d.]+):([\d.]+))?")
+
+class FakeAPIServer:
+    """Whisper + Groq falsos num só servidor HTTP local."""
+
+    def __init__(
+        self,
+        llm_latency_ms: float = 300.0,
+        llm_error_rate: float = 0.0,
+        completion_words: int = 120,
+        whisper_latency_ms: float = 500.0,
+        whisper_ms_per_minute: float = 20.0,
+        whisper_error_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.llm_latency = llm_latency_ms / 1000.0
+        self.llm_error_rate = llm_error_rate
+        self.completion_words = completion_words
+        self.whisper_latency = whisper_latency_ms / 1000.0
+        self.whisper_per_minute = whisper_ms_per_minute / 1000.0
+        self.whisper_error_rate = whisper_error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"chat": 0, "chat_errors": 0, "whisper": 0, "whisper_errors": 0, "whisper_seconds": 0.0}
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self) -> "FakeAPIServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _fail(self, rate: float, key: str) -> bool:
+        with self.lock:
+            self.counts[key] += 1
+            failed = self.rng.random() < rate
+            if failed:
+                self.counts[f"{key}_errors"] += 1
+        return failed
+
+    def _completion_text(self) -> str:
+        words = synthetic_transcript(1, seed=self.rng.randint(0, 10 ** 6)).split()
+        return " ".join(words[:self.completion_words])
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _error(self) -> None:
+                if fake.rng.random() < 0.5:
+                    self._json(429, {"error": {"message": "Rate limit reached"}}, {"retry-after": "0"})
+                else:
+                    self._json(503, {"error": {"message": "Service unavailable"}})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path.endswith("/audio/transcriptions"):
+                    self._whisper(body)
+                elif self.path.endswith("/chat/completions"):
+                    self._chat(json.loads(body or b"{}"))
+                else:
+                    self._json(404, {"error": {"message": "not found"}})
+
+            def _whisper(self, body: bytes) -> None:
+                match = _AUDIO_RE.search(body)
+                minutes, seed = (int(match.group(1)), int(match.group(2))) if match else (1, 0)
+                start, end = (float(match.group(3)), float(match.group(4))) if match and match.group(3) else (0.0, None)
+                window_minutes = (end - start) / 60 if end is not None else minutes
+                with fake.lock:
+                    fake.counts["whisper_seconds"] += 60 * window_minutes
+                time.sleep(fake.whisper_latency + fake.whisper_per_minute * window_minutes)
+                if fake._fail(fake.whisper_error_rate, "whisper"):
+                    return self._error()
+                text = synthetic_transcript(minutes, seed)
+                if end is None:
+                    segments = synthetic_segments(text)
+                else:
+                    # Janela recortada: só os segmentos dela, com tempos relativos ao início da janela
+                    segments = [
+                        {**s, "start": round(s["start"] - start, 2), "end": round(s["end"] - start, 2)}
+                        for s in synthetic_segments(text) if s["end"] > start and s["start"] < end
+                    ]
+                    text = " ".join(s["text"].strip() for s in segments)
+                if b"verbose_json" not in body:
+                    return self._json(200, {"text": text})
+                self._json(200, {"text": text, "segments": segments})
+
+            def _chat(self, request: Dict[str, Any]) -> None:
+                time.sleep(fake.llm_latency)
+                if fake._fail(fake.llm_error_rate, "chat"):
+                    return self._error()
+                text = fake._completion_text()
+                base = {"id": "fake", "created": int(time.time()), "model": request.get("model", "fake")}
+                if not request.get("stream"):
+                    return self._json(200, {
+                        **base, "object": "chat.completion",
+                        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": len(text.split())}
+                    })
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                words = text.split(" ")
+                for i in range(0, len(words), 8):
+                    delta = (" " if i else "") + " ".join(words[i:i + 8])
+                    chunk = {**base, "object": "chat.completion.chunk",
+                             "choices": [{"index": 0, "delta": {"role": "assistant", "content": delta}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                final = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self.close_connection = True
+
+        return Handler
+
+class FakeDDGS:
+    """Imita ``duckduckgo_search.DDGS`` com latência e taxa de erros configuráveis."""
+
+    latency = 0.4
+    error_rate = 0.0
+    _rng = random.Random(0)
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        pass
+
+    def text(self, query: str, max_results: int = 5) -> List[Dict[str, str]]:
+        time.sleep(self.latency)
+        if self._rng.random() < self.error_rate:
+            raise RuntimeError("Ratelimit (busca falsa)")
+        return [
+            {
+                "title": f"Notícia {i + 1} sobre {query}",
+                "body": synthetic_transcript(0.3, seed=i),
+                "href": f"https://example.com/noticia-{i + 1}"
+            }
+            for i in range(max_results)
+        ]
+
+class HashEncoder:
+    """Substitui o SentenceTransformer: vetores determinísticos a partir de hashes das palavras."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts: List[str], batch_size: int = 64, show_progress_bar: bool = False, **kwargs: Any) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+                vectors[row, int.from_bytes(digest[:4], "little") % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+_FAKE_YTDLP = r'''#!{python}
+import json, os, re, sys
+args = sys.argv[1:]
+outputs = [args[i + 1] for i, arg in enumerate(args) if arg == "-o"]
+video_id = args[-1][-11:]
+match = re.match(r"bench(\d{{3}})m(\d{{2}})", video_id)
+clip = re.match(r"c(\d{{3}})(\d)(\d{{3}})(\d{{3}})$", video_id)
+minutes, seed = (int(match.group(1)), int(match.group(2))) if match else (1, 0)
+# ~48 kbps de áudio "nativo"; o marcador diz ao Whisper falso o que transcrever
+audio = b"FAKEAUDIO:%d:%d" % (minutes, seed) + b"\0" * (minutes * 360000)
+if clip:
+    # Corte de outro vídeo: o marcador leva o trecho, em segundos do original
+    minutes, seed, start, length = (int(g) for g in clip.groups())
+    audio = b"FAKEAUDIO:%d:%d:%.3f:%.3f" % (minutes, seed, start * 60, (start + length) * 60) + b"\0" * (length * 360000)
+    minutes = length
+for template in outputs:
+    if template == "-":
+        sys.stdout.buffer.write(audio)
+    elif template.startswith("infojson:"):
+        path = os.path.splitext(template[len("infojson:"):].replace("%(ext)s", "webm"))[0] + ".info.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({{"title": "Sessão " + video_id, "channel": "Canal Benchmark", "upload_date": "20240301",
+                       "duration": minutes * 60}}, f)
+'''
+
+_FAKE_FFMPEG = r'''#!{python}
+import re, sys
+args = sys.argv[1:]
+source = args[args.index("-i") + 1]
+audio = sys.stdin.buffer.read() if source == "pipe:0" else open(source, "rb").read()
+marker_end = audio.index(b"\0") if b"\0" in audio else len(audio)
+match = re.match(rb"FAKEAUDIO:(\d+):(\d+)(?::([\d.]+):([\d.]+))?", audio)
+minutes, seed = int(match.group(1)), int(match.group(2))
+base_start, base_end = (float(match.group(3)), float(match.group(4))) if match.group(3) else (0.0, minutes * 60.0)
+if "-af" in args:
+    sys.exit(0)  # silencedetect: nenhum silêncio
+if "-ss" in args or "-t" in args:
+    # Recorte: o intervalo é contado em segundos do áudio original
+    start = base_start + (float(args[args.index("-ss") + 1]) if "-ss" in args else 0.0)
+    end = min(base_end, start + float(args[args.index("-t") + 1])) if "-t" in args else base_end
+    if args[-1] != "-":
+        # Janela gravada em arquivo: o marcador passa a levar o intervalo
+        size = int((len(audio) - marker_end) * (end - start) / (base_end - base_start))
+        with open(args[-1], "wb") as f:
+            f.write(b"FAKEAUDIO:%d:%d:%.3f:%.3f" % (minutes, seed, start, end) + b"\0" * size)
+        sys.exit(0)
+    base_start, base_end = start, end
+if "-f" in args and args[args.index("-f") + 1] == "s16le":
+    # PCM: três tons por bloco de 0,25 s, sorteados pelo vídeo e pelo minuto do original
+    import numpy as np
+    rate = int(args[args.index("-ar") + 1])
+    first = int(round(base_start * rate))
+    last = int(round(base_end * rate))
+    position = first
+    while position < last:
+        minute = position // (60 * rate)
+        end = min(last, (minute + 1) * 60 * rate)
+        tones = np.random.default_rng([minutes, seed, minute]).uniform(
+            [150, 150, 150, 0.05, 0.05, 0.05], [3000, 3000, 3000, 0.3, 0.3, 0.3], size=(240, 6)
+        )
+        t = np.arange(position, end) / rate
+        block = tones[((t - 60 * minute) * 4).astype(np.int64)]
+        signal = sum(block[:, 3 + k] * np.sin(2 * np.pi * block[:, k] * t) for k in range(3))
+        sys.stdout.buffer.write((signal * 32767 / 1.2).astype("<i2").tobytes())
+        position = end
+    sys.exit(0)
+# Opus de fala a 24 kbps: metade do tamanho do stream de entrada
+with open(args[-1], "wb") as f:
+    f.write(audio[:marker_end] + b"\0" * ((len(audio) - marker_end) // 2))
+'''
+
+_FAKE_FFPROBE = r'''#!{python}
+import re, sys
+match = re.match(rb"FAKEAUDIO:(\d+):(\d+)(?::([\d.]+):([\d.]+))?", open(sys.argv[-1], "rb").read(64))
+print(float(match.group(4)) - float(match.group(3)) if match.group(3) else int(match.group(1)) * 60.0)
+'''
+
+def _install(directory: str, name: str, source: str) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source.format(python=sys.executable))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+def install_fake_ytdlp(directory: str) -> str:
+    """Grava um ``yt-dlp`` falso em ``directory``; ponha o diretório no início do PATH."""
+    return _install(directory, "yt-dlp", _FAKE_YTDLP)
+
+def install_fake_ffmpeg(directory: str) -> str:
+    """Grava ``ffmpeg`` e ``ffprobe`` falsos (conversão, recorte de janelas e duração) em ``directory``."""
+    _install(directory, "ffprobe", _FAKE_FFPROBE)
+    return _install(directory, "ffmpeg", _FAKE_FFMPEG)
@@ -0,0 +1,471 @@
+"""
+Índice de corpus com trechos de muitos vídeos, para buscas do tipo
+"o que este político disse sobre X nos últimos 200 vídeos".
+
+- Vetores: FAISS HNSW (aproximado, sem etapa de treino) dividido em
+  fragmentos de IDs contíguos, com uma cópia dos vetores em arquivo float32
+  mapeado em memória (uma linha por trecho).
+- Metadados: SQLite com índices em video_id, channel e published_at.
+
+Cada inclusão grava só um fragmento novo com os trechos incluídos; fragmentos
+vizinhos de tamanho parecido são fundidos depois (o maior é lido e recebe os
+vetores do menor), então há O(log n) fragmentos e nenhuma inclusão reescreve o
+corpus inteiro. Fragmentos com ``max_shard_rows`` trechos não crescem mais.
+Os fragmentos salvos são abertos com os vetores mapeados do disco, só para
+leitura, e um processo só lê os fragmentos que ainda não conhece.
+
+Buscas filtradas consultam primeiro o SQLite (usando os índices) e:
+- se sobram poucos candidatos, fazem busca exata só sobre eles;
+- caso contrário, usam o HNSW restrito aos candidatos (IDSelector).
+Nenhum dos caminhos percorre o corpus inteiro.
+
+Vários processos podem escrever no mesmo corpus (o app e os workers do
+batch_worker): cada inclusão segura uma trava de arquivo (``corpus.lock``),
+carrega os fragmentos salvos por outro processo e deriva os novos IDs deles.
+Os leitores carregam os fragmentos novos quando a lista salva muda.
+
+Cada inclusão grava primeiro as linhas no SQLite (numa transação ainda
+aberta), depois os vetores, faz o commit e só então salva o fragmento. Os
+fragmentos salvos são a referência: ao abrir, linhas e vetores além do último
+(restos de uma inclusão interrompida) são descartados, assim como fragmentos
+já cobertos por uma fusão que não chegou a apagá-los.
+"""
+
+import functools
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hybrid_retrieval import vectorstore_documents
+from storage import cache_dir, file_lock
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    channel TEXT,
+    published_at TEXT,
+    chunk_offset INTEGER,
+    text TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_video ON chunks(video_id);
+CREATE INDEX IF NOT EXISTS idx_chunks_channel_date ON chunks(channel, published_at);
+CREATE INDEX IF NOT EXISTS idx_chunks_date ON chunks(published_at);
+"""
+
+_SHARD_NAME = re.compile(r"^chunks\.(\d+)-(\d+)\.hnsw\.faiss$")
+
+def _shard_name(start: int, end: int) -> str:
+    return f"chunks.{start:010d}-{end:010d}.hnsw.faiss"
+
+@dataclass
+class _Shard:
+    """HNSW com os trechos ``start`` .. ``start + ntotal - 1``; ``name`` é None enquanto não foi salvo."""
+    start: int
+    index: Any
+    name: Optional[str] = None
+
+    @property
+    def end(self) -> int:
+        return self.start + self.index.ntotal
+
+class CorpusIndex:
+    """Índice vetorial incremental de trechos de transcrição com filtros por metadados."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        hnsw_m: int = 32,
+        ef_construction: int = 80,
+        ef_search: int = 64,
+        exact_search_threshold: int = 20000,
+        max_shard_rows: int = 1_000_000
+    ):
+        self.directory = directory or cache_dir("corpus")
+        os.makedirs(self.directory, exist_ok=True)
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.exact_search_threshold = exact_search_threshold
+        self.max_shard_rows = max_shard_rows
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(self.directory, "chunks.sqlite3"), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._shards: List[_Shard] = []
+        self._vectors: Optional[np.memmap] = None
+        self._dim: Optional[int] = None
+        self._index_stamp: Optional[tuple] = None
+        with file_lock(self._lock_path):
+            self._load()
+
+    @property
+    def _legacy_index_path(self) -> str:
+        # Índice único das versões anteriores; vira o primeiro fragmento
+        return os.path.join(self.directory, "chunks.hnsw.faiss")
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.directory, "chunks.f32")
+
+    @property
+    def _lock_path(self) -> str:
+        return os.path.join(self.directory, "corpus.lock")
+
+    def _saved_stamp(self) -> tuple:
+        return tuple(sorted(name for name in os.listdir(self.directory) if _SHARD_NAME.match(name)))
+
+    def _saved_shards(self) -> Tuple[List[Tuple[int, int, str]], List[str]]:
+        """Fragmentos salvos que cobrem os IDs desde 0 sem lacunas, e os que sobram (já fundidos ou órfãos)."""
+        found = []
+        for name in self._saved_stamp():
+            match = _SHARD_NAME.match(name)
+            found.append((int(match.group(1)), int(match.group(2)), name))
+        # Uma fusão interrompida deixa o fragmento fundido e os originais: vence o maior
+        found.sort(key=lambda shard: (shard[0], -shard[1]))
+        covered, stale, end = [], [], 0
+        for start, stop, name in found:
+            if start == end and stop > start:
+                covered.append((start, stop, name))
+                end = stop
+            else:
+                stale.append(name)
+        return covered, stale
+
+    def _read_shard(self, name: str) -> Any:
+        import faiss
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        index = faiss.read_index(os.path.join(self.directory, name), flags)
+        index.hnsw.efSearch = self.ef_search
+        return index
+
+    def _load(self, repair: bool = True) -> None:
+        """Lê os fragmentos salvos (reaproveitando os já abertos); com ``repair``
+        (só sob a trava de arquivo), descarta o que passou deles."""
+        if repair and os.path.exists(self._legacy_index_path) and not self._saved_stamp():
+            import faiss
+            ntotal = faiss.read_index(self._legacy_index_path).ntotal
+            os.replace(self._legacy_index_path, os.path.join(self.directory, _shard_name(0, ntotal)))
+        loaded = {shard.name: shard for shard in self._shards if shard.name}
+        covered, stale = self._saved_shards()
+        self._shards = [loaded.get(name) or _Shard(start, self._read_shard(name), name) for start, _, name in covered]
+        self._dim = self._shards[0].index.d if self._shards else None
+        self._vectors = None
+        self._index_stamp = self._saved_stamp()
+        if repair:
+            self._remove_shards(stale)
+            self._truncate(len(self))
+        if self._shards:
+            self._map_vectors()
+
+    def _refresh(self) -> None:
+        """Carrega os fragmentos que outro processo salvou depois da última leitura."""
+        if self._saved_stamp() != self._index_stamp:
+            with file_lock(self._lock_path):
+                self._load(repair=False)
+
+    def _remove_shards(self, names: Sequence[str]) -> None:
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                # Ainda mapeado por um leitor (Windows): sai na próxima abertura
+                pass
+        self._index_stamp = self._saved_stamp()
+
+    def _truncate(self, ntotal: int) -> None:
+        """Descarta linhas do SQLite e vetores além de ``ntotal`` (inclusão que não chegou a ser salva)."""
+        with self._db:
+            self._db.execute("DELETE FROM chunks WHERE id >= ?", (ntotal,))
+        if os.path.exists(self._vectors_path):
+            size = 4 * self._dim * ntotal if self._dim else 0
+            if os.path.getsize(self._vectors_path) > size:
+                with open(self._vectors_path, "r+b") as f:
+                    f.truncate(size)
+
+    def _map_vectors(self) -> None:
+        # Só as linhas dos fragmentos carregados: o que vem depois pode ser descartado por outro processo
+        rows = min(os.path.getsize(self._vectors_path) // (4 * self._dim), len(self))
+        self._vectors = np.memmap(self._vectors_path, dtype="float32", mode="r", shape=(rows, self._dim))
+
+    def __len__(self) -> int:
+        return self._shards[-1].end if self._shards else 0
+
+    def has_video(self, video_id: str) -> bool:
+        row = self._db.execute("SELECT 1 FROM chunks WHERE video_id = ? AND deleted = 0 LIMIT 1", (video_id,)).fetchone()
+        return row is not None
+
+    def add_chunks(
+        self,
+        video_id: str,
+        texts: Sequence[str],
+        vectors: Any,
+        offsets: Optional[Sequence[int]] = None,
+        channel: Optional[str] = None,
+        published_at: Optional[str] = None,
+        replace: bool = False,
+        save: bool = True
+    ) -> int:
+        """Adiciona os trechos de um vídeo. Retorna quantos foram adicionados.
+
+        Vídeos já presentes são ignorados, a menos que ``replace=True`` (nesse
+        caso os trechos antigos são marcados como removidos). Com
+        ``save=False`` os trechos ficam num fragmento em memória até ``save()``
+        (só para cargas de um único processo: outro processo que escreva antes
+        disso descarta esses trechos).
+        """
+        import faiss
+
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if len(texts) == 0:
+            return 0
+        if offsets is None:
+            offsets = list(range(len(texts)))
+
+        with self._lock, file_lock(self._lock_path):
+            # Fragmentos salvos por outro processo (e sem sobras de inclusões interrompidas)
+            if self._saved_stamp() != self._index_stamp:
+                self._load()
+            else:
+                self._truncate(len(self))
+            if self.has_video(video_id) and not replace:
+                return 0
+
+            # Os IDs são sequenciais entre os fragmentos e coincidem com a linha no SQLite e no arquivo de vetores
+            first_id = len(self)
+            try:
+                # Linhas primeiro, numa transação: se falharem, nada foi gravado nos vetores
+                if replace:
+                    self._db.execute("UPDATE chunks SET deleted = 1 WHERE video_id = ?", (video_id,))
+                self._db.executemany(
+                    "INSERT INTO chunks (id, video_id, channel, published_at, chunk_offset, text) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (first_id + i, video_id, channel, published_at, int(offset), text)
+                        for i, (text, offset) in enumerate(zip(texts, offsets))
+                    ]
+                )
+
+                if self._dim is None:
+                    self._dim = vectors.shape[1]
+                with open(self._vectors_path, "ab") as f:
+                    # Sobras de uma inclusão interrompida ficam além de first_id
+                    f.truncate(4 * self._dim * first_id)
+                    f.write(vectors.tobytes())
+                if not self._shards or self._shards[-1].name is not None:
+                    index = faiss.IndexHNSWFlat(self._dim, self.hnsw_m)
+                    index.hnsw.efConstruction = self.ef_construction
+                    index.hnsw.efSearch = self.ef_search
+                    self._shards.append(_Shard(first_id, index))
+                self._shards[-1].index.add(vectors)
+                self._db.commit()
+            except BaseException:
+                # Volta ao estado salvo em disco
+                self._db.rollback()
+                self._load()
+                raise
+            self._map_vectors()
+            if save:
+                self._save()
+        return len(texts)
+
+    def add_vectorstore(self, video_id: str, vectorstore: Any, **metadata: Any) -> int:
+        """Copia trechos e vetores de um índice FAISS do langchain (um vídeo) para o corpus."""
+        ntotal = vectorstore.index.ntotal
+        vectors = vectorstore.index.reconstruct_n(0, ntotal)
+        docs = vectorstore_documents(vectorstore)
+        offsets = [doc.metadata.get("start_index", i) for i, doc in enumerate(docs)]
+        return self.add_chunks(video_id, [doc.page_content for doc in docs], vectors, offsets=offsets, **metadata)
+
+    def save(self) -> None:
+        with self._lock, file_lock(self._lock_path):
+            self._save()
+
+    def _write_shard(self, shard: _Shard) -> None:
+        import faiss
+        name = _shard_name(shard.start, shard.end)
+        tmp_path = os.path.join(self.directory, name + ".tmp")
+        faiss.write_index(shard.index, tmp_path)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+        shard.name = name
+
+    def _save(self) -> None:
+        """Salva o fragmento em memória e funde os últimos enquanto tiverem tamanhos parecidos."""
+        if not self._shards or self._shards[-1].name is not None:
+            return
+        self._write_shard(self._shards[-1])
+        while len(self._shards) > 1:
+            left, right = self._shards[-2], self._shards[-1]
+            size = right.end - left.start
+            if left.index.ntotal > 2 * right.index.ntotal or size > self.max_shard_rows:
+                break
+            self._shards[-2:] = [self._merge(left, right)]
+        self._index_stamp = self._saved_stamp()
+
+    def _merge(self, left: _Shard, right: _Shard) -> _Shard:
+        """Fragmento com ``left`` e ``right``: lê ``left`` do disco e insere só os vetores de ``right``."""
+        import faiss
+        index = faiss.read_index(os.path.join(self.directory, left.name))
+        index.hnsw.efConstruction = self.ef_construction
+        index.hnsw.efSearch = self.ef_search
+        index.add(np.ascontiguousarray(self._vectors[right.start:right.end]))
+        merged = _Shard(left.start, index)
+        self._write_shard(merged)
+        # O fundido já cobre os dois: apagar os originais pode falhar sem prejuízo
+        self._remove_shards([left.name, right.name])
+        merged.index = self._read_shard(merged.name)
+        return merged
+
+    def _candidate_ids(
+        self,
+        video_id: Optional[str],
+        channel: Optional[str],
+        date_from: Optional[str],
+        date_to: Optional[str]
+    ) -> np.ndarray:
+        # Linhas já gravadas por outro processo, mas ainda fora do índice salvo, ficam de fora
+        clauses, params = ["deleted = 0", "id < ?"], [len(self)]
+        if video_id:
+            clauses.append("video_id = ?")
+            params.append(video_id)
+        if channel:
+            clauses.append("channel = ?")
+            params.append(channel)
+        if date_from:
+            clauses.append("published_at >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("published_at <= ?")
+            params.append(date_to)
+        rows = self._db.execute(f"SELECT id FROM chunks WHERE {' AND '.join(clauses)}", params).fetchall()
+        return np.fromiter((r[0] for r in rows), dtype="int64", count=len(rows))
+
+    def _exact_search(self, queries: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = np.asarray(self._vectors[ids])
+        distances = (
+            (vectors ** 2).sum(axis=1)[None, :] - 2 * queries @ vectors.T + (queries ** 2).sum(axis=1)[:, None]
+        )
+        top = np.argsort(distances, axis=1)[:, :k]
+        return np.take_along_axis(distances, top, axis=1), ids[top]
+
+    def _search_shards(self, queries: np.ndarray, k: int, ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Os ``k`` mais próximos de cada consulta entre todos os fragmentos (restritos a ``ids``, se houver)."""
+        import faiss
+
+        found_d, found_l = [], []
+        for shard in self._shards:
+            if ids is None:
+                distances, labels = shard.index.search(queries, k)
+            else:
+                local = ids[(ids >= shard.start) & (ids < shard.end)] - shard.start
+                if len(local) == 0:
+                    continue
+                params = faiss.SearchParametersHNSW(
+                    sel=faiss.IDSelectorBatch(local), efSearch=max(self.ef_search, 4 * k)
+                )
+                distances, labels = shard.index.search(queries, k, params=params)
+                # O HNSW restrito pode não achar vizinhos suficientes: busca exata nesse fragmento
+                missing = ((labels >= 0).sum(axis=1) < min(k, len(local))).nonzero()[0]
+                if len(missing):
+                    distances[missing], labels[missing] = np.inf, -1
+                    exact_d, exact_l = self._exact_search(queries[missing], local + shard.start, k)
+                    distances[missing, :exact_d.shape[1]] = exact_d
+                    labels[missing, :exact_l.shape[1]] = exact_l - shard.start
+            found_d.append(distances)
+            found_l.append(np.where(labels >= 0, labels + shard.start, -1))
+        distances = np.concatenate(found_d, axis=1)
+        labels = np.concatenate(found_l, axis=1)
+        distances = np.where(labels >= 0, distances, np.inf)
+        top = np.argsort(distances, axis=1)[:, :k]
+        return np.take_along_axis(distances, top, axis=1), np.take_along_axis(labels, top, axis=1)
+
+    def search(
+        self,
+        query_vector: Any,
+        k: int = 5,
+        video_id: Optional[str] = None,
+        channel: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Busca os ``k`` trechos mais próximos, opcionalmente filtrando por vídeo, canal e período."""
+        query = np.asarray(query_vector, dtype="float32").reshape(1, -1)
+        return self.search_batch(query, k=k, video_id=video_id, channel=channel, date_from=date_from, date_to=date_to)[0]
+
+    def search_batch(
+        self,
+        query_vectors: Any,
+        k: int = 5,
+        video_id: Optional[str] = None,
+        channel: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Como ``search`` para várias consultas com os mesmos filtros: os candidatos
+        são filtrados uma vez e cada fragmento recebe uma única busca com todas elas."""
+        queries = np.ascontiguousarray(np.asarray(query_vectors, dtype="float32").reshape(len(query_vectors), -1))
+        empty: List[List[Dict[str, Any]]] = [[] for _ in range(len(queries))]
+
+        with self._lock:
+            self._refresh()
+            if not self._shards or k <= 0 or len(queries) == 0:
+                return empty
+            if any((video_id, channel, date_from, date_to)):
+                ids = self._candidate_ids(video_id, channel, date_from, date_to)
+                if len(ids) == 0:
+                    return empty
+                if len(ids) <= self.exact_search_threshold:
+                    distances, labels = self._exact_search(queries, ids, k)
+                else:
+                    distances, labels = self._search_shards(queries, k, ids)
+            else:
+                # Pede mais resultados para compensar trechos marcados como removidos
+                distances, labels = self._search_shards(queries, 2 * k)
+
+            return [hits[:k] for hits in self._rows(labels, distances)]
+
+    def _rows(self, labels: np.ndarray, distances: np.ndarray) -> List[List[Dict[str, Any]]]:
+        """Trechos de cada linha de ``labels``, lidos do SQLite numa única consulta."""
+        found = sorted({int(l) for l in labels.ravel() if l >= 0})
+        by_id = {}
+        if found:
+            placeholders = ",".join("?" * len(found))
+            rows = self._db.execute(
+                f"SELECT id, video_id, channel, published_at, chunk_offset, text FROM chunks "
+                f"WHERE deleted = 0 AND id IN ({placeholders})",
+                found
+            ).fetchall()
+            by_id = {row[0]: row for row in rows}
+        results = []
+        for query_labels, query_distances in zip(labels, distances):
+            hits = []
+            for label, distance in zip(query_labels, query_distances):
+                row = by_id.get(int(label))
+                if row is None:
+                    continue
+                hits.append({
+                    "text": row[5],
+                    "score": float(distance),
+                    "video_id": row[1],
+                    "channel": row[2],
+                    "published_at": row[3],
+                    "chunk_offset": row[4]
+                })
+            results.append(hits)
+        return results
+
+_instance_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def _create_corpus_index() -> CorpusIndex:
+    return CorpusIndex()
+
+def get_corpus_index() -> CorpusIndex:
+    """Índice de corpus único por processo."""
+    with _instance_lock:
+        return _create_corpus_index()
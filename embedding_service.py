@@ -0,0 +1,154 @@
+"""
+Serviço de embeddings compartilhado pelo processo.
+
+O modelo sentence-transformers é carregado uma única vez (sob demanda) e as
+requisições de várias sessões são agrupadas em lotes por uma thread de
+trabalho, em vez de cada chamada instanciar seu próprio HuggingFaceEmbeddings.
+"""
+
+import functools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from tracing import span
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+class EmbeddingService(Embeddings):
+    """Embeddings do langchain com modelo único e codificação em lotes.
+
+    Requisições que chegam dentro de ``max_wait_ms`` umas das outras são
+    codificadas juntas, até ``batch_size`` textos por lote.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        batch_size: int = 64,
+        num_threads: Optional[int] = None,
+        max_wait_ms: float = 5.0,
+        device: str = "cpu"
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.max_wait = max_wait_ms / 1000.0
+        self.device = device
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"texts": 0, "batches": 0, "requests": 0, "encode_seconds": 0.0, "load_seconds": 0.0}
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    if self.num_threads:
+                        import torch
+                        torch.set_num_threads(self.num_threads)
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+                    self._stats["load_seconds"] = time.perf_counter() - start
+        return self._model
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            pending = [self._queue.get()]
+            count = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while count < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(request)
+                count += len(request[0])
+            self._encode_pending(pending)
+
+    def _encode_pending(self, pending: List[tuple]) -> None:
+        texts = [text for request_texts, _ in pending for text in request_texts]
+        try:
+            start = time.perf_counter()
+            vectors = self.model.encode(texts, batch_size=self.batch_size, show_progress_bar=False)
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        with self._stats_lock:
+            self._stats["texts"] += len(texts)
+            self._stats["batches"] += 1
+            self._stats["requests"] += len(pending)
+            self._stats["encode_seconds"] += elapsed
+
+        offset = 0
+        for request_texts, future in pending:
+            future.set_result([v.tolist() for v in vectors[offset:offset + len(request_texts)]])
+            offset += len(request_texts)
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        self._ensure_worker()
+        # Inclui a espera pelo lote e o carregamento do modelo na primeira chamada
+        with span("embedding.encode", items=len(texts), input_bytes=sum(len(t) for t in texts)):
+            future: Future = Future()
+            self._queue.put((list(texts), future))
+            return future.result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Várias perguntas num único lote do modelo."""
+        return self.encode(texts)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        seconds = stats["encode_seconds"]
+        stats["chunks_per_sec"] = stats["texts"] / seconds if seconds else 0.0
+        stats["model_loaded"] = self._model is not None
+        return stats
+
+_instance_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
+def _service_for(model_name: str) -> EmbeddingService:
+    threads = os.getenv("EMBEDDING_THREADS")
+    return EmbeddingService(
+        model_name=model_name,
+        batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+        num_threads=int(threads) if threads else None,
+        max_wait_ms=float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+    )
+
+def get_embedding_service(model_name: Optional[str] = None) -> EmbeddingService:
+    """Instância única por modelo no processo, configurável por variáveis de ambiente."""
+    with _instance_lock:
+        return _service_for(model_name or os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL))
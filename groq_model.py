@@ -1,15 +1,24 @@
 # Versão corrigida do groq_model.py com ajuste de sintaxe no bloco Code:
 # Inclui tratamento de prompts longos e formatação segura para CoT
 
-from typing import Any, List
-import groq
+from typing import Any, Iterator, Optional
+from api_clients import get_groq_client
+from llm_cache import cached_completion, cached_stream
+from rate_limiter import get_rate_limiter, request_tokens
+from token_budget import count_tokens, prompt_budget, truncate_to_tokens
 from dataclasses import dataclass
 import os
 
+# Tamanho de cada trecho enviado para resumo, em tokens
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "6000"))
+# Abaixo disso (~3000 caracteres) a transcrição é exibida sem resumo
+SUMMARY_MIN_TOKENS = int(os.getenv("SUMMARY_MIN_TOKENS", "750"))
+
 @dataclass
 class ChatMessage:
     role: str
     content: str
+    error: Optional[str] = None
 
 class GroqModel:
     def __init__(
@@ -18,74 +27,132 @@ class GroqModel:
         model: str = "deepseek-r1-distill-llama-70b",
         temperature: float = 0.3,
         max_tokens: int = 2048,
-        max_prompt_chars: int = 15000,
-        agent_description: str = None
+        max_prompt_tokens: Optional[int] = None,
+        agent_description: str = None,
+        use_cache: bool = True
     ):
         self.api_key = api_key
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
-        self.max_prompt_chars = max_prompt_chars
+        # Por padrão, o que cabe na janela do modelo descontando a resposta
+        self.max_prompt_tokens = max_prompt_tokens or prompt_budget(model, max_tokens)
         self.agent_description = agent_description or os.getenv(
             "AGENT_DESCRIPTION",
             "Agente de IA para análise de vídeos jornalísticos."
         )
-        self.client = groq.Client(api_key=self.api_key)
+        self.use_cache = use_cache
+        # Cliente compartilhado com pool keep-alive; as novas tentativas ficam com o limitador
+        self.client = get_groq_client(self.api_key)
+        self.rate_limiter = get_rate_limiter("groq", model)
+
+    def _prepare_prompt(self, prompt: Any) -> str:
+        if isinstance(prompt, list):
+            prompt = "\n".join(str(p) for p in prompt)
+
+        if isinstance(prompt, str) and count_tokens(prompt) > self.max_prompt_tokens:
+            header = (
+                f"Thought: O prompt é muito longo. Truncando para evitar erro.\n\n"
+                f"Code:\n```python\nprompt = truncate_to_tokens(prompt, {self.max_prompt_tokens})\n```\n"
+                f"<end_code>\nObservation: Prompt truncado com sucesso.\n\n"
+            )
+            prompt = header + truncate_to_tokens(prompt, self.max_prompt_tokens - count_tokens(header))
+
+        return self._sanitize_code_blocks(prompt)
 
     def __call__(self, prompt: str, **kwargs) -> Any:
         try:
             kwargs.pop("stop_sequences", None)
+            use_cache = kwargs.pop("use_cache", self.use_cache)
+            prompt = self._prepare_prompt(prompt)
 
-            if isinstance(prompt, list):
-                prompt = "\n".join(str(p) for p in prompt)
-
-            if isinstance(prompt, str) and len(prompt) > self.max_prompt_chars:
-                prompt = (
-                    f"Thought: O prompt é muito longo. Truncando para evitar erro.\n\n"
-                    f"Code:\n```python\nprompt = prompt[:{self.max_prompt_chars}] + "
-                    "\"\\n[Texto truncado para atender limite de tokens da Groq]\"\n```\n"
-                    f"<end_code>\nObservation: Prompt truncado com sucesso.\n\n"
-                    f"{prompt[:self.max_prompt_chars]}"
+            def complete() -> str:
+                response = self.rate_limiter.call(
+                    lambda: self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=self.temperature,
+                        max_tokens=self.max_tokens,
+                        **kwargs
+                    ),
+                    tokens=request_tokens(prompt, self.max_tokens)
                 )
+                return str(response.choices[0].message.content).strip()
 
-            prompt = self._sanitize_code_blocks(prompt)
-
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                **kwargs
+            # Respostas idênticas vêm do cache; parâmetros extras entram na chave
+            content = cached_completion(
+                [prompt, kwargs] if kwargs else prompt,
+                self.model,
+                self.temperature,
+                self.max_tokens,
+                complete,
+                use_cache=use_cache
             )
-            content = str(response.choices[0].message.content).strip()
             return ChatMessage(role="assistant", content=content)
 
         except Exception as e:
-            return ChatMessage(role="assistant", content=f"Erro ao executar modelo Groq: {str(e)}")
+            # O erro vai só em ``error``: o texto nunca deve passar por resposta do modelo
+            return ChatMessage(
+                role="assistant",
+                content="",
+                error=f"Erro ao executar modelo Groq: {str(e)}"
+            )
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Gera os trechos da resposta à medida que chegam da Groq.
+
+        O CodeAgent continua usando __call__; este método serve à interface,
+        que pode exibir os tokens assim que são gerados. Erros são lançados
+        como exceção (nunca como texto da resposta) e, como o stream não
+        termina, nada vai para o cache.
+        """
+        kwargs.pop("stop_sequences", None)
+        use_cache = kwargs.pop("use_cache", self.use_cache)
+        prompt = self._prepare_prompt(prompt)
+
+        def deltas() -> Iterator[str]:
+            response = self.rate_limiter.call_stream(
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True,
+                    **kwargs
+                ),
+                tokens=request_tokens(prompt, self.max_tokens)
+            )
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        yield from cached_stream(
+            [prompt, kwargs] if kwargs else prompt,
+            self.model,
+            self.temperature,
+            self.max_tokens,
+            deltas,
+            use_cache=use_cache
+        )
 
     def _sanitize_code_blocks(self, text: str) -> str:
         if '```' in text and '<end_code>' not in text:
             return text + '\n<end_code>'
         return text
 
-def chunk_text(text: str, max_chars: int = 3000) -> List[str]:
-    return [text[i:i+max_chars] for i in range(0, len(text), max_chars)]
-
-def summarize_chunks(chunks: List[str], summarizer_model: Any, language: str = "português") -> str:
-    summaries = []
-    for i, chunk in enumerate(chunks):
-        structured_prompt = f"""
-Thought: Preciso resumir o trecho de vídeo abaixo em {language} de forma clara.
-
-Code:
-```py
-texto = {repr(chunk)}
-summarize(texto)
-```
-<end_code>
-"""
-        summary = summarizer_model(structured_prompt)
-        summaries.append(summary.content if hasattr(summary, 'content') else str(summary))
-    return "\n\n".join(summaries)
+def complete_or_raise(prompt: str, model: Any) -> str:
+    """Chama o modelo uma vez; lança RuntimeError se a resposta vier com erro.
+
+    As novas tentativas de erros transitórios (429, 5xx, rede) ficam só com o
+    rate limiter, dentro da chamada; erros permanentes (401, modelo inválido)
+    não são repetidos.
+    """
+    response = model(prompt)
+    error = getattr(response, "error", None)
+    if error:
+        raise RuntimeError(error)
+    return response.content if hasattr(response, 'content') else str(response)
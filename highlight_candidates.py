@@ -0,0 +1,190 @@
+"""
+Pré-seleção local (CPU) dos trechos da transcrição enviados ao JournalisticHighlightTool.
+
+A transcrição inteira no prompt deixa a chamada lenta e cara em vídeos longos
+— e acaba truncada de qualquer forma. Aqui a transcrição é dividida em
+passagens de ~``PASSAGE_TOKENS`` tokens, cada uma pontuada por três sinais
+baratos:
+
+- verificabilidade: densidade de números, valores, datas, nomes próprios e
+  siglas, citações e afirmações absolutas ("recorde", "nunca", "o maior");
+- relação com o noticiário: BM25 dos termos dos resultados da busca na web
+  sobre as passagens;
+- raridade: IDF médio dos termos da passagem dentro do próprio vídeo (o que o
+  vídeo diz uma vez só costuma ser mais novo do que o que repete).
+
+As passagens são escolhidas por MMR (pontuação menos a semelhança com as já
+escolhidas, para não mandar cinco vezes o mesmo assunto) até encher um
+orçamento fixo de tokens e voltam à ordem do vídeo, com a marcação [m:ss]
+mais próxima. O prompt fica do mesmo tamanho seja qual for a duração do vídeo.
+"""
+
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from hybrid_retrieval import BM25Index
+from token_budget import chunk_by_tokens, count_tokens
+from tracing import span
+
+PASSAGE_TOKENS = 160
+HIGHLIGHT_CONTEXT_TOKENS = int(os.getenv("HIGHLIGHT_CONTEXT_TOKENS", "6000"))
+# Peso de cada sinal na pontuação e da redundância no MMR
+CLAIM_WEIGHT = 0.45
+SEARCH_WEIGHT = 0.35
+RARITY_WEIGHT = 0.2
+REDUNDANCY_PENALTY = 0.5
+OMISSION_MARKER = "[…]"
+
+_MARKER_RE = re.compile(r"\[(?:\d+:)?\d{1,2}:\d{2}\]")
+_MONTHS = "janeiro|fevereiro|março|abril|maio|junho|julho|agosto|setembro|outubro|novembro|dezembro"
+_CLAIM_PATTERNS = [
+    # Números, valores e percentuais
+    (re.compile(r"R\$\s*\d|\d+(?:[.,]\d+)*\s*(?:%|por cento|mil\b|milh|bilh|trilh)", re.IGNORECASE), 2.0),
+    (re.compile(r"\b\d+(?:[.,/]\d+)*\b"), 1.0),
+    # Datas
+    (re.compile(rf"\b(?:\d{{1,2}} de (?:{_MONTHS})|(?:{_MONTHS})(?: de \d{{4}})?|(?:19|20)\d{{2}})\b", re.IGNORECASE), 1.5),
+    # Citações e atribuições
+    (re.compile(r"[\"“”«»]|\b(?:disse|afirmou|declarou|segundo|de acordo com)\b", re.IGNORECASE), 1.5),
+    # Afirmações absolutas, comparativas ou de variação, as mais checadas por agências
+    (re.compile(
+        r"\b(?:recorde|nunca|jamais|sempre|nenhum|nenhuma|tod[oa]s|maior|menor|pior|melhor|únic[oa]|primeir[oa]|"
+        r"dobr\w+|triplic\w+|aument\w+|reduz\w+|redução|cresc\w+|caiu|queda|subiu)\b",
+        re.IGNORECASE
+    ), 1.0),
+    # Siglas (órgãos, partidos, empresas)
+    (re.compile(r"\b[A-ZÁÉÍÓÚÂÊÔÃÕÇ]{2,}\b"), 1.0),
+]
+# Nomes próprios: palavra capitalizada que não abre frase
+_NAME_RE = re.compile(r"(?<![.!?…]\s)(?<!^)(?<=\s)[A-ZÁÉÍÓÚÂÊÔÃÕÇ][a-záéíóúâêôãõçà]+")
+
+@dataclass
+class Passage:
+    """Trecho da transcrição com a posição no texto, a marcação de tempo mais próxima e a pontuação."""
+
+    text: str
+    start: int
+    tokens: int
+    marker: str = ""
+    score: float = 0.0
+
+def claim_score(text: str, tokens: int) -> float:
+    """Sinais de afirmação verificável por 100 tokens."""
+    hits = sum(weight * len(pattern.findall(text)) for pattern, weight in _CLAIM_PATTERNS)
+    hits += len(_NAME_RE.findall(text))
+    return 100.0 * hits / max(1, tokens)
+
+def split_passages(text: str, passage_tokens: int = PASSAGE_TOKENS) -> List[Passage]:
+    """Passagens de frases inteiras, com o deslocamento no texto e a última marcação [m:ss] antes delas."""
+    markers = [(m.start(), m.group(0)) for m in _MARKER_RE.finditer(text)]
+    passages: List[Passage] = []
+    cursor = 0
+    marker_index = -1
+    for chunk in chunk_by_tokens(text, passage_tokens):
+        # chunk_by_tokens normaliza os espaços entre frases: localiza pelo começo do trecho
+        found = text.find(chunk[:40], cursor)
+        start = found if found >= 0 else cursor
+        while marker_index + 1 < len(markers) and markers[marker_index + 1][0] <= start:
+            marker_index += 1
+        marker = markers[marker_index][1] if marker_index >= 0 and not _MARKER_RE.match(chunk) else ""
+        passages.append(Passage(chunk, start, count_tokens(f"{marker} {chunk}" if marker else chunk), marker))
+        cursor = start + 1
+    return passages
+
+def _normalized(values: Sequence[float]) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    spread = values.max() - values.min() if len(values) else 0.0
+    return (values - values.min()) / spread if spread > 0 else np.zeros(len(values))
+
+def score_passages(passages: List[Passage], search_results: str = "") -> List[set]:
+    """Pontua as passagens (``Passage.score``, entre 0 e 1) e devolve os termos de cada uma."""
+    texts = [_MARKER_RE.sub("", p.text) for p in passages]
+    bm25 = BM25Index.build(texts)
+    # Termos de cada passagem a partir das listas invertidas, sem tokenizar de novo
+    terms: List[set] = [set() for _ in passages]
+    for term, postings in bm25.postings.items():
+        for doc_id, _ in postings:
+            terms[doc_id].add(term)
+
+    claims = _normalized([claim_score(text, p.tokens) for text, p in zip(texts, passages)])
+    relevance = np.zeros(len(passages))
+    if search_results.strip():
+        for doc_id, score in bm25.search(search_results, k=len(passages)):
+            relevance[doc_id] = score
+        relevance = _normalized(relevance)
+    rarity = _normalized([
+        sum(bm25.idf.get(term, 0.0) for term in words) / math.sqrt(len(words)) if words else 0.0
+        for words in terms
+    ])
+
+    weights = np.array([CLAIM_WEIGHT, SEARCH_WEIGHT if search_results.strip() else 0.0, RARITY_WEIGHT])
+    scores = (weights[0] * claims + weights[1] * relevance + weights[2] * rarity) / weights.sum()
+    for passage, score in zip(passages, scores):
+        passage.score = float(score)
+    return terms
+
+def select_passages(
+    passages: List[Passage],
+    terms: List[set],
+    max_tokens: int,
+    redundancy_penalty: float = REDUNDANCY_PENALTY,
+    separator_tokens: int = 0
+) -> List[Passage]:
+    """Escolhe por MMR até ``max_tokens`` (cada passagem custa os seus tokens mais ``separator_tokens``).
+
+    Devolve na ordem do vídeo.
+    """
+    remaining = set(range(len(passages)))
+    chosen: List[int] = []
+    used = 0
+    redundancy = np.zeros(len(passages))
+    while remaining:
+        best = max(remaining, key=lambda i: passages[i].score - redundancy_penalty * redundancy[i])
+        remaining.discard(best)
+        cost = passages[best].tokens + separator_tokens
+        if used + cost > max_tokens:
+            continue
+        chosen.append(best)
+        used += cost
+        # Semelhança (Jaccard) com a passagem escolhida: o máximo vale como redundância
+        for i in remaining:
+            union = len(terms[i] | terms[best])
+            if union:
+                redundancy[i] = max(redundancy[i], len(terms[i] & terms[best]) / union)
+    return [passages[i] for i in sorted(chosen)]
+
+def render_passages(passages: List[Passage], all_passages: Optional[List[Passage]] = None) -> str:
+    """Passagens em ordem, com a marcação [m:ss] e ``OMISSION_MARKER`` onde houve cortes."""
+    positions = {id(p): i for i, p in enumerate(all_passages)} if all_passages is not None else {}
+    parts = []
+    previous: Optional[int] = None
+    for passage in passages:
+        index = positions.get(id(passage))
+        if parts and (index is None or previous is None or index != previous + 1):
+            parts.append(OMISSION_MARKER)
+        parts.append(f"{passage.marker} {passage.text}".strip() if passage.marker else passage.text)
+        previous = index
+    return "\n\n".join(parts)
+
+def preselect(text: str, search_results: str = "", max_tokens: int = HIGHLIGHT_CONTEXT_TOKENS) -> str:
+    """Transcrição reduzida às passagens mais promissoras dentro de ``max_tokens``.
+
+    Textos que já cabem no orçamento voltam inalterados.
+    """
+    total = count_tokens(text)
+    if total <= max_tokens:
+        return text
+    with span("highlights.preselect", input_tokens=total) as current:
+        passages = split_passages(text)
+        terms = score_passages(passages, search_results)
+        # Cada passagem pode vir depois de um marcador de omissão, entre linhas em branco
+        selected = select_passages(
+            passages, terms, max_tokens, separator_tokens=count_tokens(f"\n\n{OMISSION_MARKER}\n\n")
+        )
+        result = render_passages(selected, passages)
+        current.set(items=len(passages), selected=len(selected), output_tokens=count_tokens(result))
+        return result
@@ -0,0 +1,201 @@
+"""
+Recuperação híbrida para o RAG: BM25 (índice invertido pré-calculado) + busca
+vetorial FAISS, combinadas por Reciprocal Rank Fusion e, opcionalmente,
+reordenadas por um cross-encoder local dentro de um orçamento de tempo.
+
+A busca lexical encontra nomes próprios, números de processo e termos exatos
+que a busca densa costuma perder.
+"""
+
+import functools
+import json
+import math
+import os
+import re
+import time
+import unicodedata
+import weakref
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+_TOKEN_RE = re.compile(r"\w+(?:[./-]\w+)*")
+_STOPWORDS = frozenset(
+    "a o as os um uma uns umas de da do das dos em na no nas nos por para com sem "
+    "e ou que se ao aos à às é foi ser são era como mas mais muito já também isso "
+    "esse essa este esta isto ele ela eles elas eu nós você vocês lhe seu sua não sim".split()
+)
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+_FOLDED_STOPWORDS = frozenset(_fold(w) for w in _STOPWORDS)
+
+def tokenize(text: str) -> List[str]:
+    """Tokens em minúsculas e sem acentos; números compostos (ex.: 1.234/2023) ficam inteiros."""
+    return [t for t in _TOKEN_RE.findall(_fold(text)) if t not in _FOLDED_STOPWORDS]
+
+class BM25Index:
+    """Índice invertido com pontuação BM25 (Okapi)."""
+
+    def __init__(self, postings: Dict[str, List[List[int]]], doc_lens: List[int], k1: float = 1.5, b: float = 0.75):
+        self.postings = postings
+        self.doc_lens = doc_lens
+        self.k1 = k1
+        self.b = b
+        self._update_stats()
+
+    def _update_stats(self) -> None:
+        self.avgdl = (sum(self.doc_lens) / len(self.doc_lens)) if self.doc_lens else 0.0
+        n = len(self.doc_lens)
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    @classmethod
+    def build(cls, texts: Sequence[str], **kwargs: Any) -> "BM25Index":
+        index = cls({}, [], **kwargs)
+        index.extend(texts)
+        return index
+
+    def extend(self, texts: Sequence[str]) -> None:
+        """Acrescenta documentos (IDs seguintes aos atuais) e recalcula as estatísticas."""
+        for doc_id, text in enumerate(texts, start=len(self.doc_lens)):
+            tokens = tokenize(text)
+            self.doc_lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings.setdefault(term, []).append([doc_id, tf])
+        self._update_stats()
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Retorna [(doc_id, score)] percorrendo só as listas dos termos da pergunta."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lens[doc_id] / (self.avgdl or 1.0))
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "doc_lens": self.doc_lens, "postings": self.postings}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["postings"], data["doc_lens"], k1=data["k1"], b=data["b"])
+
+def vectorstore_documents(vectorstore: Any) -> List[Any]:
+    """Documentos do FAISS do langchain na mesma ordem das posições do índice."""
+    return [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+        for i in range(vectorstore.index.ntotal)
+    ]
+
+# BM25 associado a cada vectorstore carregado (liberado junto com ele)
+_bm25_by_store: "weakref.WeakKeyDictionary[Any, BM25Index]" = weakref.WeakKeyDictionary()
+
+def attach_bm25(vectorstore: Any, bm25: BM25Index) -> None:
+    _bm25_by_store[vectorstore] = bm25
+
+def bm25_for(vectorstore: Any) -> BM25Index:
+    """BM25 do vectorstore; constrói a partir do docstore se ainda não houver um salvo."""
+    bm25 = _bm25_by_store.get(vectorstore)
+    if bm25 is None:
+        bm25 = BM25Index.build([doc.page_content for doc in vectorstore_documents(vectorstore)])
+        attach_bm25(vectorstore, bm25)
+    return bm25
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[int]:
+    """Combina listas ordenadas de IDs somando 1 / (k + posição)."""
+    scores: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: item[1], reverse=True)]
+
+@functools.lru_cache(maxsize=1)
+def get_reranker() -> Optional[Any]:
+    """Cross-encoder local definido por RERANKER_MODEL; None se desativado."""
+    model_name = os.getenv("RERANKER_MODEL")
+    if not model_name:
+        return None
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name, device="cpu")
+
+def rerank(
+    question: str,
+    candidates: List[Tuple[int, str]],
+    budget_ms: float,
+    reranker: Any,
+    batch_size: int = 8
+) -> List[int]:
+    """Reordena candidatos com o cross-encoder enquanto houver orçamento de tempo.
+
+    Candidatos não avaliados a tempo mantêm a ordem da fusão, depois dos avaliados.
+    """
+    deadline = time.perf_counter() + budget_ms / 1000.0
+    scored: List[Tuple[float, int]] = []
+    position = 0
+    while position < len(candidates) and time.perf_counter() < deadline:
+        batch = candidates[position:position + batch_size]
+        scores = reranker.predict([(question, text) for _, text in batch])
+        scored.extend((float(score), doc_id) for score, (doc_id, _) in zip(scores, batch))
+        position += len(batch)
+    ranked = [doc_id for _, doc_id in sorted(scored, reverse=True)]
+    return ranked + [doc_id for doc_id, _ in candidates[position:]]
+
+def hybrid_search(
+    vectorstore: Any,
+    question: str,
+    query_vector: Sequence[float],
+    k: int = 3,
+    candidates: int = 20,
+    rerank_budget_ms: Optional[float] = None
+) -> List[Any]:
+    """Retorna os ``k`` melhores documentos combinando BM25 e FAISS (e cross-encoder, se ativo)."""
+    return hybrid_search_batch(vectorstore, [question], [query_vector], k, candidates, rerank_budget_ms)[0]
+
+def hybrid_search_batch(
+    vectorstore: Any,
+    questions: Sequence[str],
+    query_vectors: Sequence[Sequence[float]],
+    k: int = 3,
+    candidates: int = 20,
+    rerank_budget_ms: Optional[float] = None
+) -> List[List[Any]]:
+    """Como hybrid_search para várias perguntas, com uma única busca no FAISS.
+
+    Documentos recuperados por mais de uma pergunta são lidos do docstore uma
+    vez só e devolvidos como o mesmo objeto.
+    """
+    import numpy as np
+
+    if not questions:
+        return []
+    queries = np.asarray(query_vectors, dtype="float32").reshape(len(questions), -1)
+    _, positions = vectorstore.index.search(queries, candidates)
+    bm25 = bm25_for(vectorstore)
+    documents: Dict[int, Any] = {}
+
+    def document(position: int) -> Any:
+        if position not in documents:
+            documents[position] = vectorstore.docstore.search(vectorstore.index_to_docstore_id[position])
+        return documents[position]
+
+    reranker = get_reranker()
+    budget = rerank_budget_ms if rerank_budget_ms is not None else float(os.getenv("RERANK_BUDGET_MS", "300"))
+    results = []
+    for question, row in zip(questions, positions):
+        dense_ranking = [int(p) for p in row if p >= 0]
+        lexical_ranking = [doc_id for doc_id, _ in bm25.search(question, candidates)]
+        fused = reciprocal_rank_fusion([dense_ranking, lexical_ranking])[:candidates]
+        if reranker is not None:
+            fused = rerank(question, [(p, document(p).page_content) for p in fused], budget, reranker)
+        results.append([document(p) for p in fused[:k]])
+    return results
@@ -0,0 +1,182 @@
+"""
+Persistência dos índices FAISS por vídeo.
+
+Cada índice é salvo uma única vez em disco (com o docstore e o índice BM25
+usado na recuperação híbrida) no diretório do
+vídeo e recarregado sob demanda com memory-map. A instância carregada fica
+num registro do processo e é compartilhada, somente para leitura, por todas
+as sessões do Streamlit que consultam o mesmo vídeo. O registro guarda só os
+``INDEX_REGISTRY_SIZE`` índices usados mais recentemente (padrão 8); os
+demais voltam a ser carregados do disco quando pedidos.
+
+Cada índice gravado também é apontado pelo hash da transcrição
+(``by-sha/<sha256>``): um vídeo diferente com a mesma transcrição (espelho
+ou reenvio reconhecido pelo audio_fingerprint) reaproveita o índice existente.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from hybrid_retrieval import BM25Index, attach_bm25, bm25_for
+from storage import atomic_write_bytes, cache_dir
+
+INDEX_REGISTRY_SIZE = int(os.getenv("INDEX_REGISTRY_SIZE", "8"))
+
+# Chave -> (hash da transcrição, índice), do menos para o mais usado
+_registry: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+_registry_lock = threading.Lock()
+# Chave -> [trava, quantos a usam ou esperam]
+_key_locks: Dict[str, List[Any]] = {}
+
+def transcript_hash(transcript: str) -> str:
+    return hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+
+def index_key(video_id: Optional[str], transcript: str) -> str:
+    """Chave do índice: o ID do vídeo ou, na falta dele, o hash da transcrição."""
+    return video_id or f"sha-{transcript_hash(transcript)[:24]}"
+
+def index_path(key: str) -> str:
+    return os.path.join(cache_dir("indexes"), key)
+
+def _alias_path(transcript: str) -> str:
+    return os.path.join(cache_dir("indexes"), "by-sha", transcript_hash(transcript))
+
+def _read_alias(transcript: str) -> Optional[str]:
+    try:
+        with open(_alias_path(transcript), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def _read_meta(path: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _registered(key: str) -> Optional[Tuple[str, Any]]:
+    with _registry_lock:
+        cached = _registry.get(key)
+        if cached is not None:
+            _registry.move_to_end(key)
+        return cached
+
+def _register(key: str, transcript_sha256: str, vectorstore: Any) -> None:
+    with _registry_lock:
+        _registry[key] = (transcript_sha256, vectorstore)
+        _registry.move_to_end(key)
+        while len(_registry) > max(1, INDEX_REGISTRY_SIZE):
+            _registry.popitem(last=False)
+
+@contextlib.contextmanager
+def _key_lock(key: str) -> Iterator[None]:
+    """Trava por chave, descartada quando ninguém mais a usa."""
+    with _registry_lock:
+        entry = _key_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _registry_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _key_locks[key]
+
+def save_index(key: str, vectorstore: Any, transcript: str, **metadata: Any) -> str:
+    """Salva o índice e o docstore; grava num diretório temporário e renomeia no fim."""
+    final_path = index_path(key)
+    tmp_path = tempfile.mkdtemp(dir=os.path.dirname(final_path), prefix=".tmp-")
+    try:
+        vectorstore.save_local(tmp_path)
+        bm25_for(vectorstore).save(os.path.join(tmp_path, "bm25.json"))
+        meta = {"key": key, "transcript_sha256": transcript_hash(transcript), **metadata}
+        atomic_write_bytes(os.path.join(tmp_path, "meta.json"), json.dumps(meta).encode("utf-8"))
+        if os.path.isdir(final_path):
+            shutil.rmtree(final_path, ignore_errors=True)
+        try:
+            os.rename(tmp_path, final_path)
+        except OSError:
+            if not os.path.isdir(final_path):
+                raise
+            # Outra sessão gravou o mesmo índice ao mesmo tempo: fica a versão dela
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return final_path
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    alias = _alias_path(transcript)
+    os.makedirs(os.path.dirname(alias), exist_ok=True)
+    atomic_write_bytes(alias, key.encode("utf-8"))
+    return final_path
+
+def load_index(key: str, embeddings: Any, transcript: Optional[str] = None) -> Optional[Any]:
+    """Carrega o índice do disco com memory-map; None se não existir ou estiver desatualizado."""
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+    path = index_path(key)
+    if not os.path.exists(os.path.join(path, "index.faiss")):
+        return None
+    if transcript is not None and _read_meta(path).get("transcript_sha256") != transcript_hash(transcript):
+        return None
+
+    try:
+        vectorstore = FAISS.load_local(
+            path,
+            embeddings,
+            allow_dangerous_deserialization=True,
+            io_flags=faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        )
+    except (TypeError, RuntimeError):
+        # Versões antigas do langchain/faiss sem suporte a io_flags ou mmap
+        vectorstore = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+
+    bm25_path = os.path.join(path, "bm25.json")
+    if os.path.exists(bm25_path):
+        attach_bm25(vectorstore, BM25Index.load(bm25_path))
+    return vectorstore
+
+def get_or_build_index(key: str, transcript: str, build: Any, embeddings: Any) -> Any:
+    """Devolve o índice compartilhado do processo, carregando do disco ou construindo uma única vez.
+
+    ``build()`` só é chamado quando não há índice válido em memória nem em disco,
+    nem índice de outro vídeo com a mesma transcrição.
+    """
+    expected = transcript_hash(transcript)
+    cached = _registered(key)
+    if cached is not None and cached[0] == expected:
+        return cached[1]
+
+    with _key_lock(key):
+        cached = _registered(key)
+        if cached is not None and cached[0] == expected:
+            return cached[1]
+
+        vectorstore = load_index(key, embeddings, transcript=transcript)
+        if vectorstore is None:
+            alias = _read_alias(transcript)
+            if alias is not None and alias != key:
+                vectorstore = load_index(alias, embeddings, transcript=transcript)
+        if vectorstore is None:
+            built = build()
+            save_index(key, built, transcript)
+            vectorstore = load_index(key, embeddings, transcript=transcript) or built
+
+        _register(key, expected, vectorstore)
+        return vectorstore
+
+def publish_index(key: str, vectorstore: Any, transcript: str) -> Any:
+    """Grava um índice construído fora de get_or_build_index (ex.: indexação ao vivo) e o registra no processo."""
+    with _key_lock(key):
+        save_index(key, vectorstore, transcript)
+        _register(key, transcript_hash(transcript), vectorstore)
+    return vectorstore
@@ -0,0 +1,229 @@
+"""
+Indexação ao vivo: o vídeo pode ser consultado enquanto ainda está sendo transcrito.
+
+A transcrição entrega trechos na ordem do áudio (``on_segments`` dos
+backends). O ``LiveIndex`` corta o texto nos mesmos pedaços do
+IndexTranscriptTool, calcula os embeddings de cada micro-lote de pedaços
+prontos e os acrescenta ao FAISS, ao docstore e ao BM25. Os embeddings são
+calculados fora da trava; a inclusão acontece de uma vez sob a trava que as
+buscas também seguram, então cada busca vê um conjunto fechado de micro-lotes.
+O último pedaço fica pendente até chegar mais texto (ou a transcrição acabar).
+
+No fim, o mesmo índice é gravado em disco e registrado (index_store) e entra
+no corpus, sem reindexar. As indexações em andamento ficam num registro do
+processo, por vídeo, para que as sessões do Streamlit (e as novas execuções
+do script) acompanhem a mesma transcrição em segundo plano. Concluída e
+gravada, a indexação sai do registro: dali em diante o índice vem do
+index_store (que guarda em memória só os mais usados) e do disco.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from embedding_service import get_embedding_service
+from hybrid_retrieval import BM25Index, attach_bm25, hybrid_search, hybrid_search_batch
+from index_store import index_key, publish_index
+from segment_store import Transcript
+from tracing import span, start_trace
+from transcript_cache import extract_video_id, get_transcript_cache
+
+# Os mesmos pedaços do IndexTranscriptTool
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+class LiveIndex:
+    """Índice FAISS + BM25 de um vídeo que cresce à medida que a transcrição chega."""
+
+    def __init__(self, video_id: Optional[str] = None, embeddings: Any = None):
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        self.video_id = video_id
+        # Chave no registro de indexações em andamento (start_live_indexing)
+        self.key: Optional[str] = video_id
+        self.embeddings = embeddings or get_embedding_service()
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True
+        )
+        self.transcript = Transcript("")
+        self.vectorstore: Any = None
+        self.bm25: Optional[BM25Index] = None
+        self.error: Optional[BaseException] = None
+        self.started_at = time.time()
+        self.first_chunk_at: Optional[float] = None
+        self.done = threading.Event()
+        # Início do pedaço que ainda pode crescer (tudo antes dele já está indexado)
+        self._pending_from = 0
+        self._append_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    @property
+    def chunks(self) -> int:
+        with self._lock:
+            return self.vectorstore.index.ntotal if self.vectorstore is not None else 0
+
+    @property
+    def indexed_seconds(self) -> Optional[float]:
+        """Até que ponto do vídeo (em segundos) o índice já cobre; None sem timestamps."""
+        if self._pending_from == 0 or not self.transcript.has_timestamps:
+            return None
+        return self.transcript.slice_chars(0, self._pending_from).t_end
+
+    def append(self, part: Transcript) -> None:
+        """Acrescenta o próximo trecho da transcrição e indexa os pedaços que ficaram completos."""
+        if not part:
+            return
+        with self._append_lock:
+            if not self.transcript:
+                self.transcript = part if isinstance(part, Transcript) else Transcript(part)
+            elif self.transcript.has_timestamps and isinstance(part, Transcript) and part.has_timestamps:
+                self.transcript = Transcript.concat([self.transcript, part])
+            else:
+                self.transcript = Transcript(f"{self.transcript} {part}")
+            self._index(final=False)
+
+    def finish(self, transcript: Transcript) -> None:
+        """Fecha o índice com a transcrição completa, grava-o em disco e o registra no processo.
+
+        Se o texto final não continuar o que foi indexado (ex.: junção das
+        janelas pelo texto, sem timestamps), o índice é refeito do zero.
+        """
+        with self._append_lock:
+            if not str(transcript).startswith(str(self.transcript)):
+                self._pending_from = 0
+                self._index(final=True, transcript=transcript, rebuild=True)
+            else:
+                self._index(final=True, transcript=transcript)
+            if self.vectorstore is not None:
+                publish_index(index_key(self.video_id, self.transcript), self.vectorstore, self.transcript)
+
+    def adopt(self, transcript: Transcript, vectorstore: Any) -> None:
+        """Usa um índice já pronto (transcrição vinda do cache, índice carregado do disco)."""
+        with self._append_lock, self._lock:
+            self.transcript = transcript
+            self.vectorstore = vectorstore
+            self._pending_from = len(transcript)
+
+    def _index(self, final: bool, transcript: Optional[Transcript] = None, rebuild: bool = False) -> None:
+        if transcript is not None:
+            self.transcript = transcript
+        start = self._pending_from
+        docs = self.splitter.create_documents([str.__getitem__(self.transcript, slice(start, None))])
+        if not final:
+            # O último pedaço pode crescer com o próximo trecho
+            if len(docs) < 2:
+                return
+            pending = start + docs[-1].metadata["start_index"]
+            docs = docs[:-1]
+        else:
+            pending = len(self.transcript)
+        if not docs:
+            self._pending_from = pending
+            return
+
+        texts, metadatas = [], []
+        for doc in docs:
+            offset = start + doc.metadata["start_index"]
+            metadata = {"start_index": offset}
+            if self.transcript.has_timestamps:
+                piece = self.transcript.slice_chars(offset, offset + len(doc.page_content))
+                metadata.update(t_start=piece.t_start, t_end=piece.t_end)
+            texts.append(doc.page_content)
+            metadatas.append(metadata)
+
+        with span("index.append", items=len(texts), input_bytes=sum(len(t) for t in texts)):
+            vectors = self.embeddings.embed_documents(texts)
+            self._publish(texts, vectors, metadatas, rebuild)
+        self._pending_from = pending
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.time()
+
+    def _publish(self, texts: List[str], vectors: List[List[float]], metadatas: List[Dict[str, Any]], rebuild: bool) -> None:
+        from langchain_community.vectorstores import FAISS
+
+        if self.vectorstore is None or rebuild:
+            # Índice novo montado fora da trava e trocado de uma vez
+            vectorstore = FAISS.from_embeddings(list(zip(texts, vectors)), self.embeddings, metadatas=metadatas)
+            bm25 = BM25Index.build(texts)
+            attach_bm25(vectorstore, bm25)
+            with self._lock:
+                self.vectorstore, self.bm25 = vectorstore, bm25
+            return
+        with self._lock:
+            self.vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+            self.bm25.extend(texts)
+
+    def search(self, question: str, query_vector: Any, k: int = 3, candidates: int = 20) -> List[Any]:
+        """Busca híbrida no que já foi indexado, sem ver um micro-lote pela metade."""
+        with self._lock:
+            if self.vectorstore is None:
+                return []
+            return hybrid_search(self.vectorstore, question, query_vector, k=k, candidates=candidates)
+
+    def search_batch(
+        self,
+        questions: List[str],
+        query_vectors: List[Any],
+        k: int = 3,
+        candidates: int = 20
+    ) -> List[List[Any]]:
+        """Várias perguntas sobre o mesmo estado do índice, numa única busca no FAISS."""
+        with self._lock:
+            if self.vectorstore is None:
+                return [[] for _ in questions]
+            return hybrid_search_batch(self.vectorstore, questions, query_vectors, k=k, candidates=candidates)
+
+_live: Dict[str, LiveIndex] = {}
+_live_lock = threading.Lock()
+
+def _run(live: LiveIndex, url: str, openai_api_key: str) -> None:
+    from tools.youtube_transcriber import YouTubeTranscriberTool
+    from video_pipeline import index_transcript
+
+    try:
+        with start_trace("live_index", url=url):
+            transcript = YouTubeTranscriberTool().transcribe(url, openai_api_key, on_segments=live.append)
+            if not live.transcript:
+                # Nada chegou aos poucos (cache ou resposta única): índice salvo ou construído de uma vez
+                live.adopt(transcript, index_transcript(transcript, live.video_id))
+            else:
+                live.finish(transcript)
+
+            if live.video_id and live.vectorstore is not None:
+                from corpus_index import get_corpus_index
+
+                entry = get_transcript_cache().get_entry(live.video_id) or {}
+                get_corpus_index().add_vectorstore(
+                    live.video_id,
+                    live.vectorstore,
+                    channel=entry.get("channel"),
+                    published_at=entry.get("published_at")
+                )
+    except Exception as e:
+        live.error = e
+        # O índice parcial não será mais usado: só o erro fica para a interface
+        with live._lock:
+            live.vectorstore = None
+            live.bm25 = None
+    finally:
+        # Concluído (ou falhou): o índice final já está no disco e no corpus
+        live.done.set()
+        if live.error is None:
+            with _live_lock:
+                if _live.get(live.key) is live:
+                    del _live[live.key]
+
+def start_live_indexing(url: str, openai_api_key: str) -> LiveIndex:
+    """Indexação ao vivo do vídeo, iniciada em segundo plano (ou a que já está em andamento)."""
+    key = extract_video_id(url) or url
+    with _live_lock:
+        live = _live.get(key)
+        if live is not None and live.error is None:
+            return live
+        live = LiveIndex(video_id=extract_video_id(url))
+        live.key = key
+        _live[key] = live
+    # Sempre em segundo plano: mesmo com a transcrição em cache, carregar ou construir
+    # o índice e acrescentá-lo ao corpus não deve travar a thread do Streamlit
+    threading.Thread(target=_run, args=(live, url, openai_api_key), name=f"live-index-{key}", daemon=True).start()
+    return live
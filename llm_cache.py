@@ -0,0 +1,324 @@
+"""
+Cache persistente das respostas do LLM (Groq).
+
+A chave combina o prompt normalizado, o modelo, a temperatura e max_tokens.
+As entradas ficam num SQLite com expiração (TTL) e remoção das menos usadas
+(LRU). Requisições idênticas simultâneas, em streaming ou não, são agrupadas:
+só uma chega à API e as demais esperam o mesmo resultado (single-flight).
+
+Toda chamada ao LLM passa por ``cached_completion``/``cached_stream``, que
+abrem um span "llm" com o modelo, os tokens de prompt e de resposta e se a
+resposta veio do cache.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from storage import cache_dir
+from token_budget import count_tokens
+from tracing import span
+
+def normalize_prompt(prompt: Any) -> str:
+    """Normaliza espaços para que variações de indentação não gerem chaves diferentes."""
+    if not isinstance(prompt, str):
+        prompt = json.dumps(prompt, ensure_ascii=False, sort_keys=True)
+    return " ".join(prompt.split())
+
+def cache_key(prompt: Any, model: str, temperature: float, max_tokens: Optional[int]) -> str:
+    payload = json.dumps(
+        [normalize_prompt(prompt), model, round(float(temperature), 4), max_tokens],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class _StreamAbandoned(Exception):
+    """O stream agrupado foi interrompido por quem o consumia, sem erro da API."""
+
+class LLMCache:
+    """Armazena respostas do LLM em SQLite com TTL, LRU e single-flight."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 20000
+    ):
+        self.path = path or os.path.join(cache_dir("llm"), "responses.sqlite3")
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "bypassed": 0, "evictions": 0}
+        with self._connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, content TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # Uma conexão por thread; o SQLite cuida da concorrência entre processos
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def get(self, key: str) -> Optional[str]:
+        db = self._connection()
+        row = db.execute("SELECT content, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.ttl_seconds:
+            with db:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._count("evictions")
+            return None
+        with db:
+            db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key: str, content: str, model: Optional[str] = None) -> None:
+        now = time.time()
+        db = self._connection()
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, now, now)
+            )
+        self.evict()
+
+    def evict(self) -> int:
+        db = self._connection()
+        with db:
+            removed = db.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            excess = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                removed += db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                    (excess,)
+                ).rowcount
+        if removed:
+            self._count("evictions", removed)
+        return removed
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], str],
+        model: Optional[str] = None,
+        use_cache: bool = True
+    ) -> str:
+        """Retorna a resposta em cache ou chama ``compute()`` uma única vez por chave.
+
+        ``compute`` deve lançar exceção em caso de erro: erros nunca são gravados.
+        """
+        if not use_cache:
+            self._count("bypassed")
+            return compute()
+
+        cached = self.get(key)
+        if cached is not None:
+            self._count("hits")
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            self._count("coalesced")
+            return future.result()
+
+        self._count("misses")
+        try:
+            content = compute()
+            self.put(key, content, model=model)
+            future.set_result(content)
+            return content
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get_or_stream(
+        self,
+        key: str,
+        stream: Callable[[], Iterator[str]],
+        model: Optional[str] = None,
+        use_cache: bool = True
+    ) -> Iterator[str]:
+        """Versão em streaming de ``get_or_compute``: um acerto devolve a resposta inteira de uma vez.
+
+        Streams idênticos simultâneos também são agrupados: o primeiro chama
+        ``stream()`` e repassa os trechos à medida que chegam; os demais recebem
+        a resposta inteira quando ele termina (ou a mesma exceção). A resposta só
+        é gravada se o stream terminar; se quem o iniciou parar de consumi-lo no
+        meio, os que esperavam fazem a própria chamada.
+        """
+        if not use_cache:
+            self._count("bypassed")
+            yield from stream()
+            return
+
+        cached = self.get(key)
+        if cached is not None:
+            self._count("hits")
+            yield cached
+            return
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            self._count("coalesced")
+            try:
+                content = future.result()
+            except _StreamAbandoned:
+                yield from self.get_or_stream(key, stream, model=model, use_cache=use_cache)
+                return
+            yield content
+            return
+
+        self._count("misses")
+        try:
+            parts = []
+            for delta in stream():
+                parts.append(delta)
+                yield delta
+            content = "".join(parts)
+            self.put(key, content, model=model)
+            future.set_result(content)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            # GeneratorExit: quem consumia o stream desistiu antes do fim
+            if not future.done():
+                future.set_exception(_StreamAbandoned())
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        served = stats["hits"] + stats["coalesced"]
+        lookups = served + stats["misses"]
+        stats["hit_rate"] = served / lookups if lookups else 0.0
+        stats["entries"] = self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return stats
+
+_instance_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def _create_llm_cache() -> Optional[LLMCache]:
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return None
+    return LLMCache(
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+    )
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Cache único por processo; desative com LLM_CACHE=0."""
+    with _instance_lock:
+        return _create_llm_cache()
+
+def prompt_text(prompt: Any) -> str:
+    """Texto efetivamente enviado ao modelo (mensagens de chat viram seus conteúdos)."""
+    if isinstance(prompt, list):
+        return "\n".join(
+            str(part.get("content", "")) if isinstance(part, dict) else str(part) for part in prompt
+        )
+    return str(prompt)
+
+def cached_completion(
+    prompt: Any,
+    model: str,
+    temperature: float,
+    max_tokens: Optional[int],
+    compute: Callable[[], str],
+    use_cache: bool = True
+) -> str:
+    """Atalho usado pelo GroqModel e pelas ferramentas baseadas em ChatGroq."""
+    text = prompt_text(prompt)
+    with span("llm", model=model, prompt_tokens=count_tokens(text), input_bytes=len(text)) as current:
+        called = []
+
+        def tracked() -> str:
+            called.append(True)
+            return compute()
+
+        cache = get_llm_cache()
+        if cache is None:
+            content = tracked()
+        else:
+            key = cache_key(prompt, model, temperature, max_tokens)
+            content = cache.get_or_compute(key, tracked, model=model, use_cache=use_cache)
+        # Respostas do cache (ou de outra chamada idêntica em andamento) não gastam tokens
+        current.set(cache_hit=not called, completion_tokens=count_tokens(content) if called else 0)
+        if not called:
+            current.set(prompt_tokens=0, saved_tokens=current.attrs["prompt_tokens"])
+        return content
+
+def cached_stream(
+    prompt: Any,
+    model: str,
+    temperature: float,
+    max_tokens: Optional[int],
+    stream: Callable[[], Iterator[str]],
+    use_cache: bool = True
+) -> Iterator[str]:
+    """Versão em streaming de ``cached_completion`` (ver ``LLMCache.get_or_stream``)."""
+    text = prompt_text(prompt)
+    with span("llm", model=model, prompt_tokens=count_tokens(text), input_bytes=len(text), stream=True) as current:
+        called = []
+
+        def tracked() -> Iterator[str]:
+            called.append(True)
+            first = True
+            for delta in stream():
+                if first:
+                    current.set(first_token_ms=1000 * (time.time() - current.start))
+                    first = False
+                yield delta
+
+        cache = get_llm_cache()
+        if cache is None:
+            deltas = tracked()
+        else:
+            key = cache_key(prompt, model, temperature, max_tokens)
+            deltas = cache.get_or_stream(key, tracked, model=model, use_cache=use_cache)
+        parts = []
+        for delta in deltas:
+            parts.append(delta)
+            yield delta
+        content = "".join(parts)
+        current.set(cache_hit=not called, completion_tokens=count_tokens(content) if called else 0)
+        if not called:
+            current.set(prompt_tokens=0, saved_tokens=current.attrs["prompt_tokens"])
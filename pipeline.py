@@ -0,0 +1,146 @@
+"""
+Execução das etapas do processamento como um pequeno grafo de dependências.
+
+Etapas independentes rodam em paralelo num pool de threads; uma etapa só
+começa quando todas as suas dependências terminaram. Se uma etapa falha, as
+que dependem dela (direta ou indiretamente) são canceladas sem rodar.
+
+Os callbacks ``on_status`` e ``on_poll`` são sempre chamados na thread de
+quem chamou ``run_stages`` — importante para o Streamlit, que não aceita
+chamadas vindas de outras threads. Cada etapa roda num span "stage.<nome>"
+filho do span de quem chamou.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from tracing import bind, span
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+@dataclass
+class Stage:
+    name: str
+    # Recebe um dicionário {nome da dependência: resultado}
+    func: Callable[[Dict[str, Any]], Any]
+    deps: Tuple[str, ...] = ()
+    label: str = ""
+
+@dataclass
+class StageResult:
+    status: str = PENDING
+    value: Any = None
+    error: Optional[BaseException] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+@dataclass
+class PipelineRun:
+    results: Dict[str, StageResult] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return all(r.status == DONE for r in self.results.values())
+
+    def value(self, name: str, default: Any = None) -> Any:
+        result = self.results.get(name)
+        return result.value if result is not None and result.status == DONE else default
+
+def _validate(stages: Sequence[Stage]) -> None:
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("Nomes de etapas duplicados.")
+    known = set(names)
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in known]
+        if missing:
+            raise ValueError(f"Etapa '{stage.name}' depende de etapas inexistentes: {missing}")
+
+    # Detecta ciclos por ordenação topológica
+    remaining = {stage.name: set(stage.deps) for stage in stages}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Ciclo de dependências entre as etapas: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+def run_stages(
+    stages: Sequence[Stage],
+    max_workers: int = 4,
+    on_status: Optional[Callable[[str, StageResult], None]] = None,
+    on_poll: Optional[Callable[[], None]] = None,
+    poll_interval: float = 0.1
+) -> PipelineRun:
+    """Executa as etapas respeitando as dependências e devolve o resultado de cada uma."""
+    _validate(stages)
+    dependents: Dict[str, List[str]] = {stage.name: [] for stage in stages}
+    for stage in stages:
+        for dep in stage.deps:
+            dependents[dep].append(stage.name)
+
+    run = PipelineRun(results={stage.name: StageResult() for stage in stages})
+
+    def notify(name: str) -> None:
+        if on_status:
+            on_status(name, run.results[name])
+
+    def cancel_dependents(name: str) -> None:
+        for child in dependents[name]:
+            if run.results[child].status == PENDING:
+                run.results[child].status = CANCELLED
+                notify(child)
+                cancel_dependents(child)
+
+    def execute(stage: Stage) -> Any:
+        with span(f"stage.{stage.name}"):
+            return stage.func({dep: run.results[dep].value for dep in stage.deps})
+
+    running: Dict[Future, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while True:
+            for stage in stages:
+                result = run.results[stage.name]
+                if result.status == PENDING and all(run.results[d].status == DONE for d in stage.deps):
+                    result.status = RUNNING
+                    result.started_at = time.perf_counter()
+                    running[executor.submit(bind(execute), stage)] = stage.name
+                    notify(stage.name)
+
+            if not running:
+                break
+
+            done, _ = wait(list(running), timeout=poll_interval, return_when=FIRST_COMPLETED)
+            if on_poll:
+                on_poll()
+            for future in done:
+                name = running.pop(future)
+                result = run.results[name]
+                result.finished_at = time.perf_counter()
+                try:
+                    result.value = future.result()
+                    result.status = DONE
+                except Exception as e:
+                    result.error = e
+                    result.status = FAILED
+                notify(name)
+                if result.status == FAILED:
+                    cancel_dependents(name)
+
+    if on_poll:
+        on_poll()
+    return run
@@ -1,69 +1,154 @@
-from agent_config import create_agent
-from groq_model import chunk_text, summarize_chunks
-from tools.index_transcript import IndexTranscriptTool
-from tools.journalistic_highlight import JournalisticHighlightTool
-from tools.web_search import WebSearchTool
-from tools.youtube_transcriber import YouTubeTranscriberTool
+import json
+import queue
+from typing import Any, Dict, Optional
+from agent_config import get_agent
+from llm_cache import get_llm_cache
+from pipeline import CANCELLED, DONE, FAILED, RUNNING, Stage, StageResult, run_stages
+from rate_limiter import rate_limiter_stats
+from tracing import Trace, start_trace
+from video_pipeline import VideoJob, build_stages, transcribe
 import streamlit as st
 
+STATUS_ICONS = {RUNNING: "⏳", DONE: "✅", FAILED: "❌", CANCELLED: "⏭️"}
+# Spans exibidos no gráfico em cascata (traces grandes são cortados)
+WATERFALL_MAX_SPANS = 300
+
+def render_trace(trace: Trace) -> None:
+    """Gráfico em cascata dos spans do trace e totais de tokens e cache."""
+    rows = trace.waterfall()[:WATERFALL_MAX_SPANS]
+    if not rows:
+        return
+    import altair as alt
+    import pandas as pd
+
+    data = pd.DataFrame([
+        {
+            "etapa": f"{i:03d} {'· ' * row['depth']}{row['span']}",
+            "início (ms)": row["start_ms"],
+            "fim (ms)": row["end_ms"],
+            "duração (ms)": round(row["duration_ms"], 1),
+            "status": row["status"],
+            "detalhes": json.dumps(row["attrs"], ensure_ascii=False, default=str),
+        }
+        for i, row in enumerate(rows)
+    ])
+    chart = alt.Chart(data).mark_bar().encode(
+        x=alt.X("início (ms)", title="ms desde o início"),
+        x2="fim (ms)",
+        y=alt.Y("etapa", sort=None, title=None),
+        color=alt.Color("status", scale=alt.Scale(domain=["ok", "error"], range=["#4c78a8", "#e45756"])),
+        tooltip=["etapa", "duração (ms)", "detalhes"]
+    ).properties(height=max(120, 18 * len(rows)))
+    st.caption(f"Linha do tempo da execução (trace {trace.trace_id[:8]})")
+    st.altair_chart(chart, use_container_width=True)
+    st.json(trace.totals())
+
 def process_video(url: str, groq_api_key: str, huggingface_api_token: str, openai_api_key: str):
+    # Cada processamento é um trace: spans das etapas, do LLM e das ferramentas
+    with start_trace("process_video", url=url) as trace:
+        st.session_state.trace = trace
+        return _process_video(url, groq_api_key, huggingface_api_token, openai_api_key, trace)
+
+def _process_video(
+    url: str,
+    groq_api_key: str,
+    huggingface_api_token: str,
+    openai_api_key: str,
+    trace: Optional[Trace] = None
+):
     try:
         st.info("Transcrevendo vídeo...")
-        transcriber = YouTubeTranscriberTool()
-        transcript = transcriber.forward(url=url, openai_api_key=openai_api_key)
-        if not isinstance(transcript, str):
-            st.error("Falha na transcrição.")
+        try:
+            st_text = transcribe(url, openai_api_key)
+        except RuntimeError as e:
+            st.error(f"Falha na transcrição: {e}")
             return
 
-        st_text = transcript.split("Transcrição do vídeo:")[-1].strip()
         st.session_state.transcript = st_text
+        st.session_state.processed_url = url
 
         st.success("Transcrição concluída.")
 
-        st.info("Criando agente...")
-        agent = create_agent(groq_api_key, huggingface_api_token, max_steps=4)
-        st.session_state.agent = agent
+        # Eventos produzidos pelas etapas (em outras threads) e exibidos na thread do Streamlit
+        events: "queue.Queue[tuple]" = queue.Queue()
+        job = VideoJob(url=url, groq_api_key=groq_api_key, openai_api_key=openai_api_key)
 
-        st.info("Resumindo vídeo se necessário...")
-        if len(st_text) > 3000:
-            chunks = chunk_text(st_text)
-            summarized = summarize_chunks(chunks, summarizer_model=agent.model)
-            result_text = summarized
-        else:
-            result_text = st_text
-
-        st.success("Resumo concluído.")
-
-        st.info("Indexando transcrição para RAG...")
-        indexer = IndexTranscriptTool()
-        vectorstore = indexer.forward(transcript=st_text)
-        st.session_state.vectorstore = vectorstore
-        st.success("Indexação feita.")
-
-        st.info("Buscando contexto atual na web...")
-        search_tool = WebSearchTool()
-        context = search_tool.forward(query="Carla Zambelli julgamento STF")
-
-        st.info("Gerando destaques jornalísticos...")
-        highlighter = JournalisticHighlightTool()
-        highlights = highlighter.forward(
-            context=st_text,
-            search_results=context,
-            llm_api_key=groq_api_key
-        )
-        st.session_state.highlights = highlights
-        st.success("Destaques gerados com sucesso.")
+        def create_agent_stage(_: Dict[str, Any]) -> Any:
+            # Criado uma vez por processo e reaproveitado nas próximas execuções do script
+            return get_agent(groq_api_key, huggingface_api_token, max_steps=4)
 
-        # Exibição final no app
-        st.subheader("📝 Resumo ou Transcrição")
-        st.write(result_text)
+        stages = build_stages(job, st_text, on_event=lambda *event: events.put(event))
+        stages.append(Stage("agent", create_agent_stage, label="Criando agente"))
+        labels = {stage.name: stage.label for stage in stages}
 
+        status_box = st.container()
+        status_lines = {stage.name: status_box.empty() for stage in stages}
+        summary_progress = st.empty()
+        st.subheader("📝 Resumo ou Transcrição")
+        summary_area = st.empty()
         st.subheader("🔍 Destaques Jornalísticos")
-        st.markdown(highlights)
+        highlights_area = st.empty()
+        highlights_text = []
+
+        def on_status(name: str, result: StageResult) -> None:
+            icon = STATUS_ICONS.get(result.status, "•")
+            line = f"{icon} {labels[name]}"
+            if result.duration is not None:
+                line += f" ({result.duration:.1f}s)"
+            if result.status == FAILED:
+                status_lines[name].error(f"{line}: {result.error}")
+            else:
+                status_lines[name].markdown(line)
+            if name == "summary" and result.status == DONE:
+                summary_progress.empty()
+                summary_area.write(result.value["summary"])
+
+        def on_poll() -> None:
+            while True:
+                try:
+                    event = events.get_nowait()
+                except queue.Empty:
+                    break
+                if event[0] == "summary_progress":
+                    _, done, total = event
+                    summary_progress.progress(done / total, text=f"Resumos parciais: {done}/{total}")
+                elif event[0] == "highlights_delta":
+                    # Os tokens são exibidos à medida que o modelo os gera
+                    highlights_text.append(event[1])
+                    highlights_area.markdown("".join(highlights_text))
+
+        run = run_stages(stages, max_workers=4, on_status=on_status, on_poll=on_poll)
+
+        st.session_state.agent = run.value("agent")
+        st.session_state.vectorstore = run.value("index")
+        highlights = run.value("highlights", "")
+        st.session_state.highlights = highlights
+        summary = run.value("summary") or {}
+        result_text = summary.get("summary")
+
+        if run.ok:
+            st.success("Processamento concluído.")
+        else:
+            st.warning("Algumas etapas falharam; os resultados disponíveis foram exibidos.")
 
         with st.expander("🔧 Logs e conteúdo bruto"):
             st.code(st_text[:1000], language="text")
             st.code(highlights[:1000], language="markdown")
+            if summary.get("levels"):
+                st.caption(
+                    f"Árvore de resumo: {summary['levels']} níveis, "
+                    f"{summary['computed']} nós calculados, {summary['reused']} reaproveitados do cache"
+                )
+            llm_cache = get_llm_cache()
+            if llm_cache is not None:
+                st.caption("Cache de respostas do LLM")
+                st.json(llm_cache.stats())
+            limits = rate_limiter_stats()
+            if limits:
+                st.caption("Limites de taxa das APIs (tempo de espera na fila)")
+                st.json(limits)
+            if trace is not None:
+                render_trace(trace)
 
         return result_text
 
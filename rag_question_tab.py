@@ -1,12 +1,53 @@
 import streamlit as st
-from process_video import process_video
-from tools.rag_query import RAGQueryTool
+from segment_store import format_timestamp
+from tracing import start_trace
+from transcript_cache import extract_video_id
+from video_pipeline import index_transcript, transcribe
 
-def rag_question_tab():
+@st.cache_resource(show_spinner=False)
+def get_rag_tool():
+    # Importado sob demanda: a ferramenta traz smolagents, FAISS e o cliente Groq
+    from tools.rag_query import RAGQueryTool
+    return RAGQueryTool()
+
+def _render_answers(rag_tool, questions, vectorstore, llm_api_key, use_general_knowledge, scope):
+    """Uma pergunta: resposta em streaming. Várias: busca compartilhada e respostas preenchidas conforme ficam prontas."""
+    if len(questions) == 1:
+        st.markdown("### Resposta:")
+        st.write_stream(rag_tool.stream(
+            question=questions[0],
+            vectorstore=vectorstore,
+            llm_api_key=llm_api_key,
+            use_general_knowledge=use_general_knowledge,
+            scope=scope
+        ))
+        return
+
+    st.markdown("### Respostas:")
+    placeholders = []
+    for number, question in enumerate(questions, 1):
+        st.markdown(f"**{number}. {question}**")
+        placeholders.append(st.empty())
+        placeholders[-1].caption("Aguardando resposta...")
+    for position, answer in rag_tool.answer_batch(
+        questions,
+        vectorstore,
+        llm_api_key,
+        use_general_knowledge=use_general_knowledge,
+        scope=scope
+    ):
+        placeholders[position].markdown(answer)
+
+def render_rag_tab():
     st.header("🔍 Perguntas sobre o vídeo")
 
     url = st.text_input("URL do vídeo do YouTube", key="rag_url")
-    question = st.text_input("Digite sua pergunta sobre o vídeo", key="user_question")
+    question = st.text_area(
+        "Digite sua pergunta sobre o vídeo (ou várias, uma por linha)",
+        key="user_question",
+        height=100
+    )
+    questions = [line.strip() for line in question.splitlines() if line.strip()]
 
     openai_api_key = st.text_input("Sua OpenAI API Key", type="password", key="openai_rag_key")
     huggingface_api_key = st.text_input("Sua Hugging Face API Key", type="password", key="huggingface_rag_key")
@@ -16,29 +57,66 @@ def rag_question_tab():
         value=True
     )
 
-    if url and question and openai_api_key and huggingface_api_key:
+    live_mode = st.checkbox(
+        "Consultar enquanto o vídeo é transcrito (indexação ao vivo)",
+        value=True,
+        key="rag_live"
+    )
+
+    search_corpus = st.radio(
+        "Buscar em",
+        ["Este vídeo", "Todos os vídeos já indexados"],
+        horizontal=True,
+        key="rag_scope"
+    ) == "Todos os vídeos já indexados"
+
+    if search_corpus and questions and openai_api_key:
+        rag_tool = get_rag_tool()
+        with start_trace("rag_question", scope="corpus", questions=len(questions)):
+            _render_answers(rag_tool, questions, None, openai_api_key, use_general_knowledge, "corpus")
+    elif url and questions and openai_api_key and huggingface_api_key:
         if (
             "vectorstore" not in st.session_state
             or "transcript" not in st.session_state
             or st.session_state.get("processed_url") != url
         ):
-            with st.spinner("Processando vídeo e criando index..."):
-                transcript, vectorstore = process_video(url, openai_api_key, huggingface_api_key)
-                st.session_state.vectorstore = vectorstore
-                st.session_state.transcript = transcript
-                st.session_state.processed_url = url
+            if live_mode:
+                # Transcrição e indexação seguem em segundo plano; cada pergunta vê o que já foi indexado
+                from live_index import start_live_indexing
+
+                live = start_live_indexing(url, openai_api_key)
+                if live.error is not None:
+                    st.error(f"Erro ao processar o vídeo: {live.error}")
+                    return
+                if live.done.is_set():
+                    st.session_state.vectorstore = live.vectorstore
+                    st.session_state.transcript = live.transcript
+                    st.session_state.processed_url = url
+                else:
+                    covered = live.indexed_seconds
+                    st.info(
+                        f"Transcrição em andamento: {live.chunks} trechos indexados"
+                        + (f", até {format_timestamp(covered)} do vídeo" if covered else "")
+                        + ". As respostas cobrem só o que já foi transcrito; pergunte de novo para atualizar."
+                    )
+                vectorstore = live if not live.done.is_set() else live.vectorstore
+                transcript = live.transcript
+            else:
+                with st.spinner("Processando vídeo e criando index..."):
+                    try:
+                        transcript = transcribe(url, openai_api_key)
+                        vectorstore = index_transcript(transcript, extract_video_id(url))
+                    except RuntimeError as e:
+                        st.error(f"Erro ao processar o vídeo: {e}")
+                        return
+                    st.session_state.vectorstore = vectorstore
+                    st.session_state.transcript = transcript
+                    st.session_state.processed_url = url
         else:
             vectorstore = st.session_state.vectorstore
             transcript = st.session_state.transcript
 
         if vectorstore:
-            rag_tool = RAGQueryTool()
-            with st.spinner("Consultando a transcrição..."):
-                result = rag_tool.forward(
-                    question=question,
-                    vectorstore=vectorstore,
-                    llm_api_key=openai_api_key,
-                    use_general_knowledge=use_general_knowledge
-                )
-            st.markdown("### Resposta:")
-            st.write(result)
+            rag_tool = get_rag_tool()
+            with start_trace("rag_question", scope="video", url=url, questions=len(questions)):
+                _render_answers(rag_tool, questions, vectorstore, openai_api_key, use_general_knowledge, "video")
@@ -0,0 +1,225 @@
+"""
+Limite de taxa compartilhado para as APIs externas (Groq e Whisper).
+
+Cada par (provedor, modelo) tem um limitador único por processo, com dois
+baldes de fichas: requisições por minuto (RPM) e tokens por minuto (TPM).
+Quem chama reserva fichas antes de cada requisição e espera, se preciso, até
+que o balde volte a ter saldo. Erros transitórios (429, 5xx, falhas de
+conexão) são repetidos com backoff exponencial com jitter, respeitando o
+cabeçalho Retry-After; um 429 pausa todas as chamadas daquele limitador.
+
+Limites por provedor: GROQ_RPM, GROQ_TPM, WHISPER_RPM (0 desativa o balde).
+Limites por modelo: RATE_LIMITS='{"groq:llama-3.1-8b-instant": {"rpm": 30, "tpm": 6000}}'.
+"""
+
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, TypeVar
+
+from token_budget import count_tokens
+from tracing import current_span
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_TRANSIENT_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectionError", "Timeout", "TimeoutError", "ChunkedEncodingError"}
+DEFAULT_LIMITS = {
+    "groq": {"rpm": 30, "tpm": 0},
+    "whisper": {"rpm": 50, "tpm": 0},
+}
+
+class TokenBucket:
+    """Balde reabastecido continuamente até ``per_minute`` fichas por minuto.
+
+    ``reserve`` desconta as fichas na hora (o saldo pode ficar negativo) e
+    devolve quanto tempo esperar: os pedidos são atendidos na ordem de chegada
+    sem que ninguém precise segurar o lock enquanto dorme.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= min(amount, self.capacity)
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+def status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Segundos pedidos pelo servidor (Retry-After / retry-after-ms), se houver."""
+    value = getattr(error, "retry_after", None)
+    if value is not None:
+        return float(value)
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        header = headers.get("retry-after")
+        if not header:
+            return None
+        try:
+            return float(header)
+        except ValueError:
+            return max(0.0, email.utils.parsedate_to_datetime(header).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_transient(error: BaseException) -> bool:
+    status = status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return any(cls.__name__ in _TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+def request_tokens(prompt: Any, max_tokens: Optional[int] = None) -> int:
+    """Estimativa de tokens de uma requisição (prompt + resposta máxima) para o balde TPM."""
+    if isinstance(prompt, list):
+        prompt = "\n".join(str(m.get("content", "")) if isinstance(m, dict) else str(m) for m in prompt)
+    return count_tokens(str(prompt)) + (max_tokens or 1024)
+
+class RateLimiter:
+    """Limitador de uma API/modelo: baldes RPM/TPM, backoff e métricas de espera."""
+
+    def __init__(
+        self,
+        name: str,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_retries: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0
+    ):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._stats = {
+            "requests": 0, "tokens": 0, "retries": 0, "throttled": 0, "failures": 0,
+            "wait_seconds": 0.0, "max_wait_seconds": 0.0, "backoff_seconds": 0.0
+        }
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Reserva uma requisição (e ``tokens`` tokens), esperando o necessário; devolve a espera."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if self.requests:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens and tokens:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+            self._stats["requests"] += 1
+            self._stats["tokens"] += tokens
+            self._stats["wait_seconds"] += wait
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], wait)
+        if wait > 0:
+            span = current_span()
+            if span is not None:
+                span.add("rate_limit_wait_ms", 1000 * wait)
+            time.sleep(wait)
+        return wait
+
+    def backoff(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """Tempo até a próxima tentativa; um 429 pausa também as demais chamadas."""
+        server_delay = retry_after(error) if error is not None else None
+        if server_delay is not None:
+            delay = server_delay + random.uniform(0, 0.1 * server_delay + 0.05)
+        else:
+            cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+            delay = cap / 2 + random.uniform(0, cap / 2)
+        with self._lock:
+            self._stats["retries"] += 1
+            self._stats["backoff_seconds"] += delay
+            if error is not None and status_code(error) == 429:
+                self._stats["throttled"] += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        span = current_span()
+        if span is not None:
+            span.add("retries")
+        return delay
+
+    def call(self, func: Callable[[], T], tokens: int = 0, max_retries: Optional[int] = None) -> T:
+        """Executa ``func`` dentro do limite, repetindo erros transitórios; relança o último erro."""
+        retries = self.max_retries if max_retries is None else max_retries
+        for attempt in range(retries + 1):
+            self.acquire(tokens)
+            try:
+                return func()
+            except Exception as e:
+                if attempt >= retries or not is_transient(e):
+                    with self._lock:
+                        self._stats["failures"] += 1
+                    raise
+                time.sleep(self.backoff(attempt, e))
+        raise AssertionError("unreachable")
+
+    def call_stream(self, open_stream: Callable[[], Iterator[T]], tokens: int = 0) -> Iterator[T]:
+        """Como ``call``, para respostas em streaming.
+
+        Só a abertura do stream (até o primeiro trecho) é repetida; um erro no
+        meio da resposta é propagado, pois parte dela já foi entregue.
+        """
+        def first() -> Tuple[Iterator[T], Any]:
+            iterator = iter(open_stream())
+            return iterator, next(iterator, _END)
+
+        iterator, head = self.call(first, tokens)
+        if head is _END:
+            return
+        yield head
+        yield from iterator
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_wait_ms"] = 1000 * stats["wait_seconds"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+_END = object()
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def _configured_limits(provider: str, model: str) -> Dict[str, float]:
+    limits = dict(DEFAULT_LIMITS.get(provider, {}))
+    prefix = provider.upper()
+    for key in ("rpm", "tpm"):
+        value = os.getenv(f"{prefix}_{key.upper()}")
+        if value is not None:
+            limits[key] = float(value)
+    try:
+        overrides = json.loads(os.getenv("RATE_LIMITS", "{}"))
+    except ValueError:
+        overrides = {}
+    limits.update(overrides.get(f"{provider}:{model}", {}))
+    return limits
+
+def get_rate_limiter(provider: str, model: str) -> RateLimiter:
+    """Limitador único por processo para o par (provedor, modelo)."""
+    name = f"{provider}:{model}"
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limits = _configured_limits(provider, model)
+            limiter = RateLimiter(name, rpm=limits.get("rpm"), tpm=limits.get("tpm"))
+            _limiters[name] = limiter
+        return limiter
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
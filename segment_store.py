@@ -0,0 +1,239 @@
+"""
+Transcrição com segmentos e timestamps num formato compacto.
+
+``Transcript`` é um ``str`` (todo o código que trata a transcrição como texto
+continua funcionando) que carrega, além do texto num único buffer, os
+segmentos do Whisper em arrays numpy: deslocamento inicial e final de cada
+segmento no texto (int32) e seus instantes de início e fim em segundos
+(float32) — 16 bytes por segmento, contra ~250 de uma lista de dicionários.
+
+Recortes por tempo ou por caracteres (``slice_time``/``slice_chars``) devolvem
+visões (``TranscriptSlice``) que só guardam índices; o texto é materializado
+quando pedido. A serialização em disco é binária: um cabeçalho, os arrays
+crus e o texto UTF-8, lidos de volta com ``np.frombuffer`` sem cópia.
+"""
+
+import json
+import struct
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from storage import atomic_write_bytes
+
+_MAGIC = b"AYTSEG1\0"
+_HEADER = struct.Struct("<8sII")
+
+def format_timestamp(seconds: float) -> str:
+    """Segundos como m:ss ou h:mm:ss."""
+    total = int(max(0.0, seconds))
+    hours, rest = divmod(total, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+class Transcript(str):
+    """Texto da transcrição com os segmentos (offsets e timestamps) em arrays compactos."""
+
+    def __new__(
+        cls,
+        text: str,
+        starts: Any = None,
+        ends: Any = None,
+        t_start: Any = None,
+        t_end: Any = None
+    ):
+        obj = super().__new__(cls, text)
+        obj.starts = np.asarray(starts if starts is not None else [], dtype=np.int32)
+        obj.ends = np.asarray(ends if ends is not None else [], dtype=np.int32)
+        obj.t_start = np.asarray(t_start if t_start is not None else [], dtype=np.float32)
+        obj.t_end = np.asarray(t_end if t_end is not None else [], dtype=np.float32)
+        return obj
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (Transcript, (str(self), self.starts, self.ends, self.t_start, self.t_end))
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Tuple[float, float, str]]) -> "Transcript":
+        """Monta a transcrição a partir de (início, fim, texto) — a saída de segmentos do Whisper."""
+        parts: List[str] = []
+        starts, ends, t_start, t_end = [], [], [], []
+        offset = 0
+        for start, end, text in segments:
+            text = " ".join(text.split())
+            if not text:
+                continue
+            if parts:
+                parts.append(" ")
+                offset += 1
+            parts.append(text)
+            starts.append(offset)
+            offset += len(text)
+            ends.append(offset)
+            t_start.append(start)
+            t_end.append(end)
+        return cls("".join(parts), starts, ends, t_start, t_end)
+
+    @classmethod
+    def concat(cls, parts: Sequence["Transcript"]) -> "Transcript":
+        """Junta transcrições (já com timestamps absolutos) separadas por espaço."""
+        return cls.from_segments(segment for part in parts for segment in part.segments())
+
+    @property
+    def has_timestamps(self) -> bool:
+        return len(self.starts) > 0
+
+    @property
+    def duration(self) -> float:
+        return float(self.t_end[-1]) if self.has_timestamps else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        """Memória dos arrays de segmentos (o texto fica à parte)."""
+        return self.starts.nbytes + self.ends.nbytes + self.t_start.nbytes + self.t_end.nbytes
+
+    def segments(self) -> Iterable[Tuple[float, float, str]]:
+        for i in range(len(self.starts)):
+            yield float(self.t_start[i]), float(self.t_end[i]), str.__getitem__(self, slice(self.starts[i], self.ends[i]))
+
+    def shifted(self, seconds: float) -> "Transcript":
+        """Mesma transcrição com os timestamps deslocados (ex.: janela que começa em ``seconds``)."""
+        return Transcript(str(self), self.starts, self.ends, self.t_start + seconds, self.t_end + seconds)
+
+    def segment_at_char(self, offset: int) -> int:
+        """Índice do segmento que contém (ou vem logo após) o caractere ``offset``."""
+        i = int(np.searchsorted(self.ends, offset, side="right"))
+        return min(i, len(self.starts) - 1)
+
+    def time_at_char(self, offset: int) -> Optional[float]:
+        if not self.has_timestamps:
+            return None
+        return float(self.t_start[self.segment_at_char(offset)])
+
+    def char_at_time(self, seconds: float) -> int:
+        if not self.has_timestamps:
+            return 0
+        i = int(np.searchsorted(self.t_end, seconds, side="right"))
+        return int(self.starts[i]) if i < len(self.starts) else len(self)
+
+    def slice_chars(self, start: int, end: int) -> "TranscriptSlice":
+        return TranscriptSlice(self, max(0, start), min(len(self), end))
+
+    def slice_time(self, start: float, end: float) -> "TranscriptSlice":
+        """Segmentos que se sobrepõem ao intervalo [start, end) em segundos."""
+        if not self.has_timestamps:
+            return TranscriptSlice(self, 0, len(self))
+        first = int(np.searchsorted(self.t_end, start, side="right"))
+        last = int(np.searchsorted(self.t_start, end, side="left"))
+        if first >= last:
+            return TranscriptSlice(self, 0, 0)
+        return TranscriptSlice(self, int(self.starts[first]), int(self.ends[last - 1]))
+
+    def timestamped_text(self, interval: float = 30.0) -> str:
+        """Texto com marcadores [m:ss] a cada ``interval`` segundos, no início de um segmento."""
+        if not self.has_timestamps:
+            return str(self)
+        parts = []
+        next_mark = -1.0
+        previous_end = 0
+        for i in range(len(self.starts)):
+            start = int(self.starts[i])
+            parts.append(str.__getitem__(self, slice(previous_end, start)))
+            if self.t_start[i] >= next_mark:
+                parts.append(f"[{format_timestamp(self.t_start[i])}] ")
+                next_mark = float(self.t_start[i]) + interval
+            previous_end = start
+        parts.append(str.__getitem__(self, slice(previous_end, len(self))))
+        return "".join(parts)
+
+    def to_bytes(self) -> bytes:
+        text = str(self).encode("utf-8")
+        header = json.dumps({"segments": len(self.starts), "text_bytes": len(text)}).encode("utf-8")
+        return b"".join([
+            _HEADER.pack(_MAGIC, len(header), 0),
+            header,
+            self.starts.tobytes(), self.ends.tobytes(), self.t_start.tobytes(), self.t_end.tobytes(),
+            text,
+        ])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Transcript":
+        magic, header_size, _ = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC:
+            raise ValueError("Arquivo de segmentos inválido.")
+        offset = _HEADER.size
+        header = json.loads(data[offset:offset + header_size])
+        offset += header_size
+        n = header["segments"]
+        arrays = []
+        for dtype in (np.int32, np.int32, np.float32, np.float32):
+            arrays.append(np.frombuffer(data, dtype=dtype, count=n, offset=offset))
+            offset += 4 * n
+        text = data[offset:offset + header["text_bytes"]].decode("utf-8")
+        return cls(text, *arrays)
+
+    def save(self, path: str) -> None:
+        atomic_write_bytes(path, self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "Transcript":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+class TranscriptSlice:
+    """Visão de um trecho da transcrição; não copia o texto até ``text`` ser lido."""
+
+    __slots__ = ("transcript", "start", "end")
+
+    def __init__(self, transcript: Transcript, start: int, end: int):
+        self.transcript = transcript
+        self.start = start
+        self.end = end
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    @property
+    def text(self) -> str:
+        return str.__getitem__(self.transcript, slice(self.start, self.end))
+
+    @property
+    def t_start(self) -> Optional[float]:
+        return self.transcript.time_at_char(self.start)
+
+    @property
+    def t_end(self) -> Optional[float]:
+        if not self.transcript.has_timestamps or self.end <= self.start:
+            return self.t_start
+        return float(self.transcript.t_end[self.transcript.segment_at_char(self.end - 1)])
+
+    def label(self) -> str:
+        """Intervalo "[m:ss–m:ss]" do trecho, ou "" sem timestamps."""
+        if self.t_start is None:
+            return ""
+        return f"[{format_timestamp(self.t_start)}–{format_timestamp(self.t_end)}]"
+
+def window_cuts(windows: Sequence[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """Para cada janela (início, fim), o intervalo de tempo que fica com ela: sobreposições são cortadas no meio."""
+    cuts = []
+    for i, (start, end) in enumerate(windows):
+        cut_before = (windows[i - 1][1] + start) / 2 if i > 0 else float("-inf")
+        cut_after = (end + windows[i + 1][0]) / 2 if i + 1 < len(windows) else float("inf")
+        cuts.append((cut_before, cut_after))
+    return cuts
+
+def trim_window(transcript: Transcript, cut_before: float, cut_after: float) -> Transcript:
+    """Segmentos cujo ponto médio cai em [cut_before, cut_after)."""
+    return Transcript.from_segments(
+        s for s in transcript.segments() if cut_before <= (s[0] + s[1]) / 2 < cut_after
+    )
+
+def merge_windows(parts: Sequence[Tuple[Transcript, float, float]]) -> Transcript:
+    """Junta transcrições de janelas sobrepostas (texto, início, fim em segundos, timestamps absolutos).
+
+    Cada sobreposição é cortada no meio: da janela anterior ficam os segmentos
+    cujo ponto médio cai antes do corte; da seguinte, os demais. O
+    resultado é o mesmo que concatenar ``trim_window`` janela a janela, o que
+    permite entregar cada parte assim que a janela é transcrita.
+    """
+    cuts = window_cuts([(start, end) for _, start, end in parts])
+    return Transcript.concat([trim_window(transcript, *cut) for (transcript, _, _), cut in zip(parts, cuts)])
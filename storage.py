@@ -0,0 +1,72 @@
+"""
+Utilitários de armazenamento local compartilhados pelos caches em disco.
+
+O diretório base pode ser alterado com a variável de ambiente AGENT_YT_CACHE_DIR.
+"""
+
+import contextlib
+import os
+import tempfile
+from typing import Iterator
+
+def cache_root() -> str:
+    """Retorna (e cria, se necessário) o diretório base dos caches."""
+    root = os.getenv(
+        "AGENT_YT_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "agent_yt_journalism")
+    )
+    os.makedirs(root, exist_ok=True)
+    return root
+
+def cache_dir(*parts: str) -> str:
+    """Retorna um subdiretório do cache, criando-o se não existir."""
+    path = os.path.join(cache_root(), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def atomic_write_bytes(path: str, data: bytes) -> None:
+    """Grava o arquivo de forma atômica: escreve num temporário e faz os.replace.
+
+    Leitores concorrentes (outras sessões do Streamlit) nunca veem um arquivo
+    parcialmente escrito; em caso de escrita simultânea, vence a última.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+@contextlib.contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Trava exclusiva entre processos enquanto o bloco executa (flock no POSIX, msvcrt no Windows).
+
+    Não é reentrante: o mesmo processo não deve abrir a trava de novo dentro do bloco.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
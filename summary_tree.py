@@ -0,0 +1,241 @@
+"""
+Resumo hierárquico (map-reduce) para vídeos longos.
+
+A transcrição é dividida em trechos (folhas) que são resumidos em paralelo;
+os resumos são então agrupados e combinados nível a nível até sobrar um só.
+O número de filhos por nó se adapta ao orçamento de tokens: cabem quantos
+resumos couberem no prompt de redução.
+
+Cada nó é guardado em cache pelo hash do seu conteúdo (o texto do trecho,
+nas folhas, ou os hashes dos filhos, nos nós internos). Como a divisão e o
+agrupamento são gulosos a partir do início, quando a transcrição cresce —
+uma transmissão ao vivo transcrita aos poucos, por exemplo — só o último
+ramo da árvore muda e precisa ser recalculado.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from groq_model import SUMMARY_CHUNK_TOKENS, complete_or_raise
+from storage import atomic_write_bytes, cache_dir
+from token_budget import chunk_by_tokens, count_tokens
+from tracing import bind
+
+# Orçamento (tokens) dos resumos combinados num único prompt de redução
+SUMMARY_REDUCE_TOKENS = int(os.getenv("SUMMARY_REDUCE_TOKENS", str(SUMMARY_CHUNK_TOKENS)))
+
+class SummaryCache:
+    """Resumos de nós da árvore em disco, um arquivo JSON por hash."""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or cache_dir("summaries")
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                summary = json.load(f)["summary"]
+        except (OSError, ValueError, KeyError):
+            self._count("misses")
+            return None
+        self._count("hits")
+        return summary
+
+    def put(self, key: str, summary: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write_bytes(path, json.dumps({"summary": summary}, ensure_ascii=False).encode("utf-8"))
+        self._count("writes")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+_instance_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def _create_summary_cache() -> SummaryCache:
+    return SummaryCache()
+
+def get_summary_cache() -> SummaryCache:
+    """Instância única do cache de resumos por processo."""
+    with _instance_lock:
+        return _create_summary_cache()
+
+@dataclass
+class SummaryNode:
+    key: str
+    summary: str
+    children: List["SummaryNode"] = field(default_factory=list)
+    reused: bool = False
+    # Falhou ou depende de um trecho que falhou: não vai para o cache
+    failed: bool = False
+
+@dataclass
+class SummaryTree:
+    root: Optional[SummaryNode]
+    # levels[0] são as folhas; o último nível tem só a raiz
+    levels: List[List[SummaryNode]]
+    computed: int = 0
+    reused: int = 0
+
+    @property
+    def summary(self) -> str:
+        return self.root.summary if self.root else ""
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _summarize_chunk(chunk: str, summarizer_model: Any, language: str) -> str:
+    structured_prompt = f"""
+Thought: Preciso resumir o trecho de vídeo abaixo em {language} de forma clara.
+
+Code:
+```py
+texto = {repr(chunk)}
+summarize(texto)
+```
+<end_code>
+"""
+    return complete_or_raise(structured_prompt, summarizer_model)
+
+def _reduce_prompt(summaries: List[str], language: str) -> str:
+    return f"""
+Thought: Preciso combinar os resumos abaixo, de trechos consecutivos do mesmo vídeo, num único resumo em {language}, em ordem cronológica e sem repetir informações.
+
+Code:
+```py
+resumos = {repr(summaries)}
+combine_summaries(resumos)
+```
+<end_code>
+"""
+
+def group_by_budget(texts: List[str], max_tokens: int) -> List[List[int]]:
+    """Agrupa índices consecutivos enquanto a soma de tokens couber em ``max_tokens``.
+
+    Todo grupo recebe ao menos dois itens quando possível, para que cada nível
+    da árvore seja menor que o anterior.
+    """
+    groups: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text) + 2
+        if len(current) >= 2 and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+def summarize_hierarchical(
+    text: str,
+    summarizer_model: Any,
+    language: str = "português",
+    chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+    reduce_tokens: int = SUMMARY_REDUCE_TOKENS,
+    cache: Optional[SummaryCache] = None,
+    max_workers: Optional[int] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> SummaryTree:
+    """Resume ``text`` numa árvore de resumos e devolve a árvore (``.summary`` é a raiz).
+
+    Nós já presentes no cache não são recalculados. Um trecho que falha
+    (depois das novas tentativas do rate limiter, só para erros transitórios)
+    vira um aviso no lugar do resumo e não é gravado no cache.
+    ``progress_callback(concluidos, total)`` recebe os nós calculados em cada
+    nível (o total cresce conforme os níveis superiores são conhecidos).
+    """
+    cache = cache or get_summary_cache()
+    if max_workers is None:
+        max_workers = int(os.getenv("SUMMARY_MAX_WORKERS", "4"))
+    model_name = str(getattr(summarizer_model, "model", type(summarizer_model).__name__))
+    tree = SummaryTree(root=None, levels=[])
+    progress = {"done": 0, "total": 0}
+
+    def build_level(jobs: List[Any]) -> List[SummaryNode]:
+        nodes: List[Optional[SummaryNode]] = [None] * len(jobs)
+        pending = []
+        for i, job in enumerate(jobs):
+            if isinstance(job, SummaryNode):
+                nodes[i] = job
+                continue
+            key, _, children = job
+            if any(child.failed for child in children):
+                pending.append(i)
+                continue
+            cached = cache.get(key)
+            if cached is not None:
+                nodes[i] = SummaryNode(key, cached, children, reused=True)
+                tree.reused += 1
+            else:
+                pending.append(i)
+
+        progress["total"] += len(pending)
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as executor:
+                futures = {executor.submit(bind(jobs[i][1])): i for i in pending}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    key, _, children = jobs[i]
+                    failed = any(child.failed for child in children)
+                    try:
+                        summary = future.result()
+                        if not failed:
+                            cache.put(key, summary)
+                    except Exception as e:
+                        summary = f"[Trecho não pôde ser resumido: {e}]"
+                        failed = True
+                    nodes[i] = SummaryNode(key, summary, children, failed=failed)
+                    tree.computed += 1
+                    progress["done"] += 1
+                    if progress_callback:
+                        progress_callback(progress["done"], progress["total"])
+        return nodes
+
+    leaves = []
+    for chunk in chunk_by_tokens(text, chunk_tokens):
+        key = _hash("leaf", model_name, language, chunk)
+        leaves.append((key, functools.partial(_summarize_chunk, chunk, summarizer_model, language), []))
+    level = build_level(leaves)
+    if not level:
+        return tree
+    tree.levels.append(level)
+
+    while len(level) > 1:
+        jobs = []
+        for group in group_by_budget([node.summary for node in level], reduce_tokens):
+            children = [level[i] for i in group]
+            if len(children) == 1:
+                # Grupo de um só: sobe sem nova chamada ao modelo
+                jobs.append(children[0])
+                continue
+            key = _hash("node", model_name, language, *(child.key for child in children))
+            prompt = _reduce_prompt([child.summary for child in children], language)
+            jobs.append((key, functools.partial(complete_or_raise, prompt, summarizer_model), children))
+        level = build_level(jobs)
+        tree.levels.append(level)
+
+    tree.root = level[0]
+    return tree
@@ -0,0 +1,133 @@
+"""
+Contagem de tokens, divisão da transcrição por orçamento de tokens e ajuste
+de prompts à janela de contexto de cada modelo.
+
+A contagem usa o tokenizador do tiktoken (cl100k_base, próximo ao dos modelos
+Llama 3 servidos pela Groq). Sem o tiktoken — ou sem acesso ao arquivo do
+vocabulário — cai numa estimativa por caracteres.
+"""
+
+import functools
+import math
+import os
+import re
+from typing import Any, List, Optional
+
+# Janela de contexto (tokens) dos modelos usados no projeto
+MODEL_CONTEXT_TOKENS = {
+    "deepseek-r1-distill-llama-70b": 131072,
+    "llama-3.3-70b-versatile": 131072,
+    "llama-3.1-8b-instant": 131072,
+    "deepseek-coder-33b-instruct": 16384,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+# Caracteres por token usados na estimativa sem tokenizador (texto em português)
+CHARS_PER_TOKEN = 3.5
+TRUNCATION_MARKER = "\n[Texto truncado para atender limite de tokens da Groq]"
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+|(?<=[.!?…][\"'”»)])\s+")
+
+@functools.lru_cache(maxsize=1)
+def _encoding() -> Optional[Any]:
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(os.getenv("TOKENIZER_ENCODING", "cl100k_base"))
+    except Exception:
+        return None
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode_ordinary(text))
+
+def context_window(model: str) -> int:
+    return MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+
+def prompt_budget(model: str, max_output_tokens: Optional[int] = None, fixed_text: str = "", margin: int = 256) -> int:
+    """Tokens disponíveis para o conteúdo variável de um prompt.
+
+    Desconta da janela do modelo a resposta esperada, o texto fixo do prompt
+    e uma margem para as mensagens de sistema/formatação.
+    """
+    reserved = (max_output_tokens or 4096) + count_tokens(fixed_text) + margin
+    return max(256, context_window(model) - reserved)
+
+def split_sentences(text: str) -> List[str]:
+    """Divide em frases pela pontuação final; o Whisper pontua as transcrições."""
+    return [s for s in _SENTENCE_END_RE.split(text.strip()) if s]
+
+def _split_long(sentence: str, max_tokens: int) -> List[str]:
+    # Frase maior que o orçamento: divide por palavras
+    pieces, current, current_tokens = [], [], 0
+    for word in sentence.split():
+        tokens = count_tokens(" " + word)
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+def chunk_by_tokens(text: str, max_tokens: int, overlap_sentences: int = 0) -> List[str]:
+    """Agrupa frases inteiras em trechos de até ``max_tokens`` tokens.
+
+    Com ``overlap_sentences`` > 0, cada trecho repete as últimas frases do anterior.
+    """
+    units: List[tuple] = []
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence) + 1
+        if tokens > max_tokens:
+            units.extend((piece, count_tokens(piece) + 1) for piece in _split_long(sentence, max_tokens))
+        else:
+            units.append((sentence, tokens))
+
+    chunks: List[str] = []
+    current: List[tuple] = []
+    current_tokens = 0
+    for unit in units:
+        if current and current_tokens + unit[1] > max_tokens:
+            chunks.append(" ".join(s for s, _ in current))
+            current = current[-overlap_sentences:] if overlap_sentences else []
+            current_tokens = sum(t for _, t in current)
+            # A sobreposição nunca pode impedir o próximo trecho de caber
+            while current and current_tokens + unit[1] > max_tokens:
+                current_tokens -= current.pop(0)[1]
+        current.append(unit)
+        current_tokens += unit[1]
+    if current:
+        chunks.append(" ".join(s for s, _ in current))
+    return chunks
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = TRUNCATION_MARKER) -> str:
+    """Corta o texto no limite de tokens, terminando numa frase completa quando possível."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - count_tokens(marker)
+    kept, used = [], 0
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence) + 1
+        if used + tokens > budget:
+            if not kept:
+                kept.append(_split_long(sentence, budget)[0])
+            break
+        kept.append(sentence)
+        used += tokens
+    return " ".join(kept) + marker
+
+def fit_prompt(
+    text: str,
+    model: str,
+    max_output_tokens: Optional[int] = None,
+    fixed_text: str = "",
+    share: float = 1.0
+) -> str:
+    """Ajusta ``text`` à parcela ``share`` do orçamento de prompt do modelo.
+
+    Usado pelas ferramentas para que o conteúdo caiba na janela do modelo em
+    vez de ser cortado por número de caracteres.
+    """
+    budget = int(prompt_budget(model, max_output_tokens, fixed_text) * share)
+    return truncate_to_tokens(text, budget)
@@ -1,14 +1,19 @@
-# Este arquivo está vazio intencionalmente para tornar o diretório 'tools' um pacote Python
-# Isso permite que os módulos neste diretório sejam importados em outros lugares do código
-
-from tools.youtube_transcriber import YouTubeTranscriberTool
-from tools.web_search import WebSearchTool
-from tools.rag_query import RAGQueryTool
-from tools.journalistic_highlight import JournalisticHighlightTool
-
-__all__ = [
-    'YouTubeTranscriberTool',
-    'WebSearchTool',
-    'RAGQueryTool',
-    'JournalisticHighlightTool'
-]
+# Pacote das ferramentas usadas pelo agente.
+# As classes são carregadas sob demanda (PEP 562): importar o pacote não traz
+# smolagents, langchain nem FAISS até que uma ferramenta seja de fato usada.
+
+import importlib
+
+_TOOL_MODULES = {
+    'YouTubeTranscriberTool': 'tools.youtube_transcriber',
+    'WebSearchTool': 'tools.web_search',
+    'RAGQueryTool': 'tools.rag_query',
+    'JournalisticHighlightTool': 'tools.journalistic_highlight',
+}
+
+__all__ = list(_TOOL_MODULES)
+
+def __getattr__(name):
+    if name in _TOOL_MODULES:
+        return getattr(importlib.import_module(_TOOL_MODULES[name]), name)
+    raise AttributeError(f"module 'tools' has no attribute {name!r}")
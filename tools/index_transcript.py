@@ -1,14 +1,22 @@
-from typing import Any
+from typing import Any, Optional
 from smolagents.tools import Tool
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from embedding_service import get_embedding_service
+from index_store import get_or_build_index, index_key
+from segment_store import Transcript
+from tracing import span
 
 class IndexTranscriptTool(Tool):
     name = "index_transcript"
-    description = "Indexes a transcript using FAISS and HuggingFace embeddings."
+    description = "Indexes a transcript using FAISS and sentence-transformers embeddings."
     inputs = {
-        'transcript': {'type': 'string', 'description': 'Transcript to index'}
+        'transcript': {'type': 'string', 'description': 'Transcript to index'},
+        'video_id': {
+            'type': 'string',
+            'description': 'YouTube video ID used to persist and reuse the index',
+            'nullable': True
+        }
     }
     output_type = "object"
 
@@ -16,13 +24,30 @@ class IndexTranscriptTool(Tool):
         super().__init__()
         self.is_initialized = True
 
-    def forward(self, transcript: str) -> Any:
+    def forward(self, transcript: str, video_id: Optional[str] = None) -> Any:
         try:
-            splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-            texts = splitter.create_documents([transcript])
-            embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-            vectorstore = FAISS.from_documents(texts, embeddings)
-            return vectorstore
+            with span("index", input_bytes=len(transcript)) as current:
+                # Modelo de embeddings único por processo, já carregado após o primeiro uso
+                embeddings = get_embedding_service()
+                built = []
+
+                def build():
+                    built.append(True)
+                    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50, add_start_index=True)
+                    texts = splitter.create_documents([transcript])
+                    if isinstance(transcript, Transcript) and transcript.has_timestamps:
+                        # Intervalo de tempo de cada trecho, para a resposta citar o momento no vídeo
+                        for doc in texts:
+                            start = doc.metadata["start_index"]
+                            piece = transcript.slice_chars(start, start + len(doc.page_content))
+                            doc.metadata.update(t_start=piece.t_start, t_end=piece.t_end)
+                    with span("faiss.build", items=len(texts)):
+                        return FAISS.from_documents(texts, embeddings)
+
+                # Índice salvo em disco por vídeo e compartilhado entre sessões
+                vectorstore = get_or_build_index(index_key(video_id, transcript), transcript, build, embeddings)
+                current.set(cache_hit=not built, items=vectorstore.index.ntotal)
+                return vectorstore
         except Exception as e:
             import traceback
             return f"Erro ao indexar transcrição: {str(e)}\n\n{traceback.format_exc()}"
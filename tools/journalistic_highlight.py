@@ -1,5 +1,10 @@
-from typing import Any, Optional, Dict, List
+from typing import Any, Optional, Dict, Iterator, List
 from smolagents.tools import Tool
+from api_clients import get_chat_groq
+from highlight_candidates import HIGHLIGHT_CONTEXT_TOKENS, OMISSION_MARKER, preselect
+from llm_cache import cached_completion, cached_stream
+from rate_limiter import get_rate_limiter, request_tokens
+from token_budget import fit_prompt
 
 class JournalisticHighlightTool(Tool):
     name = "journalistic_highlight"
@@ -11,56 +16,108 @@ class JournalisticHighlightTool(Tool):
     }
     output_type = "string"
 
-    def __init__(self, *args, **kwargs):
+    def __init__(
+        self,
+        *args,
+        use_cache: bool = True,
+        raise_errors: bool = False,
+        max_context_tokens: Optional[int] = HIGHLIGHT_CONTEXT_TOKENS,
+        **kwargs
+    ):
         super().__init__()
+        self.use_cache = use_cache
+        # Headless callers want the exception, not an error message mixed into the highlights
+        self.raise_errors = raise_errors
+        # Long transcripts are reduced locally to the most promising passages; None sends everything
+        self.max_context_tokens = max_context_tokens
         self.is_initialized = True
 
+    def _build_prompt(self, context: str, search_results: str) -> str:
+        excerpt_note = ""
+        if self.max_context_tokens:
+            selected = preselect(context, search_results, self.max_context_tokens)
+            if selected is not context:
+                context = selected
+                excerpt_note = (
+                    f"\n        O texto abaixo reúne apenas os trechos do vídeo pré-selecionados por conterem "
+                    f"afirmações verificáveis\n        ou relação com o noticiário; {OMISSION_MARKER} indica "
+                    f"partes omitidas.\n"
+                )
+        # Most of the token budget goes to the transcript, the rest to the web results
+        context = fit_prompt(context, "deepseek-r1-distill-llama-70b", share=0.75)
+        search_results = fit_prompt(search_results, "deepseek-r1-distill-llama-70b", share=0.2)
+        return f"""
+        Você é um jornalista investigativo experiente. Analise o texto a seguir, que é a transcrição
+        ou resumo de um vídeo em Português do Brasil, e destaque trechos que merecem investigação
+        jornalística adicional. Considere:
+        
+        1. Afirmações que podem ser verificadas factualmente
+        2. Conexões com notícias ou eventos atuais
+        3. Declarações controversas ou potencialmente enganosas
+        4. Implicações para políticas públicas ou interesse social
+        5. Informações que parecem novas ou pouco divulgadas
+        {excerpt_note}
+        Formate sua resposta como:
+        
+        # Pontos de Interesse Jornalístico
+        
+        ## Destaque 1: [Título breve]
+        **Trecho relevante:** [Trecho exato do texto]
+        **Momento no vídeo:** [Marcação [m:ss] mais próxima antes do trecho, se o texto tiver marcações]
+        **Por que investigar:** [Explicação sobre o valor jornalístico]
+        **Sugestão de abordagem:** [Como um jornalista poderia verificar ou explorar este ponto]
+        
+        [Repita o formato para cada destaque, com no mínimo 3 e no máximo 5 destaques]
+        
+        Texto a analisar:
+        {context}
+        
+        Contexto atual (resultados de busca na web):
+        {search_results}
+        """
+
     def forward(self, context: str, search_results: str, llm_api_key: str) -> str:
         """Identifies journalistically relevant highlights from the video content"""
         try:
-            from langchain_groq import ChatGroq
+            prompt = self._build_prompt(context, search_results)
             
-            # Initialize LLM for highlight analysis
-            llm = ChatGroq(
-                groq_api_key=llm_api_key,
-                model_name="deepseek-r1-distill-llama-70b",
-                temperature=0.3
+            def complete() -> str:
+                # Shared LLM client (pooled keep-alive connections) for highlight analysis
+                llm = get_chat_groq(llm_api_key, "deepseek-r1-distill-llama-70b", 0.3)
+                limiter = get_rate_limiter("groq", "deepseek-r1-distill-llama-70b")
+                return limiter.call(lambda: llm.invoke(prompt).content, tokens=request_tokens(prompt))
+
+            # Identical transcript + search results are served from the response cache
+            highlights = cached_completion(
+                prompt, "deepseek-r1-distill-llama-70b", 0.3, None, complete, use_cache=self.use_cache
             )
             
-            prompt = f"""
-            Você é um jornalista investigativo experiente. Analise o texto a seguir, que é a transcrição
-            ou resumo de um vídeo em Português do Brasil, e destaque trechos que merecem investigação
-            jornalística adicional. Considere:
-            
-            1. Afirmações que podem ser verificadas factualmente
-            2. Conexões com notícias ou eventos atuais
-            3. Declarações controversas ou potencialmente enganosas
-            4. Implicações para políticas públicas ou interesse social
-            5. Informações que parecem novas ou pouco divulgadas
-            
-            Formate sua resposta como:
-            
-            # Pontos de Interesse Jornalístico
-            
-            ## Destaque 1: [Título breve]
-            **Trecho relevante:** [Trecho exato do texto]
-            **Por que investigar:** [Explicação sobre o valor jornalístico]
-            **Sugestão de abordagem:** [Como um jornalista poderia verificar ou explorar este ponto]
-            
-            [Repita o formato para cada destaque, com no mínimo 3 e no máximo 5 destaques]
-            
-            Texto a analisar:
-            {context}
-            
-            Contexto atual (resultados de busca na web):
-            {search_results}
-            """
-            
-            response = llm.invoke(prompt)
-            highlights = response.content
-            
             return highlights
         except Exception as e:
+            if self.raise_errors:
+                raise
             import traceback
             traceback_str = traceback.format_exc()
             return f"Erro ao encontrar destaques jornalísticos: {str(e)}\n\nTraceback:\n{traceback_str}"
+
+    def stream(self, context: str, search_results: str, llm_api_key: str) -> Iterator[str]:
+        """Same as forward, but yields the highlights incrementally as the LLM generates them"""
+        try:
+            prompt = self._build_prompt(context, search_results)
+
+            def deltas() -> Iterator[str]:
+                llm = get_chat_groq(llm_api_key, "deepseek-r1-distill-llama-70b", 0.3)
+                limiter = get_rate_limiter("groq", "deepseek-r1-distill-llama-70b")
+                for chunk in limiter.call_stream(lambda: llm.stream(prompt), tokens=request_tokens(prompt)):
+                    if chunk.content:
+                        yield chunk.content
+
+            yield from cached_stream(
+                prompt, "deepseek-r1-distill-llama-70b", 0.3, None, deltas, use_cache=self.use_cache
+            )
+        except Exception as e:
+            if self.raise_errors:
+                raise
+            import traceback
+            traceback_str = traceback.format_exc()
+            yield f"Erro ao encontrar destaques jornalísticos: {str(e)}\n\nTraceback:\n{traceback_str}"
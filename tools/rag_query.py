@@ -1,75 +1,339 @@
-from typing import Any, Optional, Dict
+from typing import Any, Optional, Dict, Iterator, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from smolagents.tools import Tool
 import logging
-import groq
+import os
+from api_clients import get_groq_client
+from corpus_index import get_corpus_index
+from embedding_service import get_embedding_service
+from hybrid_retrieval import hybrid_search_batch
+from live_index import LiveIndex
+from llm_cache import cached_completion, cached_stream
+from rate_limiter import get_rate_limiter, request_tokens
+from segment_store import format_timestamp
+from token_budget import fit_prompt
+from tracing import bind, span
+from transcript_cache import get_transcript_cache
+
+def _doc_label(doc: Any) -> str:
+    """Time range prefix ("[m:ss–m:ss] ") for chunks indexed with timestamps, "" otherwise."""
+    t_start, t_end = doc.metadata.get("t_start"), doc.metadata.get("t_end")
+    if t_start is None:
+        return ""
+    return f"[{format_timestamp(t_start)}–{format_timestamp(t_end)}] "
+
+def _join(first: Dict[str, Any], second: Dict[str, Any]) -> None:
+    """Extends ``first`` with ``second``; both are overlapping or touching slices of the same transcript."""
+    if second["start"] < first["start"]:
+        first["text"] = second["text"][:first["start"] - second["start"]] + first["text"]
+    if second["end"] > first["end"]:
+        first["text"] += second["text"][len(second["text"]) - (second["end"] - first["end"]):]
+    first["start"], first["end"] = min(first["start"], second["start"]), max(first["end"], second["end"])
+    first["docs"].extend(second["docs"])
+
+def _merge_overlapping(docs: List[Any]) -> List[str]:
+    """Chunk texts with labels, merging chunks that overlap or touch in the transcript.
+
+    The splitter repeats ``chunk_overlap`` characters between neighbouring
+    chunks, so adjacent hits would otherwise send the same text twice. Merged
+    chunks take the place of the best-ranked one.
+    """
+    pieces: List[Dict[str, Any]] = []
+    for doc in docs:
+        start = doc.metadata.get("start_index")
+        if start is None:
+            pieces.append({"text": doc.page_content, "start": None, "docs": [doc]})
+            continue
+        current = {"text": doc.page_content, "start": start, "end": start + len(doc.page_content), "docs": [doc]}
+        # A chunk can bridge two pieces kept so far: fold all of them into the first
+        overlapping = [
+            piece for piece in pieces
+            if piece["start"] is not None and current["start"] <= piece["end"] and current["end"] >= piece["start"]
+        ]
+        if overlapping:
+            target = overlapping[0]
+            _join(target, current)
+            for piece in overlapping[1:]:
+                _join(target, piece)
+                pieces.remove(piece)
+        else:
+            pieces.append(current)
+
+    texts = []
+    for piece in pieces:
+        times = [(d.metadata.get("t_start"), d.metadata.get("t_end")) for d in piece["docs"]]
+        times = [(t_start, t_end) for t_start, t_end in times if t_start is not None]
+        label = (
+            f"[{format_timestamp(min(t for t, _ in times))}–{format_timestamp(max(t for _, t in times))}] "
+            if times else ""
+        )
+        texts.append(label + piece["text"])
+    return texts
+
+def _hit_labels(hits: List[Dict[str, Any]]) -> List[str]:
+    """Time ranges of corpus hits, mapped through each video's cached segments."""
+    transcripts: Dict[str, Any] = {}
+    labels = []
+    for hit in hits:
+        video_id = hit["video_id"]
+        if video_id not in transcripts:
+            transcripts[video_id] = get_transcript_cache().get(video_id)
+        transcript = transcripts[video_id]
+        if transcript is None or not transcript.has_timestamps or hit.get("chunk_offset") is None:
+            labels.append("")
+            continue
+        piece = transcript.slice_chars(hit["chunk_offset"], hit["chunk_offset"] + len(hit["text"]))
+        labels.append(f" | {format_timestamp(piece.t_start)}–{format_timestamp(piece.t_end)}")
+    return labels
 
 class RAGQueryTool(Tool):
     name = "rag_query"
     description = "Answers a question about the video content using Retrieval-Augmented Generation."
     inputs = {
         'question': {'type': 'string', 'description': 'The question to answer about the video content'},
-        'vectorstore': {'type': 'object', 'description': 'The vector store containing the video transcript chunks'},
-        'llm_api_key': {'type': 'string', 'description': 'API key for the LLM service'}
+        'vectorstore': {
+            'type': 'object',
+            'description': 'The vector store (or live index, while still transcribing) containing the video transcript chunks'
+        },
+        'llm_api_key': {'type': 'string', 'description': 'API key for the LLM service'},
+        'use_general_knowledge': {
+            'type': 'boolean',
+            'description': 'Whether the answer may use general knowledge beyond the transcript',
+            'nullable': True
+        },
+        'scope': {
+            'type': 'string',
+            'description': "'video' to search only the given vectorstore, 'corpus' to search every indexed video",
+            'nullable': True
+        },
+        'corpus_filters': {
+            'type': 'object',
+            'description': 'Optional corpus filters: video_id, channel, date_from, date_to (YYYY-MM-DD)',
+            'nullable': True
+        }
     }
     output_type = "string"
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, top_k: int = 3, candidates: int = 20, use_cache: bool = True, **kwargs):
         super().__init__()
+        self.use_cache = use_cache
+        self.top_k = top_k
+        self.candidates = candidates
         self.is_initialized = True
 
-    def forward(self, question: str, vectorstore: Any, llm_api_key: str, use_general_knowledge: bool = True) -> str:
-        """Performs a RAG query against the video transcript"""
-        try:
-            if vectorstore is None:
-                return "Não há transcrição indexada disponível. Por favor, transcreva um vídeo primeiro."
-            
-            # Initialize Groq client
-            client = groq.Client(api_key=llm_api_key)
-            
-            # Create retriever from vectorstore
-            retriever = vectorstore.as_retriever(
-                search_kwargs={"k": 3}
-            )
-            
-            # Retrieve relevant contexts
-            docs = retriever.get_relevant_documents(question)
-            context = "\n\n".join([doc.page_content for doc in docs])
-            
-            # Generate response with Groq
-            system_content = (
-                "Você é um assistente especialista em análise de vídeos e política brasileira.\n\n"
-                "Responda à pergunta com base:\n"
-                "1. No contexto da transcrição do vídeo\n"
-                "2. No seu próprio conhecimento geral\n"
-                "3. (Opcional) Em fatos recentes, se aplicável\n\n"
-                "Deixe claro quando uma parte da resposta vem da transcrição e quando vem do seu conhecimento geral."
-                if use_general_knowledge else
-                "Você é um assistente especializado em vídeos que responde perguntas com base apenas na transcrição fornecida.\n"
-                "Responda exclusivamente com informações contidas no contexto.\n"
-                "Se a informação não estiver no contexto, diga que não pode responder com base no que foi fornecido."
-            )
+    def _retrieve_contexts(
+        self,
+        questions: List[str],
+        vectorstore: Any,
+        scope: Optional[str],
+        corpus_filters: Optional[Dict[str, Any]]
+    ) -> List[str]:
+        """Retrieves the context of each question with one embedding batch and one batched FAISS search"""
+        # Embed the questions with the shared, already-loaded model
+        query_vectors = get_embedding_service().embed_queries(questions)
+
+        # Retrieve relevant contexts
+        with span("retrieval", scope=scope or "video") as current:
+            contexts = []
+            if scope == "corpus":
+                for hits in get_corpus_index().search_batch(query_vectors, k=5, **(corpus_filters or {})):
+                    contexts.append("\n\n".join(
+                        f"[vídeo {hit['video_id']} | {hit['channel'] or 'canal desconhecido'} | "
+                        f"{hit['published_at'] or 'data desconhecida'}{label}]\n{hit['text']}"
+                        for hit, label in zip(hits, _hit_labels(hits))
+                    ))
+            else:
+                # Hybrid BM25 + dense retrieval, optionally reranked by a local cross-encoder
+                if isinstance(vectorstore, LiveIndex):
+                    # Video still being transcribed: search what has been indexed so far
+                    results = vectorstore.search_batch(questions, query_vectors, k=self.top_k, candidates=self.candidates)
+                else:
+                    results = hybrid_search_batch(
+                        vectorstore, questions, query_vectors, k=self.top_k, candidates=self.candidates
+                    )
+                contexts = ["\n\n".join(_merge_overlapping(docs)) for docs in results]
+            current.set(items=len(questions), output_bytes=sum(len(context) for context in contexts))
+        return contexts
 
-            user_content = f"""
+    def _messages(self, question: str, context: str, use_general_knowledge: bool) -> List[Dict[str, str]]:
+        """Builds the chat messages sent to Groq for one question and its retrieved context"""
+        # Generate response with Groq
+        system_content = (
+            "Você é um assistente especialista em análise de vídeos e política brasileira.\n\n"
+            "Responda à pergunta com base:\n"
+            "1. No contexto da transcrição do vídeo\n"
+            "2. No seu próprio conhecimento geral\n"
+            "3. (Opcional) Em fatos recentes, se aplicável\n\n"
+            "Deixe claro quando uma parte da resposta vem da transcrição e quando vem do seu conhecimento geral."
+            if use_general_knowledge else
+            "Você é um assistente especializado em vídeos que responde perguntas com base apenas na transcrição fornecida.\n"
+            "Responda exclusivamente com informações contidas no contexto.\n"
+            "Se a informação não estiver no contexto, diga que não pode responder com base no que foi fornecido."
+        )
+
+        system_content += (
+            "\nQuando o trecho usado trouxer marcação de tempo [m:ss–m:ss], cite-a na resposta "
+            "para que o leitor encontre o momento no vídeo."
+        )
+
+        context = fit_prompt(context, "deepseek-coder-33b-instruct", max_output_tokens=2000, fixed_text=system_content)
+
+        user_content = f"""
 Pergunta: {question}
 
 Transcrição do vídeo (para análise):
 {context}
 """
 
-            chat_response = client.chat.completions.create(
-                model="deepseek-coder-33b-instruct",
-                messages=[
-                    {"role": "system", "content": system_content},
-                    {"role": "user", "content": user_content}
-                ],
-                temperature=0.2,
-                max_tokens=2000
+        return [
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": user_content}
+        ]
+
+    def _build_messages(
+        self,
+        question: str,
+        vectorstore: Any,
+        use_general_knowledge: bool,
+        scope: Optional[str],
+        corpus_filters: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, str]]:
+        """Retrieves the context and builds the chat messages sent to Groq"""
+        context = self._retrieve_contexts([question], vectorstore, scope, corpus_filters)[0]
+        return self._messages(question, context, use_general_knowledge)
+
+    def _answer(self, client: Any, limiter: Any, messages: List[Dict[str, str]]) -> str:
+        """Blocking completion, served from the response cache for the same question over the same context"""
+        def complete() -> str:
+            chat_response = limiter.call(
+                lambda: client.chat.completions.create(
+                    model="deepseek-coder-33b-instruct",
+                    messages=messages,
+                    temperature=0.2,
+                    max_tokens=2000
+                ),
+                tokens=request_tokens(messages, 2000)
             )
+            return chat_response.choices[0].message.content
+
+        return cached_completion(
+            messages, "deepseek-coder-33b-instruct", 0.2, 2000, complete, use_cache=self.use_cache
+        )
+
+    def forward(
+        self,
+        question: str,
+        vectorstore: Any,
+        llm_api_key: str,
+        use_general_knowledge: bool = True,
+        scope: Optional[str] = "video",
+        corpus_filters: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Performs a RAG query against the video transcript or the whole corpus"""
+        try:
+            if scope != "corpus" and vectorstore is None:
+                return "Não há transcrição indexada disponível. Por favor, transcreva um vídeo primeiro."
             
-            response_content = chat_response.choices[0].message.content
+            # Shared Groq client with pooled connections; retries are handled by the rate limiter
+            client = get_groq_client(llm_api_key)
+            limiter = get_rate_limiter("groq", "deepseek-coder-33b-instruct")
+            
+            messages = self._build_messages(question, vectorstore, use_general_knowledge, scope, corpus_filters)
+            response_content = self._answer(client, limiter, messages)
             
             return f"Resposta baseada na transcrição do vídeo:\n\n{response_content}"
         except Exception as e:
             import traceback
             traceback_str = traceback.format_exc()
             return f"Erro ao responder à pergunta: {str(e)}\n\nTraceback:\n{traceback_str}"
+
+    def stream(
+        self,
+        question: str,
+        vectorstore: Any,
+        llm_api_key: str,
+        use_general_knowledge: bool = True,
+        scope: Optional[str] = "video",
+        corpus_filters: Optional[Dict[str, Any]] = None
+    ) -> Iterator[str]:
+        """Same as forward, but yields the answer incrementally as Groq generates it"""
+        try:
+            if scope != "corpus" and vectorstore is None:
+                yield "Não há transcrição indexada disponível. Por favor, transcreva um vídeo primeiro."
+                return
+
+            client = get_groq_client(llm_api_key)
+            limiter = get_rate_limiter("groq", "deepseek-coder-33b-instruct")
+            messages = self._build_messages(question, vectorstore, use_general_knowledge, scope, corpus_filters)
+
+            def deltas() -> Iterator[str]:
+                response = limiter.call_stream(
+                    lambda: client.chat.completions.create(
+                        model="deepseek-coder-33b-instruct",
+                        messages=messages,
+                        temperature=0.2,
+                        max_tokens=2000,
+                        stream=True
+                    ),
+                    tokens=request_tokens(messages, 2000)
+                )
+                for chunk in response:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+
+            yield "Resposta baseada na transcrição do vídeo:\n\n"
+            yield from cached_stream(
+                messages, "deepseek-coder-33b-instruct", 0.2, 2000, deltas, use_cache=self.use_cache
+            )
+        except Exception as e:
+            import traceback
+            traceback_str = traceback.format_exc()
+            yield f"Erro ao responder à pergunta: {str(e)}\n\nTraceback:\n{traceback_str}"
+
+    def answer_batch(
+        self,
+        questions: List[str],
+        vectorstore: Any,
+        llm_api_key: str,
+        use_general_knowledge: bool = True,
+        scope: Optional[str] = "video",
+        corpus_filters: Optional[Dict[str, Any]] = None,
+        max_concurrency: Optional[int] = None
+    ) -> Iterator[Tuple[int, str]]:
+        """Answers several questions about the same video, yielding (position, answer) as each one finishes
+
+        Retrieval is shared: one embedding batch and one FAISS search for all the
+        questions. The completions run concurrently, at most ``max_concurrency``
+        (``RAG_MAX_CONCURRENCY``, default 4) at a time, still under the shared rate
+        limiter. A failed question yields its error message without stopping the others.
+        """
+        if not questions:
+            return
+        if scope != "corpus" and vectorstore is None:
+            for position in range(len(questions)):
+                yield position, "Não há transcrição indexada disponível. Por favor, transcreva um vídeo primeiro."
+            return
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("RAG_MAX_CONCURRENCY", "4"))
+
+        with span("rag.batch", items=len(questions)):
+            try:
+                contexts = self._retrieve_contexts(questions, vectorstore, scope, corpus_filters)
+            except Exception as e:
+                for position in range(len(questions)):
+                    yield position, f"Erro ao responder à pergunta: {str(e)}"
+                return
+
+            client = get_groq_client(llm_api_key)
+            limiter = get_rate_limiter("groq", "deepseek-coder-33b-instruct")
+            answer = bind(lambda messages: self._answer(client, limiter, messages))
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(questions)))) as executor:
+                futures = {
+                    executor.submit(answer, self._messages(question, context, use_general_knowledge)): position
+                    for position, (question, context) in enumerate(zip(questions, contexts))
+                }
+                for future in as_completed(futures):
+                    try:
+                        yield futures[future], f"Resposta baseada na transcrição do vídeo:\n\n{future.result()}"
+                    except Exception as e:
+                        yield futures[future], f"Erro ao responder à pergunta: {str(e)}"
@@ -1,6 +1,9 @@
 from typing import Any
 from smolagents.tools import Tool
-from langchain_groq import ChatGroq
+from api_clients import get_chat_groq
+from llm_cache import cached_completion
+from rate_limiter import get_rate_limiter, request_tokens
+from token_budget import fit_prompt
 
 class SummarizationTool(Tool):
     name = "video_summarizer"
@@ -11,26 +14,30 @@ class SummarizationTool(Tool):
     }
     output_type = "string"
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, use_cache: bool = True, **kwargs):
         super().__init__()
+        self.use_cache = use_cache
         self.is_initialized = True
 
     def forward(self, transcript: str, llm_api_key: str) -> str:
         try:
-            llm = ChatGroq(
-                groq_api_key=llm_api_key,
-                model_name="deepseek-r1-distill-llama-70b",
-                temperature=0.3
-            )
-
+            # Fits the transcript to the model's context window instead of failing on long videos
+            transcript = fit_prompt(transcript, "deepseek-r1-distill-llama-70b")
             prompt = f"""
             Você é um jornalista experiente. Abaixo está a transcrição de um vídeo em Português.
             Gere um resumo objetivo e claro com os principais pontos abordados:
 
             {transcript}
             """
-            response = llm.invoke(prompt)
-            return response.content
+
+            def complete() -> str:
+                llm = get_chat_groq(llm_api_key, "deepseek-r1-distill-llama-70b", 0.3)
+                limiter = get_rate_limiter("groq", "deepseek-r1-distill-llama-70b")
+                return limiter.call(lambda: llm.invoke(prompt).content, tokens=request_tokens(prompt))
+
+            return cached_completion(
+                prompt, "deepseek-r1-distill-llama-70b", 0.3, None, complete, use_cache=self.use_cache
+            )
         except Exception as e:
             import traceback
             return f"Erro ao resumir o vídeo: {str(e)}\n\n{traceback.format_exc()}"
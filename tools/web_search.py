@@ -1,5 +1,6 @@
 from typing import Any, Optional
 from smolagents.tools import Tool
+from tracing import span
 
 class WebSearchTool(Tool):
     name = "web_search"
@@ -22,18 +23,21 @@ class WebSearchTool(Tool):
     def forward(self, query: str) -> str:
         """Performs a web search and returns formatted results"""
         try:
-            results = self.ddgs.text(query, max_results=self.max_results)
+            with span("web_search") as current:
+                results = self.ddgs.text(query, max_results=self.max_results)
+                current.set(items=len(results))
             
-            if len(results) == 0:
-                return f"Nenhum resultado encontrado para a busca: '{query}'"
-            
-            formatted_results = "Resultados da busca:\n\n"
-            for i, result in enumerate(results, 1):
-                formatted_results += f"### Resultado {i}: {result['title']}\n"
-                formatted_results += f"{result['body']}\n"
-                formatted_results += f"**Fonte:** {result['href']}\n\n"
-            
-            return formatted_results
+                if len(results) == 0:
+                    return f"Nenhum resultado encontrado para a busca: '{query}'"
+                
+                formatted_results = "Resultados da busca:\n\n"
+                for i, result in enumerate(results, 1):
+                    formatted_results += f"### Resultado {i}: {result['title']}\n"
+                    formatted_results += f"{result['body']}\n"
+                    formatted_results += f"**Fonte:** {result['href']}\n\n"
+                current.set(output_bytes=len(formatted_results))
+                
+                return formatted_results
         except Exception as e:
             import traceback
             traceback_str = traceback.format_exc()
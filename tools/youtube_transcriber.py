@@ -1,61 +1,363 @@
-import requests
+import json
 import tempfile
 import os
 import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from smolagents.tools import Tool
+from audio_fingerprint import (
+    Fingerprint,
+    FingerprintIndex,
+    Match,
+    fingerprint_file,
+    get_fingerprint_index,
+    probe_fingerprint
+)
+from audio_segments import cut_segment, probe_duration
+from segment_store import Transcript, trim_window
+from tracing import bind, span
+from transcript_cache import TranscriptCache, extract_video_id, get_transcript_cache
+from transcription_backends import WHISPER_API_URL, TranscriptionBackend, WhisperAPIError, get_transcription_backend
+
+# Menor stream de áudio nativo do vídeo (o Whisper reamostra para 16 kHz de qualquer forma)
+AUDIO_FORMAT = os.getenv("YTDLP_AUDIO_FORMAT", "worstaudio[abr>=32]/worstaudio/bestaudio/best")
+# Fala: mono, 16 kHz, Opus a 24 kbps (~11 MB por hora, contra ~60 MB do MP3 anterior)
+SPEECH_SAMPLE_RATE = 16000
+SPEECH_BITRATE = os.getenv("AUDIO_BITRATE", "24k")
+# Reenvios, cortes e espelhos: reaproveita a transcrição de trechos já transcritos em outro vídeo
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") != "0"
+# Mínimo de áudio em comum para reaproveitar (abaixo disso, transcreve tudo)
+DEDUP_MIN_SECONDS = float(os.getenv("DEDUP_MIN_SECONDS", "30"))
+# Trechos novos mais curtos que isso ficam com o trecho reaproveitado vizinho
+DEDUP_MIN_NOVEL_SECONDS = float(os.getenv("DEDUP_MIN_NOVEL_SECONDS", "8"))
+# Folga nos recortes dos trechos novos (o corte sem recodificação não é exato)
+DEDUP_PAD_SECONDS = 2.0
+
+def _stderr_tail(path: str, limit: int = 2000) -> str:
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()[-limit:].strip()
+    except OSError:
+        return ""
+
+def download_audio(url: str, directory: str) -> str:
+    """Baixa o menor stream de áudio e o converte para fala (Opus mono 16 kHz) num pipe.
+
+    O yt-dlp escreve o stream original no stdout e o ffmpeg o lê direto do pipe,
+    sem arquivo intermediário nem recodificação para MP3. Grava ``audio.ogg`` e
+    ``audio.info.json`` em ``directory`` e devolve o caminho do áudio.
+    """
+    audio_path = os.path.join(directory, "audio.ogg")
+    ytdlp_log = os.path.join(directory, "yt-dlp.log")
+    ffmpeg_log = os.path.join(directory, "ffmpeg.log")
+    download_cmd = [
+        "yt-dlp",
+        "-f", AUDIO_FORMAT,
+        "--quiet", "--no-progress", "--no-playlist",
+        "--write-info-json",
+        "-o", "-",
+        "-o", "infojson:" + os.path.join(directory, "audio.%(ext)s"),
+        url
+    ]
+    transcode_cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", "pipe:0",
+        "-vn", "-ac", "1", "-ar", str(SPEECH_SAMPLE_RATE),
+        "-c:a", "libopus", "-b:a", SPEECH_BITRATE, "-application", "voip",
+        audio_path
+    ]
+
+    with open(ytdlp_log, "wb") as ytdlp_err, open(ffmpeg_log, "wb") as ffmpeg_err:
+        download = subprocess.Popen(download_cmd, stdout=subprocess.PIPE, stderr=ytdlp_err)
+        try:
+            transcode = subprocess.Popen(transcode_cmd, stdin=download.stdout, stderr=ffmpeg_err)
+        except BaseException:
+            download.kill()
+            download.wait()
+            raise
+        # Só o ffmpeg fica com o pipe: se ele morrer, o yt-dlp recebe SIGPIPE
+        download.stdout.close()
+        try:
+            transcode.wait()
+            download.wait()
+        finally:
+            for process in (transcode, download):
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+
+    if download.returncode != 0:
+        raise RuntimeError(f"yt-dlp falhou (código {download.returncode}): {_stderr_tail(ytdlp_log)}")
+    if transcode.returncode != 0 or not os.path.exists(audio_path):
+        raise RuntimeError(f"ffmpeg falhou (código {transcode.returncode}): {_stderr_tail(ffmpeg_log)}")
+    return audio_path
+
+def read_video_metadata(info_path: str) -> Dict[str, Any]:
+    """Extrai canal, data e título do .info.json gravado pelo yt-dlp."""
+    try:
+        with open(info_path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    upload_date = info.get("upload_date") or ""
+    return {
+        "title": info.get("title"),
+        "channel": info.get("channel") or info.get("uploader"),
+        "published_at": (
+            f"{upload_date[:4]}-{upload_date[4:6]}-{upload_date[6:8]}" if len(upload_date) == 8 else None
+        ),
+        "duration": info.get("duration")
+    }
+
+def plan_reuse(
+    matches: List[Match],
+    duration: float,
+    min_novel_seconds: float = DEDUP_MIN_NOVEL_SECONDS
+) -> List[Tuple[float, float, Optional[Match]]]:
+    """Divide [0, duration) em trechos reaproveitados (com o vídeo de origem) e trechos novos (None).
+
+    Trechos novos curtos são absorvidos pelo trecho reaproveitado vizinho: as
+    bordas dos trechos encontrados pelo fingerprint são aproximadas.
+    """
+    covered = sorted((start, end, match) for match in matches for start, end in match.intervals)
+    plan: List[Tuple[float, float, Optional[Match]]] = []
+    position = 0.0
+    for start, end, match in covered:
+        if start - position >= min_novel_seconds:
+            plan.append((position, start, None))
+        elif plan and plan[-1][2] is not None:
+            # Lacuna curta entre dois trechos reaproveitados: metade para cada lado
+            middle = (position + start) / 2
+            plan[-1] = (plan[-1][0], middle, plan[-1][2])
+            start = middle
+        else:
+            start = position
+        plan.append((start, end, match))
+        position = end
+    if duration - position >= min_novel_seconds or not plan:
+        plan.append((position, duration, None))
+    elif plan[-1][2] is not None:
+        plan[-1] = (plan[-1][0], duration, plan[-1][2])
+    return plan
 
 class YouTubeTranscriberTool(Tool):
     name = "youtube_transcriber"
-    description = "Transcribes a YouTube video using OpenAI Whisper API."
+    description = "Transcribes a YouTube video using OpenAI Whisper API (or a local Whisper engine)."
     inputs = {
         'url': {'type': 'string', 'description': 'The YouTube video URL'},
         'openai_api_key': {'type': 'string', 'description': 'OpenAI API Key'}
     }
     output_type = "string"
 
-    def __init__(self, *args, **kwargs):
+    def __init__(
+        self,
+        *args,
+        cache: Optional[TranscriptCache] = None,
+        use_cache: bool = True,
+        backend: Optional[TranscriptionBackend] = None,
+        api_url: str = WHISPER_API_URL,
+        segmented: Optional[bool] = None,
+        segment_seconds: float = float(os.getenv("WHISPER_SEGMENT_SECONDS", "600")),
+        overlap_seconds: float = 5.0,
+        max_workers: int = int(os.getenv("WHISPER_MAX_WORKERS", "4")),
+        max_retries: int = 3,
+        dedup: bool = DEDUP_ENABLED,
+        fingerprints: Optional[FingerprintIndex] = None,
+        **kwargs
+    ):
         super().__init__()
+        self.cache = (cache or get_transcript_cache()) if use_cache else None
+        # A transcrição reaproveitada vem do cache: sem ele, não há o que reaproveitar
+        self.fingerprints = (fingerprints or get_fingerprint_index()) if dedup and self.cache is not None else None
+        # Backend escolhido por implantação (TRANSCRIPTION_BACKEND); as opções abaixo valem para a API
+        self.backend = backend or get_transcription_backend(
+            api_url=api_url,
+            segmented=segmented,
+            segment_seconds=segment_seconds,
+            overlap_seconds=overlap_seconds,
+            max_workers=max_workers,
+            max_retries=max_retries
+        )
         self.is_initialized = True
 
-    def forward(self, url: str, openai_api_key: str) -> str:
-        try:
-            temp_dir = tempfile.mkdtemp()
-            mp3_path = os.path.join(temp_dir, "audio.%(ext)s")
-            final_path = os.path.join(temp_dir, "audio.mp3")
-
-            # Baixar e converter com yt-dlp
-            command = [
-                "yt-dlp",
-                "-x", "--audio-format", "mp3",
-                "--output", mp3_path,
-                url
-            ]
-            subprocess.run(command, check=True)
-
-            # Corrige o nome do arquivo gerado
-            downloaded_files = os.listdir(temp_dir)
-            for file in downloaded_files:
-                if file.endswith(".mp3"):
-                    os.rename(os.path.join(temp_dir, file), final_path)
-                    break
-
-            with open(final_path, "rb") as f:
-                response = requests.post(
-                    "https://api.openai.com/v1/audio/transcriptions",
-                    headers={"Authorization": f"Bearer {openai_api_key}"},
-                    files={"file": f},
-                    data={"model": "whisper-1", "language": "pt"}
+    def transcribe_file(
+        self,
+        path: str,
+        openai_api_key: str,
+        on_segments: Optional[Callable[[Transcript], None]] = None
+    ) -> Transcript:
+        return self.backend.transcribe(path, api_key=openai_api_key, on_segments=on_segments)
+
+    def _with_transcript(self, matches: List[Match]) -> List[Match]:
+        """Só as origens cuja transcrição (com timestamps) ainda está no cache; lê só os metadados."""
+        usable = []
+        for match in matches:
+            entry = self.cache.peek(match.video_id)
+            if entry is not None and entry.get("segments"):
+                usable.append(match)
+        return usable
+
+    def find_duplicates(
+        self,
+        video_id: Optional[str],
+        audio_path: str,
+        fingerprinting: "Future[Fingerprint]"
+    ) -> Tuple[Optional[Fingerprint], List[Match]]:
+        """Vídeos já transcritos que têm trechos do áudio, e a impressão digital completa se houver algum.
+
+        Uma busca rápida com amostras do áudio decide se vale esperar a impressão
+        completa (``fingerprinting``, calculada em paralelo). Falhas aqui nunca
+        impedem a transcrição: o vídeo é tratado como novo.
+        """
+        with span("dedup.lookup") as current:
+            try:
+                probe = probe_fingerprint(audio_path, probe_duration(audio_path))
+                if not self._with_transcript(self.fingerprints.match(probe, exclude=video_id)):
+                    current.set(items=len(probe), matches=0)
+                    return None, []
+                fingerprint = fingerprinting.result()
+                matches = self._with_transcript(self.fingerprints.match(fingerprint, exclude=video_id))
+            except Exception as e:
+                current.set(skipped=str(e))
+                return None, []
+            current.set(items=len(fingerprint), matches=len(matches))
+            if sum(match.covered_seconds for match in matches) < DEDUP_MIN_SECONDS:
+                return fingerprint, []
+            return fingerprint, matches
+
+    def load_sources(self, matches: List[Match]) -> Dict[str, Transcript]:
+        """Transcrição de cada origem, lida uma vez; leituras internas, fora das estatísticas do cache."""
+        sources = {}
+        for video_id in {match.video_id for match in matches}:
+            source = self.cache.get(video_id, count=False)
+            if source is None or not source.has_timestamps:
+                raise ValueError(f"transcrição de {video_id} saiu do cache")
+            sources[video_id] = source
+        return sources
+
+    def transcribe_reusing(
+        self,
+        audio_path: str,
+        openai_api_key: str,
+        matches: List[Match],
+        duration: float,
+        sources: Dict[str, Transcript]
+    ) -> Tuple[Transcript, float]:
+        """Transcrição montada com os trechos de outros vídeos; só os trechos novos vão ao backend.
+
+        ``sources`` traz a transcrição de cada origem (ver ``load_sources``).
+        Devolve a transcrição e os segundos efetivamente transcritos.
+        """
+        parts: List[Transcript] = []
+        novel_seconds = 0.0
+        cut_dir = tempfile.mkdtemp(dir=os.path.dirname(audio_path))
+        _, ext = os.path.splitext(audio_path)
+        for i, (start, end, match) in enumerate(plan_reuse(matches, duration)):
+            if match is not None:
+                # t no vídeo novo = t + offset na origem
+                parts.append(trim_window(sources[match.video_id].shifted(-match.offset), start, end))
+                continue
+            cut_start = max(0.0, start - DEDUP_PAD_SECONDS)
+            with span("audio.cut", items=1):
+                piece_path = cut_segment(
+                    audio_path, cut_start, end + DEDUP_PAD_SECONDS, os.path.join(cut_dir, f"novel_{i:04d}{ext}")
                 )
+            try:
+                piece = self.transcribe_file(piece_path, openai_api_key)
+            finally:
+                os.remove(piece_path)
+            if piece and not piece.has_timestamps:
+                raise ValueError("trecho novo transcrito sem timestamps")
+            parts.append(trim_window(piece.shifted(cut_start), start, end))
+            novel_seconds += end - start
+        os.rmdir(cut_dir)
+        return Transcript.concat(parts), novel_seconds
 
-            os.remove(final_path)
-            os.rmdir(temp_dir)
+    def transcribe(
+        self,
+        url: str,
+        openai_api_key: str,
+        on_segments: Optional[Callable[[Transcript], None]] = None
+    ) -> Transcript:
+        """Transcrição do vídeo com os segmentos; lança exceção em caso de falha.
 
-            if response.status_code == 200:
-                result = response.json()
-                return f"Transcrição do vídeo:\n\n{result['text']}"
-            else:
-                return f"Erro na transcrição com Whisper API: {response.text}"
+        ``on_segments`` recebe os trechos à medida que são transcritos (não é
+        chamado quando a transcrição vem do cache). Se o áudio repete trechos
+        de vídeos já transcritos (reenvio, corte, espelho), esses trechos são
+        reaproveitados e só o resto é transcrito; nesse caso ``on_segments``
+        recebe a transcrição montada de uma vez.
+        """
+        with span("transcriber") as current:
+            # Vídeo já transcrito: evita o download e a chamada paga ao Whisper
+            if self.cache is not None:
+                cached = self.cache.get(url)
+                current.set(cache_hit=cached is not None)
+                if cached is not None:
+                    return cached
 
+            # Apagado ao sair, inclusive em caso de erro
+            with tempfile.TemporaryDirectory(prefix="agent-yt-") as temp_dir:
+                with span("audio.download") as download:
+                    audio_path = download_audio(url, temp_dir)
+                    download.set(output_bytes=os.path.getsize(audio_path))
+
+                video_id = extract_video_id(url)
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    # Impressão completa em paralelo com a transcrição (a API espera a rede; o cálculo usa a CPU)
+                    fingerprinting = (
+                        executor.submit(bind(fingerprint_file), audio_path) if self.fingerprints is not None else None
+                    )
+                    fingerprint, matches = (
+                        self.find_duplicates(video_id, audio_path, fingerprinting) if fingerprinting else (None, [])
+                    )
+                    text = None
+                    if matches:
+                        with span("dedup.compose") as compose:
+                            try:
+                                text, novel_seconds = self.transcribe_reusing(
+                                    audio_path, openai_api_key, matches, fingerprint.duration,
+                                    self.load_sources(matches)
+                                )
+                            except Exception as e:
+                                # Montagem falhou (ex.: trecho sem timestamps): transcreve o vídeo inteiro
+                                compose.set(fallback=str(e))
+                            else:
+                                compose.set(audio_seconds=novel_seconds, matches=len(matches))
+                                if on_segments is not None and text:
+                                    on_segments(text)
+                    if text is None:
+                        matches = []
+                        text = self.transcribe_file(audio_path, openai_api_key, on_segments=on_segments)
+                metadata = read_video_metadata(os.path.join(temp_dir, "audio.info.json"))
+
+            if matches:
+                metadata.update(
+                    reused_from=[
+                        {"video_id": m.video_id, "offset": round(m.offset, 2), "seconds": round(m.covered_seconds, 1)}
+                        for m in matches
+                    ],
+                    novel_seconds=round(novel_seconds, 1)
+                )
+            if self.cache is not None:
+                self.cache.put(url, text, **metadata)
+            if fingerprinting is not None and video_id is not None:
+                try:
+                    self.fingerprints.add(video_id, fingerprinting.result())
+                except Exception as e:
+                    # Sem impressão digital, o vídeo só não será reconhecido em reenvios
+                    current.set(fingerprint_error=str(e))
+            current.set(
+                output_bytes=len(text.encode("utf-8")),
+                audio_seconds=metadata.get("duration"),
+                segments=len(text.starts)
+            )
+            return text
+
+    def forward(self, url: str, openai_api_key: str) -> str:
+        try:
+            return f"Transcrição do vídeo:\n\n{self.transcribe(url, openai_api_key)}"
+        except WhisperAPIError as e:
+            return f"Erro na transcrição com Whisper API: {e}"
         except Exception as e:
             import traceback
             traceback_str = traceback.format_exc()
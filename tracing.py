@@ -0,0 +1,353 @@
+"""
+Rastreamento das etapas (spans), contagem de tokens e exportação de métricas.
+
+Cada processamento de vídeo abre um trace (``start_trace``); dentro dele, o
+transcritor, o indexador, as chamadas ao LLM e as ferramentas abrem spans
+aninhados (``span``) com duração, tamanho das cargas, tokens de prompt e de
+resposta e acertos de cache. O span atual é propagado por contextvars; para
+levá-lo a outra thread, envolva a função com ``bind`` antes de enviá-la ao pool.
+
+Ao terminar, os spans do trace são acrescentados a um JSONL (TRACE_FILE, por
+padrão <cache>/traces/spans.jsonl; TRACE_FILE=0 desativa). Todos os spans,
+com ou sem trace, alimentam as métricas do processo, expostas em formato
+Prometheus por ``metrics_text`` e, se METRICS_PORT estiver definido, num
+endpoint HTTP (``start_metrics_server``).
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from storage import cache_dir
+
+# Limites dos buckets do histograma de duração (segundos)
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+# Atributos numéricos somados em contadores por span
+COUNTED_ATTRS = ("prompt_tokens", "completion_tokens", "input_bytes", "output_bytes", "items")
+# Evita que um trace muito grande (ex.: árvore de resumo enorme) ocupe memória demais
+MAX_SPANS_PER_TRACE = 5000
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: Optional[str] = None
+    trace: Optional["Trace"] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    start: float = 0.0
+    end: Optional[float] = None
+    status: str = "ok"
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def add(self, key: str, amount: float = 1) -> None:
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id if self.trace else None,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attrs": self.attrs,
+        }
+
+class Trace:
+    """Spans de uma execução (um vídeo processado, uma pergunta...)."""
+
+    def __init__(self, name: str, **attrs: Any):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = attrs
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def _append(self, span: Span) -> None:
+        with self._lock:
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def finished_spans(self) -> List[Span]:
+        with self._lock:
+            return [s for s in self.spans if s.end is not None]
+
+    def waterfall(self) -> List[Dict[str, Any]]:
+        """Linhas para o gráfico em cascata: início e fim relativos ao começo do trace."""
+        spans = sorted(self.finished_spans(), key=lambda s: s.start)
+        if not spans:
+            return []
+        origin = spans[0].start
+        depth: Dict[str, int] = {}
+        rows = []
+        for s in spans:
+            depth[s.span_id] = depth.get(s.parent_id, -1) + 1 if s.parent_id else 0
+            rows.append({
+                "span": s.name,
+                "depth": depth[s.span_id],
+                "start_ms": 1000 * (s.start - origin),
+                "end_ms": 1000 * (s.end - origin),
+                "duration_ms": 1000 * s.duration,
+                "status": s.status,
+                "attrs": s.attrs,
+            })
+        return rows
+
+    def totals(self) -> Dict[str, Any]:
+        """Somatório de tokens, bytes e acertos de cache do trace."""
+        totals: Dict[str, Any] = {key: 0 for key in COUNTED_ATTRS}
+        totals.update({"spans": 0, "errors": 0, "llm_calls": 0, "cache_hits": 0, "cache_misses": 0})
+        for s in self.finished_spans():
+            totals["spans"] += 1
+            totals["errors"] += s.status != "ok"
+            totals["llm_calls"] += s.name == "llm"
+            for key in COUNTED_ATTRS:
+                value = s.attrs.get(key)
+                if isinstance(value, (int, float)):
+                    totals[key] += value
+            if "cache_hit" in s.attrs:
+                totals["cache_hits" if s.attrs["cache_hit"] else "cache_misses"] += 1
+        totals["dropped_spans"] = self.dropped
+        return totals
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+def set_attrs(**attrs: Any) -> None:
+    """Acrescenta atributos ao span atual, se houver."""
+    span_ = _current_span.get()
+    if span_ is not None:
+        span_.set(**attrs)
+
+def _reset(var: contextvars.ContextVar, token: contextvars.Token) -> None:
+    try:
+        var.reset(token)
+    except ValueError:
+        # Gerador finalizado em outro contexto (ex.: stream abandonado)
+        pass
+
+@contextlib.contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span]:
+    """Abre um span filho do span atual; exceções marcam o span com erro e são relançadas."""
+    parent = _current_span.get()
+    trace = _current_trace.get()
+    current = Span(
+        name=name,
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent else None,
+        trace=trace,
+        attrs=dict(attrs),
+        start=time.time()
+    )
+    if trace is not None:
+        trace._append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end = time.time()
+        _reset(_current_span, token)
+        get_metrics().observe(current)
+
+@contextlib.contextmanager
+def start_trace(name: str, **attrs: Any) -> Iterator[Trace]:
+    """Abre um trace com um span raiz ``name``; ao sair, exporta os spans para o JSONL."""
+    trace = Trace(name, **attrs)
+    token = _current_trace.set(trace)
+    try:
+        with span(name, **attrs):
+            yield trace
+    finally:
+        _reset(_current_trace, token)
+        export_trace(trace)
+
+def bind(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Leva o trace e o span atuais para a thread que executar ``func``.
+
+    Cada chamada roda numa cópia do contexto, de modo que a função pode ser
+    usada em ``executor.map`` ou submetida várias vezes em paralelo.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        return context.copy().run(func, *args, **kwargs)
+
+    return run
+
+_export_lock = threading.Lock()
+
+def trace_file() -> Optional[str]:
+    path = os.getenv("TRACE_FILE")
+    if path == "0":
+        return None
+    return path or os.path.join(cache_dir("traces"), "spans.jsonl")
+
+def export_trace(trace: Trace) -> None:
+    """Acrescenta os spans do trace ao JSONL (uma linha por span)."""
+    path = trace_file()
+    if path is None:
+        return
+    lines = "".join(
+        json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n" for s in trace.finished_spans()
+    )
+    try:
+        with _export_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(lines)
+    except OSError:
+        pass
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}" if labels else ""
+
+class Metrics:
+    """Contadores e histogramas do processo, alimentados pelos spans encerrados."""
+
+    def __init__(self, prefix: str = "agent_yt"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+
+    def inc(self, metric: str, amount: float = 1, **labels: Any) -> None:
+        key = (metric, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, span_: Span) -> None:
+        duration = span_.duration or 0.0
+        with self._lock:
+            hist = self._histograms.setdefault(
+                span_.name, {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0}
+            )
+            for i, limit in enumerate(DURATION_BUCKETS):
+                if duration <= limit:
+                    hist["buckets"][i] += 1
+            hist["sum"] += duration
+            hist["count"] += 1
+        if span_.status != "ok":
+            self.inc("span_errors_total", span=span_.name)
+        for key in COUNTED_ATTRS:
+            value = span_.attrs.get(key)
+            if isinstance(value, (int, float)) and value:
+                if key.endswith("_tokens"):
+                    self.inc("llm_tokens_total", value, kind=key[:-len("_tokens")], model=span_.attrs.get("model", ""))
+                else:
+                    self.inc(f"{key}_total", value, span=span_.name)
+        if "cache_hit" in span_.attrs:
+            self.inc("cache_lookups_total", span=span_.name, result="hit" if span_.attrs["cache_hit"] else "miss")
+
+    def render(self) -> str:
+        """Texto no formato de exposição do Prometheus."""
+        p = self.prefix
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = {name: {**h, "buckets": list(h["buckets"])} for name, h in sorted(self._histograms.items())}
+
+        lines = [f"# TYPE {p}_span_duration_seconds histogram"]
+        for name, hist in histograms.items():
+            label = f'span="{_escape(name)}"'
+            for limit, count in zip(DURATION_BUCKETS, hist["buckets"]):
+                lines.append(f'{p}_span_duration_seconds_bucket{{{label},le="{limit}"}} {count}')
+            lines.append(f'{p}_span_duration_seconds_bucket{{{label},le="+Inf"}} {hist["count"]}')
+            lines.append(f"{p}_span_duration_seconds_sum{{{label}}} {hist['sum']:.6f}")
+            lines.append(f"{p}_span_duration_seconds_count{{{label}}} {hist['count']}")
+
+        declared = set()
+        for (metric, labels), value in counters:
+            if metric not in declared:
+                lines.append(f"# TYPE {p}_{metric} counter")
+                declared.add(metric)
+            lines.append(f"{p}_{metric}{_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+_instance_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def _create_metrics() -> Metrics:
+    return Metrics()
+
+def get_metrics() -> Metrics:
+    """Registro de métricas único por processo."""
+    with _instance_lock:
+        return _create_metrics()
+
+def metrics_text() -> str:
+    from rate_limiter import rate_limiter_stats
+
+    lines = [get_metrics().render().rstrip("\n")]
+    # Contadores dos limitadores de taxa (requisições, novas tentativas, espera na fila)
+    limiters = sorted(rate_limiter_stats().items())
+    for key in ("requests", "retries", "throttled", "failures", "wait_seconds", "backoff_seconds"):
+        if limiters:
+            lines.append(f"# TYPE agent_yt_rate_limiter_{key}_total counter")
+        for name, stats in limiters:
+            lines.append(f'agent_yt_rate_limiter_{key}_total{{limiter="{_escape(name)}"}} {stats[key]:g}')
+    return "\n".join(lines) + "\n"
+
+@functools.lru_cache(maxsize=1)
+def _create_metrics_server(port: int) -> Any:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((os.getenv("METRICS_HOST", "127.0.0.1"), port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+def start_metrics_server(port: Optional[int] = None) -> Optional[Any]:
+    """Sobe (uma única vez por processo) o endpoint /metrics; sem porta nem METRICS_PORT, não faz nada."""
+    port = port or int(os.getenv("METRICS_PORT", "0"))
+    if not port:
+        return None
+    with _instance_lock:
+        try:
+            return _create_metrics_server(port)
+        except OSError:
+            # Porta ocupada (ex.: outro processo do app já exporta as métricas)
+            return None
@@ -0,0 +1,271 @@
+"""
+Cache persistente de transcrições, indexado pelo ID do vídeo do YouTube.
+
+Evita rodar o yt-dlp e pagar novamente a API do Whisper para um vídeo que já
+foi transcrito, inclusive entre sessões diferentes do Streamlit. Transcrições
+com timestamps guardam os segmentos num arquivo binário ao lado do JSON
+(``<id>.<token>.seg``, formato de segment_store). Cada gravação usa um nome
+novo, referenciado no JSON: como o JSON é trocado de forma atômica, um leitor
+nunca junta os metadados de uma versão com os segmentos de outra.
+"""
+
+import functools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from segment_store import Transcript
+from storage import atomic_write_bytes, cache_dir
+
+_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_PATH_PREFIXES = ("shorts", "embed", "live", "v", "e")
+
+def extract_video_id(url: str) -> Optional[str]:
+    """Normaliza as várias formas de URL do YouTube para o ID de 11 caracteres.
+
+    Aceita watch?v=, youtu.be/, /shorts/, /embed/, /live/, URLs com timestamp
+    (t=, start=) e o próprio ID. Retorna None se não reconhecer a URL.
+    """
+    if not url:
+        return None
+    url = url.strip()
+    if _VIDEO_ID_RE.match(url):
+        return url
+    if "://" not in url:
+        url = "https://" + url
+
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    segments = [s for s in parsed.path.split("/") if s]
+
+    candidate = None
+    if host == "youtu.be":
+        candidate = segments[0] if segments else None
+    elif host.endswith("youtube.com") or host.endswith("youtube-nocookie.com"):
+        query = parse_qs(parsed.query)
+        if "v" in query:
+            candidate = query["v"][0]
+        elif len(segments) >= 2 and segments[0] in _PATH_PREFIXES:
+            candidate = segments[1]
+
+    if candidate and _VIDEO_ID_RE.match(candidate[:11]):
+        return candidate[:11]
+    return None
+
+class TranscriptCache:
+    """Armazena transcrições em disco, um arquivo JSON por vídeo (mais o .seg, se houver segmentos).
+
+    A gravação é atômica (seguro com várias sessões gravando ao mesmo tempo)
+    e a remoção respeita idade máxima e tamanho total do diretório, apagando
+    primeiro os arquivos acessados há mais tempo. A idade conta a partir da
+    gravação (``created_at``; o mtime do JSON nunca é alterado depois dela),
+    e cada leitura só atualiza o atime, usado na ordem de remoção.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_bytes: int = 512 * 1024 * 1024,
+        max_age_seconds: float = 30 * 24 * 3600
+    ):
+        self.directory = directory or cache_dir("transcripts")
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def _path(self, video_id: str) -> str:
+        return os.path.join(self.directory, f"{video_id}.json")
+
+    @staticmethod
+    def _segments_path(path: str, entry: Dict[str, Any]) -> str:
+        """Arquivo de segmentos referenciado pela entrada (``<id>.seg`` nas entradas antigas)."""
+        name = entry.get("segments_file")
+        if name:
+            return os.path.join(os.path.dirname(path), name)
+        return path[:-len(".json")] + ".seg"
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def peek(self, url_or_id: str) -> Optional[Dict[str, Any]]:
+        """Metadados da entrada ainda válida (``segments`` indica se há timestamps), sem ler a transcrição.
+
+        Não conta acerto nem miss e não marca uso: serve para consultas internas, como a deduplicação.
+        """
+        video_id = extract_video_id(url_or_id)
+        if video_id is None:
+            return None
+        path = self._path(video_id)
+        try:
+            modified = os.path.getmtime(path)
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("created_at", modified) > self.max_age_seconds:
+            return None
+        return entry
+
+    def get_entry(self, url_or_id: str, count: bool = True) -> Optional[Dict[str, Any]]:
+        """Entrada com a transcrição em ``text``; com ``count=False`` a leitura fica fora de acertos/misses."""
+        def lookup(key: str) -> None:
+            if count:
+                self._count(key)
+
+        video_id = extract_video_id(url_or_id)
+        if video_id is None:
+            lookup("misses")
+            return None
+
+        path = self._path(video_id)
+        try:
+            modified = os.path.getmtime(path)
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            now = time.time()
+            if now - entry.get("created_at", modified) > self.max_age_seconds:
+                self._remove(path)
+                self._count("evictions")
+                lookup("misses")
+                return None
+            if entry.get("segments"):
+                text = Transcript.load(self._segments_path(path, entry))
+                if len(text.starts) != entry["segments"]:
+                    # Segmentos de outra versão (entrada antiga gravada ao mesmo tempo): trata como miss
+                    raise ValueError("segmentos não correspondem à entrada")
+                entry["text"] = text
+            # Só o atime marca o uso; o mtime continua sendo a data da gravação
+            os.utime(path, (now, modified))
+        except (OSError, ValueError):
+            lookup("misses")
+            return None
+
+        lookup("hits")
+        return entry
+
+    def get(self, url_or_id: str, count: bool = True) -> Optional[Transcript]:
+        """Retorna a transcrição (com timestamps, se gravada com eles), ou None em caso de miss."""
+        entry = self.get_entry(url_or_id, count=count)
+        if not entry:
+            return None
+        text = entry["text"]
+        return text if isinstance(text, Transcript) else Transcript(text)
+
+    def put(self, url_or_id: str, text: str, **metadata: Any) -> Optional[str]:
+        """Grava a transcrição e retorna o ID do vídeo (None se a URL não for reconhecida)."""
+        video_id = extract_video_id(url_or_id)
+        if video_id is None:
+            return None
+        path = self._path(video_id)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = None
+        entry = {"video_id": video_id, "created_at": time.time(), **metadata}
+        if isinstance(text, Transcript) and text.has_timestamps:
+            # O texto vai no .seg, junto dos segmentos; o JSON fica só com os metadados
+            entry["segments_file"] = f"{video_id}.{uuid.uuid4().hex[:12]}.seg"
+            entry["segments"] = len(text.starts)
+            text.save(self._segments_path(path, entry))
+        else:
+            entry["text"] = str(text)
+        atomic_write_bytes(path, json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        if previous is not None and previous.get("segments"):
+            # Leitores que ainda tinham o JSON anterior passam a ter um miss, nunca uma mistura
+            try:
+                os.remove(self._segments_path(path, previous))
+            except OSError:
+                pass
+        self._count("writes")
+        self.evict()
+        return video_id
+
+    def evict(self) -> int:
+        """Remove entradas expiradas e, se preciso, as menos usadas até caber em max_bytes."""
+        now = time.time()
+        entries = []
+        removed = 0
+        names = os.listdir(self.directory)
+        segment_bytes: Dict[str, int] = {}
+        for name in names:
+            if name.endswith(".seg"):
+                video_id = name.split(".", 1)[0]
+                try:
+                    segment_bytes[video_id] = segment_bytes.get(video_id, 0) + os.path.getsize(
+                        os.path.join(self.directory, name)
+                    )
+                except OSError:
+                    pass
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                removed += self._remove(path)
+            else:
+                size = stat.st_size + segment_bytes.get(name[:-len(".json")], 0)
+                entries.append((stat.st_atime, size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            removed += self._remove(path)
+            total -= size
+
+        if removed:
+            self._count("evictions", removed)
+        return removed
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        try:
+            os.remove(path)
+        except OSError:
+            return 0
+        # Todas as versões do .seg daquele vídeo (<id>.seg e <id>.<token>.seg)
+        directory = os.path.dirname(path)
+        prefix = os.path.basename(path)[:-len(".json")] + "."
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name.endswith(".seg"):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+        return 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+_instance_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def _create_transcript_cache() -> TranscriptCache:
+    return TranscriptCache(
+        max_bytes=int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+        max_age_seconds=float(os.getenv("TRANSCRIPT_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+    )
+
+def get_transcript_cache() -> TranscriptCache:
+    """Instância única do cache por processo (compartilhada entre sessões)."""
+    with _instance_lock:
+        return _create_transcript_cache()
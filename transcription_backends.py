@@ -0,0 +1,388 @@
+"""
+Backends de transcrição usados pelo YouTubeTranscriberTool.
+
+- "api" (padrão): API hospedada do Whisper (whisper-1), com segmentação de
+  arquivos longos, limite de taxa e novas tentativas.
+- "local": Whisper quantizado rodando na CPU (faster-whisper/CTranslate2, int8),
+  com segmentação por detecção de voz (VAD) e os trechos transcritos em
+  paralelo em todos os núcleos. Os pesos são lidos de um diretório local
+  (WHISPER_MODEL_PATH, no formato CTranslate2) — nada é baixado.
+
+A escolha é por implantação, com TRANSCRIPTION_BACKEND=api|local. Os dois
+devolvem um ``Transcript`` (segment_store) com os timestamps de cada segmento.
+"""
+
+import functools
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import requests
+
+from api_clients import API_CONNECT_TIMEOUT, API_TIMEOUT, get_http_session
+from audio_segments import cut_segment, merge_transcripts, plan_audio, probe_duration
+from rate_limiter import get_rate_limiter
+from segment_store import Transcript, trim_window, window_cuts
+from tracing import bind, span
+
+WHISPER_API_URL = os.getenv("WHISPER_API_URL", "https://api.openai.com/v1/audio/transcriptions")
+# Limite de upload da API do Whisper (25 MB), com folga
+WHISPER_MAX_UPLOAD_BYTES = 24 * 1024 * 1024
+SAMPLE_RATE = 16000
+
+class WhisperAPIError(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+def transcribe_audio_file(
+    path: str,
+    openai_api_key: str,
+    api_url: str = WHISPER_API_URL,
+    language: str = "pt",
+    max_retries: int = 3
+) -> Transcript:
+    """Envia um arquivo de áudio ao endpoint de transcrição (com os segmentos e seus tempos).
+
+    As chamadas passam pelo limitador compartilhado do Whisper, que repete
+    erros transitórios (429, 5xx, conexão) com backoff e respeita Retry-After.
+    """
+    limiter = get_rate_limiter("whisper", "whisper-1")
+
+    # Sessão com pool keep-alive compartilhada entre segmentos e vídeos
+    session = get_http_session("whisper", openai_api_key)
+
+    def post() -> Transcript:
+        with open(path, "rb") as f:
+            response = session.post(
+                api_url,
+                files={"file": f},
+                data={"model": "whisper-1", "language": language, "response_format": "verbose_json"},
+                timeout=(API_CONNECT_TIMEOUT, API_TIMEOUT)
+            )
+        if response.status_code != 200:
+            header = response.headers.get("retry-after")
+            raise WhisperAPIError(
+                response.text,
+                status_code=response.status_code,
+                retry_after=float(header) if header and header.isdigit() else None
+            )
+        payload = response.json()
+        segments = payload.get("segments")
+        if not segments:
+            return Transcript(payload["text"].strip())
+        return Transcript.from_segments((s["start"], s["end"], s["text"]) for s in segments)
+
+    with span("whisper", input_bytes=os.path.getsize(path)) as current:
+        try:
+            text = limiter.call(post, max_retries=max_retries)
+        except requests.RequestException as e:
+            raise WhisperAPIError(str(e))
+        current.set(output_bytes=len(text.encode("utf-8")))
+        return text
+
+def transcribe_segmented(
+    path: str,
+    openai_api_key: str,
+    api_url: str = WHISPER_API_URL,
+    segment_seconds: float = 600.0,
+    overlap_seconds: float = 5.0,
+    max_workers: int = 4,
+    max_retries: int = 3,
+    on_segments: Optional[Callable[[Transcript], None]] = None
+) -> Transcript:
+    """Divide o áudio em janelas sobrepostas, transcreve-as em paralelo e junta o resultado.
+
+    Cada janela tem suas próprias tentativas: a falha de uma não reinicia as demais.
+    Com timestamps, a sobreposição é cortada pelo tempo; sem eles, pelo texto.
+    ``on_segments`` recebe, na ordem do áudio, a parte de cada janela assim que
+    ela e as anteriores ficam prontas.
+    """
+    segment_dir = tempfile.mkdtemp(dir=os.path.dirname(path))
+    _, ext = os.path.splitext(path)
+
+    def transcribe_window(index: int, start: float, end: float) -> Transcript:
+        # Cada janela é recortada na própria thread, logo antes do envio
+        with span("audio.cut", items=1):
+            window_path = cut_segment(path, start, end, os.path.join(segment_dir, f"segment_{index:04d}{ext}"))
+        try:
+            return transcribe_audio_file(window_path, openai_api_key, api_url=api_url, max_retries=max_retries)
+        finally:
+            os.remove(window_path)
+
+    try:
+        with span("audio.split") as current:
+            windows = plan_audio(path, segment_seconds, overlap_seconds)
+            current.set(items=len(windows))
+        cuts = window_cuts(windows)
+        texts: List[Transcript] = []
+        trimmed: List[Transcript] = []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as executor:
+            results = executor.map(
+                bind(lambda window: transcribe_window(window[0], *window[1])),
+                enumerate(windows)
+            )
+            # map devolve na ordem das janelas: cada parte sai assim que as anteriores saíram
+            for text, (start, _), cut in zip(results, windows, cuts):
+                texts.append(text)
+                # Janela sem fala volta vazia (e sem segmentos); não interrompe as entregas
+                if (text.has_timestamps or not text) and len(trimmed) == len(texts) - 1:
+                    trimmed.append(trim_window(text.shifted(start), *cut))
+                    if on_segments is not None and trimmed[-1]:
+                        on_segments(trimmed[-1])
+        if len(trimmed) == len(texts):
+            return Transcript.concat(trimmed)
+        return Transcript(merge_transcripts(texts))
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+class TranscriptionBackend(ABC):
+    """Transcreve um arquivo de áudio local e devolve o texto.
+
+    Com ``on_segments``, cada trecho pronto é entregue na ordem do áudio, com
+    timestamps absolutos; concatenados, os trechos formam a transcrição
+    devolvida (sem timestamps não há entregas parciais).
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def transcribe(
+        self,
+        path: str,
+        api_key: Optional[str] = None,
+        language: str = "pt",
+        on_segments: Optional[Callable[[Transcript], None]] = None
+    ) -> Transcript:
+        ...
+
+class WhisperAPIBackend(TranscriptionBackend):
+    """API hospedada do Whisper; segmenta arquivos longos ou acima do limite de upload."""
+
+    name = "api"
+
+    def __init__(
+        self,
+        api_url: str = WHISPER_API_URL,
+        segmented: Optional[bool] = None,
+        segment_seconds: float = 600.0,
+        overlap_seconds: float = 5.0,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        live_segment_seconds: float = float(os.getenv("WHISPER_LIVE_SEGMENT_SECONDS", "300"))
+    ):
+        self.api_url = api_url
+        # None = automático: segmenta arquivos longos ou acima do limite de upload
+        self.segmented = segmented
+        self.segment_seconds = segment_seconds
+        # Janelas menores quando há quem consuma a transcrição parcial (indexação ao vivo)
+        self.live_segment_seconds = live_segment_seconds
+        self.overlap_seconds = overlap_seconds
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+
+    def _should_segment(self, path: str, segment_seconds: float) -> bool:
+        if self.segmented is not None:
+            return self.segmented
+        if os.path.getsize(path) > WHISPER_MAX_UPLOAD_BYTES:
+            return True
+        try:
+            return probe_duration(path) > segment_seconds
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            return False
+
+    def transcribe(
+        self,
+        path: str,
+        api_key: Optional[str] = None,
+        language: str = "pt",
+        on_segments: Optional[Callable[[Transcript], None]] = None
+    ) -> Transcript:
+        segment_seconds = self.segment_seconds
+        if on_segments is not None:
+            segment_seconds = min(segment_seconds, self.live_segment_seconds)
+        if self._should_segment(path, segment_seconds):
+            return transcribe_segmented(
+                path,
+                api_key,
+                api_url=self.api_url,
+                segment_seconds=segment_seconds,
+                overlap_seconds=self.overlap_seconds,
+                max_workers=self.max_workers,
+                max_retries=self.max_retries,
+                on_segments=on_segments
+            )
+        text = transcribe_audio_file(path, api_key, api_url=self.api_url, language=language, max_retries=self.max_retries)
+        if on_segments is not None and text.has_timestamps:
+            on_segments(text)
+        return text
+
+def group_speech(
+    regions: Sequence[Tuple[int, int]],
+    max_samples: int,
+    max_gap: int
+) -> List[Tuple[int, int]]:
+    """Agrupa regiões de fala (início, fim) em trechos de até ``max_samples`` amostras.
+
+    Regiões vizinhas entram no mesmo trecho se a pausa entre elas for menor
+    que ``max_gap``; uma região mais longa que o limite é cortada em pedaços.
+    """
+    chunks: List[Tuple[int, int]] = []
+    for start, end in regions:
+        while end - start > max_samples:
+            chunks.append((start, start + max_samples))
+            start += max_samples
+        if chunks and start - chunks[-1][1] <= max_gap and end - chunks[-1][0] <= max_samples:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+    return chunks
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """Whisper quantizado (int8) na CPU, com VAD e trechos transcritos em paralelo.
+
+    ``workers`` trechos são transcritos ao mesmo tempo, cada um com
+    ``threads_per_worker`` threads do CTranslate2; por padrão, um trecho por núcleo.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        compute_type: str = "int8",
+        workers: Optional[int] = None,
+        threads_per_worker: int = 1,
+        chunk_seconds: float = 60.0,
+        beam_size: int = 1,
+        min_silence_ms: int = 500
+    ):
+        self.model_path = model_path or os.getenv("WHISPER_MODEL_PATH")
+        self.compute_type = compute_type
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.chunk_seconds = chunk_seconds
+        self.beam_size = beam_size
+        self.min_silence_ms = min_silence_ms
+        self._model = None
+        self._load_lock = threading.Lock()
+        self.load_seconds = 0.0
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    if not self.model_path or not os.path.isdir(self.model_path):
+                        raise RuntimeError(
+                            "Transcrição local: defina WHISPER_MODEL_PATH com o diretório do modelo "
+                            "Whisper no formato CTranslate2 (ex.: convertido com ct2-transformers-converter)."
+                        )
+                    try:
+                        from faster_whisper import WhisperModel
+                    except ImportError as e:
+                        raise ImportError(
+                            "You must install package `faster-whisper` to use the local transcription backend: "
+                            "`pip install faster-whisper`."
+                        ) from e
+                    start = time.perf_counter()
+                    with span("local_whisper.load"):
+                        self._model = WhisperModel(
+                            self.model_path,
+                            device="cpu",
+                            compute_type=self.compute_type,
+                            cpu_threads=self.threads_per_worker,
+                            num_workers=self.workers,
+                            local_files_only=True
+                        )
+                    self.load_seconds = time.perf_counter() - start
+        return self._model
+
+    def speech_chunks(self, audio: Any) -> List[Tuple[int, int]]:
+        """Trechos de fala do áudio (em amostras), detectados pelo VAD Silero do faster-whisper."""
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        timestamps = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=self.min_silence_ms))
+        return group_speech(
+            [(t["start"], t["end"]) for t in timestamps],
+            max_samples=int(self.chunk_seconds * SAMPLE_RATE),
+            max_gap=SAMPLE_RATE * 2
+        )
+
+    def _transcribe_chunk(self, model: Any, samples: Any, offset: float, language: str) -> List[Tuple[float, float, str]]:
+        segments, _ = model.transcribe(
+            samples,
+            language=language,
+            beam_size=self.beam_size,
+            vad_filter=False,
+            condition_on_previous_text=False
+        )
+        return [(offset + segment.start, offset + segment.end, segment.text) for segment in segments]
+
+    def transcribe(
+        self,
+        path: str,
+        api_key: Optional[str] = None,
+        language: str = "pt",
+        on_segments: Optional[Callable[[Transcript], None]] = None
+    ) -> Transcript:
+        model = self.model  # carregado fora da medição do RTF
+        from faster_whisper import decode_audio
+
+        with span("local_whisper") as current:
+            start = time.perf_counter()
+            audio = decode_audio(path, sampling_rate=SAMPLE_RATE)
+            chunks = self.speech_chunks(audio)
+            parts: List[Transcript] = []
+            with ThreadPoolExecutor(max_workers=min(self.workers, max(1, len(chunks)))) as executor:
+                for segments in executor.map(
+                    bind(lambda chunk: self._transcribe_chunk(
+                        model, audio[chunk[0]:chunk[1]], chunk[0] / SAMPLE_RATE, language
+                    )),
+                    chunks
+                ):
+                    parts.append(Transcript.from_segments(segments))
+                    if on_segments is not None and parts[-1]:
+                        on_segments(parts[-1])
+            audio_seconds = len(audio) / SAMPLE_RATE
+            elapsed = time.perf_counter() - start
+            current.set(
+                items=len(chunks),
+                audio_seconds=audio_seconds,
+                speech_seconds=sum(b - a for a, b in chunks) / SAMPLE_RATE,
+                rtf=elapsed / audio_seconds if audio_seconds else None
+            )
+        return Transcript.concat(parts)
+
+_instance_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def _local_backend() -> LocalWhisperBackend:
+    workers = os.getenv("LOCAL_WHISPER_WORKERS")
+    return LocalWhisperBackend(
+        compute_type=os.getenv("LOCAL_WHISPER_COMPUTE_TYPE", "int8"),
+        workers=int(workers) if workers else None,
+        threads_per_worker=int(os.getenv("LOCAL_WHISPER_THREADS", "1")),
+        chunk_seconds=float(os.getenv("LOCAL_WHISPER_CHUNK_SECONDS", "60"))
+    )
+
+def get_transcription_backend(name: Optional[str] = None, **api_options: Any) -> TranscriptionBackend:
+    """Backend configurado para a implantação (TRANSCRIPTION_BACKEND, padrão "api").
+
+    O backend local é único por processo (o modelo é carregado uma vez);
+    ``api_options`` são repassadas ao WhisperAPIBackend.
+    """
+    name = name or os.getenv("TRANSCRIPTION_BACKEND", "api")
+    if name == "api":
+        return WhisperAPIBackend(**api_options)
+    if name == "local":
+        with _instance_lock:
+            return _local_backend()
+    raise ValueError(f"Backend de transcrição desconhecido: {name!r} (use 'api' ou 'local').")
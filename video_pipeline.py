@@ -0,0 +1,153 @@
+"""
+Núcleo do processamento de um vídeo, sem dependência do Streamlit.
+
+Define a transcrição e o grafo de etapas (resumo, indexação, corpus, busca na
+web e destaques) usados tanto pela interface (``process_video.py``) quanto
+pelo worker em lote (``batch_worker.py``). Quem chama decide como exibir o
+progresso: as etapas só publicam eventos por ``on_event``.
+"""
+
+import contextlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from agent_config import create_model
+from pipeline import Stage
+from segment_store import Transcript
+from summary_tree import summarize_hierarchical
+from token_budget import count_tokens
+from groq_model import SUMMARY_MIN_TOKENS
+from tracing import set_attrs
+from transcript_cache import extract_video_id, get_transcript_cache
+
+# As ferramentas (smolagents, langchain, FAISS) são importadas dentro das
+# etapas, para não pesar na importação do app
+
+DEFAULT_SEARCH_QUERY = "Carla Zambelli julgamento STF"
+
+@dataclass
+class VideoJob:
+    url: str
+    groq_api_key: str
+    openai_api_key: str
+    search_query: str = DEFAULT_SEARCH_QUERY
+
+    @property
+    def video_id(self) -> Optional[str]:
+        return extract_video_id(self.url)
+
+class _LimitedModel:
+    """Repassa as chamadas ao modelo segurando um semáforo (limite de concorrência da API)."""
+
+    def __init__(self, model: Any, limit: Any):
+        self._model = model
+        self._limit = limit
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        with self._limit:
+            return self._model(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._model, name)
+
+def _limit(limits: Optional[Dict[str, Any]], name: str) -> Any:
+    # Semáforos (threading ou multiprocessing) por API externa; sem limite por padrão
+    if limits and limits.get(name) is not None:
+        return limits[name]
+    return contextlib.nullcontext()
+
+def transcribe(url: str, openai_api_key: str, limits: Optional[Dict[str, Any]] = None) -> Transcript:
+    """Retorna a transcrição do vídeo (com timestamps); lança RuntimeError se ela falhar."""
+    from tools.youtube_transcriber import YouTubeTranscriberTool
+
+    try:
+        with _limit(limits, "whisper"):
+            return YouTubeTranscriberTool().transcribe(url, openai_api_key)
+    except Exception as e:
+        raise RuntimeError(f"Erro na transcrição: {e}") from e
+
+def index_transcript(transcript: str, video_id: Optional[str]) -> Any:
+    from tools.index_transcript import IndexTranscriptTool
+
+    vectorstore = IndexTranscriptTool().forward(transcript=transcript, video_id=video_id)
+    if isinstance(vectorstore, str):
+        raise RuntimeError(vectorstore)
+    return vectorstore
+
+def build_stages(
+    job: VideoJob,
+    transcript: str,
+    on_event: Optional[Callable[..., None]] = None,
+    limits: Optional[Dict[str, Any]] = None
+) -> List[Stage]:
+    """Etapas do processamento após a transcrição.
+
+    ``on_event(tipo, *dados)`` é chamado nas threads das etapas com
+    ("summary_progress", concluidos, total) e ("highlights_delta", texto).
+    ``limits`` pode trazer semáforos para "groq", "whisper" e "web".
+    """
+    emit = on_event or (lambda *event: None)
+    video_id = job.video_id
+
+    def model_stage(_: Dict[str, Any]) -> Any:
+        return create_model(job.groq_api_key)
+
+    def summary_stage(deps: Dict[str, Any]) -> Dict[str, Any]:
+        if count_tokens(transcript) <= SUMMARY_MIN_TOKENS:
+            return {"summary": transcript, "levels": 0, "computed": 0, "reused": 0}
+        # Resumo em árvore (um único trecho em vídeos curtos); nós já resumidos vêm do cache
+        tree = summarize_hierarchical(
+            transcript,
+            summarizer_model=_LimitedModel(deps["model"], _limit(limits, "groq")),
+            progress_callback=lambda done, total: emit("summary_progress", done, total)
+        )
+        set_attrs(levels=len(tree.levels), computed=tree.computed, reused=tree.reused)
+        return {"summary": tree.summary, "levels": len(tree.levels), "computed": tree.computed, "reused": tree.reused}
+
+    def index_stage(_: Dict[str, Any]) -> Any:
+        return index_transcript(transcript, video_id)
+
+    def corpus_stage(deps: Dict[str, Any]) -> int:
+        # Acrescenta o vídeo ao índice de corpus (buscas entre vários vídeos)
+        if not video_id:
+            return 0
+        from corpus_index import get_corpus_index
+
+        entry = get_transcript_cache().get_entry(video_id) or {}
+        return get_corpus_index().add_vectorstore(
+            video_id,
+            deps["index"],
+            channel=entry.get("channel"),
+            published_at=entry.get("published_at")
+        )
+
+    def search_stage(_: Dict[str, Any]) -> str:
+        from tools.web_search import WebSearchTool
+
+        with _limit(limits, "web"):
+            return WebSearchTool().forward(query=job.search_query)
+
+    def highlights_stage(deps: Dict[str, Any]) -> str:
+        from tools.journalistic_highlight import JournalisticHighlightTool
+
+        parts = []
+        with _limit(limits, "groq"):
+            for delta in JournalisticHighlightTool(raise_errors=True).stream(
+                # Com marcadores [m:ss], para os destaques apontarem o momento no vídeo
+                context=transcript.timestamped_text() if isinstance(transcript, Transcript) else transcript,
+                search_results=deps["search"],
+                llm_api_key=job.groq_api_key
+            ):
+                parts.append(delta)
+                emit("highlights_delta", delta)
+        return "".join(parts)
+
+    # Só o resumo (modelo), o corpus (índice) e os destaques (busca) dependem de outra etapa
+    return [
+        Stage("model", model_stage, label="Preparando modelo"),
+        Stage("summary", summary_stage, deps=("model",), label="Resumindo vídeo"),
+        Stage("index", index_stage, label="Indexando transcrição para RAG"),
+        Stage("corpus", corpus_stage, deps=("index",), label="Adicionando ao corpus de vídeos"),
+        Stage("search", search_stage, label="Buscando contexto atual na web"),
+        Stage("highlights", highlights_stage, deps=("search",), label="Gerando destaques jornalísticos"),
+    ]